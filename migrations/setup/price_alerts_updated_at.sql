@@ -0,0 +1,23 @@
+-- Price Alerts: updated_at cursor for the backend alert monitor's incremental sync
+-- The monitor pulls only rows with updated_at >= last cursor, so every UPDATE must bump updated_at.
+-- supabase-final-master-fix.sql recreated the table without the trigger; restore it here.
+
+CREATE OR REPLACE FUNCTION handle_updated_at()
+RETURNS TRIGGER AS $$
+BEGIN
+    NEW.updated_at = now();
+    RETURN NEW;
+END;
+$$ language 'plpgsql';
+
+DROP TRIGGER IF EXISTS tr_price_alerts_updated_at ON public.price_alerts;
+CREATE TRIGGER tr_price_alerts_updated_at
+    BEFORE UPDATE ON public.price_alerts
+    FOR EACH ROW
+    EXECUTE PROCEDURE handle_updated_at();
+
+-- Backfill rows created before updated_at had a default
+UPDATE public.price_alerts SET updated_at = COALESCE(created_at, now()) WHERE updated_at IS NULL;
+
+-- Delta query: updated_at >= cursor ORDER BY id
+CREATE INDEX IF NOT EXISTS idx_price_alerts_updated_at ON public.price_alerts(updated_at);
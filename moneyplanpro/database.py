@@ -1,7 +1,8 @@
 import sqlite3
 import os
+import threading
+from contextlib import contextmanager
 from datetime import datetime
-import sqlite3
 
 # Register datetime adapters for SQLite
 def adapt_datetime(dt):
@@ -19,8 +20,108 @@ sqlite3.register_converter("timestamp", convert_datetime)
 
 DB_PATH = os.path.join(os.path.dirname(__file__), "invest_guide.db")
 
+# Süreç başına bağlantı havuzu ayarları
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "8"))
+SQLITE_CACHE_MB = int(os.getenv("SQLITE_CACHE_MB", "16"))
+SQLITE_MMAP_MB = int(os.getenv("SQLITE_MMAP_MB", "256"))
+
+
+class PooledConnection(sqlite3.Connection):
+    """close() bağlantıyı kapatmak yerine havuza iade eder (eski conn.close() çağrıları aynen çalışır)."""
+    pool = None
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.release(self)
+        else:
+            super().close()
+
+    def close_for_real(self):
+        super().close()
+
+
+class ConnectionPool:
+    """
+    Süreç başına SQLite bağlantı havuzu.
+    Her sorguda yeniden açma + şema okuma maliyeti yerine bağlantılar tekrar kullanılır;
+    WAL sayesinde 4 uvicorn worker'ında okuyucular yazıcıları beklemez.
+    """
+
+    def __init__(self, max_idle=DB_POOL_SIZE):
+        self.max_idle = max_idle
+        self._idle = []
+        self._orphans = []
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+        self._path = None
+        self.created = 0
+        self.reused = 0
+
+    def _connect(self, path):
+        conn = sqlite3.connect(
+            path,
+            detect_types=sqlite3.PARSE_DECLTYPES | sqlite3.PARSE_COLNAMES,
+            check_same_thread=False,  # havuzdaki bağlantı farklı threadlerde (sırayla) kullanılır
+            timeout=5,
+            factory=PooledConnection
+        )
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(f"PRAGMA cache_size=-{SQLITE_CACHE_MB * 1024}")
+        conn.execute(f"PRAGMA mmap_size={SQLITE_MMAP_MB * 1024 * 1024}")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        conn.pool = self
+        return conn
+
+    def _check_owner(self):
+        # fork sonrası veya DB_PATH değiştiğinde (testler) eski bağlantılar kullanılmaz.
+        # fork ile devralınanlar kapatılmaz (SQLite kilitlerini bozmamak için), sadece bırakılır.
+        if self._pid != os.getpid():
+            self._orphans.extend(self._idle)
+            self._idle = []
+            self._pid = os.getpid()
+        elif self._path != DB_PATH:
+            for conn in self._idle:
+                conn.close_for_real()
+            self._idle = []
+        self._path = DB_PATH
+
+    def acquire(self):
+        with self._lock:
+            self._check_owner()
+            path = self._path
+            if self._idle:
+                self.reused += 1
+                return self._idle.pop()
+            self.created += 1
+        return self._connect(path)
+
+    def release(self, conn):
+        try:
+            # Commit edilmemiş iş varsa eski close() davranışıyla aynı şekilde geri alınır
+            if conn.in_transaction:
+                conn.rollback()
+            conn.row_factory = sqlite3.Row
+        except sqlite3.Error:
+            conn.close_for_real()
+            return
+        with self._lock:
+            if self._pid == os.getpid() and self._path == DB_PATH and len(self._idle) < self.max_idle:
+                self._idle.append(conn)
+                return
+        conn.close_for_real()
+
+    def stats(self):
+        with self._lock:
+            return {"idle": len(self._idle), "created": self.created, "reused": self.reused}
+
+
+db_pool = ConnectionPool()
+
+
 def init_db():
-    conn = sqlite3.connect(DB_PATH)
+    conn = get_db_connection()
     cursor = conn.cursor()
     
     # Ekonomik Takvim Tablosu
@@ -58,10 +159,16 @@ def init_db():
             status TEXT DEFAULT 'idle',
             output TEXT DEFAULT '',
             is_active INTEGER DEFAULT 1,
+            interval_sec INTEGER DEFAULT 0, -- >0 ise scheduler tarafından periyodik çalıştırılır
             updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
         )
     """)
 
+    # Eski veritabanlarına periyodik çalışma kolonunu ekle
+    cursor.execute("PRAGMA table_info(system_jobs)")
+    if "interval_sec" not in [col[1] for col in cursor.fetchall()]:
+        cursor.execute("ALTER TABLE system_jobs ADD COLUMN interval_sec INTEGER DEFAULT 0")
+
     # Seed initial jobs if table is empty
     cursor.execute("SELECT COUNT(*) FROM system_jobs")
     if cursor.fetchone()[0] == 0:
@@ -74,6 +181,20 @@ def init_db():
             INSERT INTO system_jobs (id, name, description, type, path, args, service, method)
             VALUES (?, ?, ?, ?, ?, ?, ?, ?)
         """, initial_jobs)
+
+    # Prefetch jobs - Ana ekran endpoint'lerini paylaşımlı cache'te sıcak tutar (interval_sec ile ayarlanır)
+    prefetch_jobs = [
+        ("prefetch_market_summary", "Market Summary Prefetch", "Refreshes /market/summary in the shared cache", "internal", None, '{"force_refresh": true}', "market_service", "get_market_summary", 50),
+        ("prefetch_crypto", "Crypto List Prefetch", "Refreshes /market/crypto (top 50) in the shared cache", "internal", None, '{"force_refresh": true}', "crypto_service", "get_top_coins", 300),
+        ("prefetch_commodities", "Commodities Prefetch", "Refreshes /market/commodities in the shared cache", "internal", None, '{"force_refresh": true}', "market_service", "get_commodity_markets", 240),
+        ("prefetch_tcmb", "TRY Currencies Prefetch", "Refreshes /currencies/tcmb in the shared cache", "internal", None, '{"force_refresh": true}', "market_service", "get_tcmb_currencies", 240),
+        ("prefetch_news", "News Prefetch", "Refreshes /news in the shared cache", "internal", None, '{"force_refresh": true}', "news_service", "get_latest_news", 600),
+        ("refresh_symbol_registry", "Symbol Registry Refresh", "Rebuilds the symbol routing index (fund list, provider symbols) in all workers", "internal", None, '[]', "symbol_registry", "refresh", 86400)
+    ]
+    cursor.executemany("""
+        INSERT OR IGNORE INTO system_jobs (id, name, description, type, path, args, service, method, interval_sec)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """, prefetch_jobs)
     
     # Ad Placements Table - Manage AdMob/Provider IDs remotely
     cursor.execute("""
@@ -139,16 +260,82 @@ def init_db():
         )
     """)
     
+    # OHLCV Mum Deposu - Grafik verisi yerelde tutulur, upstream'den sadece son mumdan sonrası çekilir
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS ohlcv_candles (
+            feed TEXT NOT NULL,      -- 'market', 'binance'
+            symbol TEXT NOT NULL,
+            interval TEXT NOT NULL,  -- '1d', '1wk', ...
+            ts INTEGER NOT NULL,     -- mumun takvim gününün UTC gece yarısı (epoch saniye)
+            date TEXT NOT NULL,      -- kaynağın döndüğü ISO tarih (API çıktısı aynen korunur)
+            open REAL,
+            high REAL,
+            low REAL,
+            close REAL,
+            volume REAL,
+            PRIMARY KEY (feed, symbol, interval, ts)
+        ) WITHOUT ROWID
+    """)
+
+    # Eski kayıtlar ts'yi kaynağın ham zamanından alıyordu (Yahoo tz'li ISO, FMP yerel gece yarısı);
+    # aynı gün iki anahtara düşüyordu. ts'yi tarih alanının gününe normalize et, çakışan kopyaları birleştir.
+    day_ts = "CAST(strftime('%s', substr(date, 1, 10)) AS INTEGER)"
+    cursor.execute(f"""
+        INSERT OR REPLACE INTO ohlcv_candles (feed, symbol, interval, ts, date, open, high, low, close, volume)
+        SELECT feed, symbol, interval, {day_ts}, date, open, high, low, close, volume
+        FROM ohlcv_candles WHERE ts != {day_ts} ORDER BY ts
+    """)
+    cursor.execute(f"DELETE FROM ohlcv_candles WHERE ts != {day_ts}")
+
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS ohlcv_sync_state (
+            feed TEXT NOT NULL,
+            symbol TEXT NOT NULL,
+            interval TEXT NOT NULL,
+            covered_from INTEGER,    -- depodaki seriyle kapsanan en eski zaman (pencere başı ya da ilk mum)
+            requested_from INTEGER,  -- tam indirmesi denenmiş en eski pencere başı
+            last_sync REAL,          -- son upstream kontrolü (epoch)
+            PRIMARY KEY (feed, symbol, interval)
+        )
+    """)
+    cursor.execute("PRAGMA table_info(ohlcv_sync_state)")
+    if "requested_from" not in [col[1] for col in cursor.fetchall()]:
+        cursor.execute("ALTER TABLE ohlcv_sync_state ADD COLUMN requested_from INTEGER")
+
+    # Sağlayıcı kota kovaları (token bucket) - worker'lar arasında paylaşılır, yeniden başlatmada korunur
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS provider_quotas (
+            provider TEXT PRIMARY KEY,
+            tokens REAL NOT NULL,
+            updated_at REAL NOT NULL -- son harcama/dolum zamanı (epoch)
+        )
+    """)
+
     conn.commit()
     conn.close()
 
 def get_db_connection():
-    conn = sqlite3.connect(
-        DB_PATH, 
-        detect_types=sqlite3.PARSE_DECLTYPES | sqlite3.PARSE_COLNAMES
-    )
-    conn.row_factory = sqlite3.Row
-    return conn
+    """Havuzdan bir bağlantı döner; conn.close() bağlantıyı havuza iade eder."""
+    return db_pool.acquire()
+
+
+@contextmanager
+def db_connection():
+    """
+    Havuzlanmış bağlantı için context manager:
+        with db_connection() as conn:
+            conn.execute(...)
+    Blok hatasız biterse commit, hata olursa rollback yapılır; bağlantı her durumda havuza döner.
+    """
+    conn = db_pool.acquire()
+    try:
+        yield conn
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
 
 # Uygulama başladığında DB'yi hazırla
 init_db()
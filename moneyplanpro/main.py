@@ -1,5 +1,6 @@
 from fastapi import FastAPI, HTTPException, Body
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.concurrency import run_in_threadpool
 from services.market_service import market_provider
 from services.crypto_service import crypto_service
 from services.bes_service import bes_service
@@ -12,7 +13,11 @@ from services.settings_service import settings_service
 from services.ad_service import ad_service
 from services.notification_service import notification_service
 from services.alert_monitor_service import alert_monitor_service
+from services.symbol_registry import symbol_registry
 from services.diagnostics_service import diagnostics_service
+from services.quota_service import quota_service
+from utils.network import AsyncSafeRequest
+from utils.deadline import deadline as request_deadline
 
 app = FastAPI(
     title="InvestGuide Middleware API",
@@ -21,13 +26,21 @@ app = FastAPI(
 
 @app.on_event("startup")
 async def startup_event():
+    # Load the symbol routing index once (fund list etc.) before serving requests
+    await run_in_threadpool(symbol_registry.refresh, False)
     # Start the price alert monitor in the background
     alert_monitor_service.start()
+    # Start the prefetch/job scheduler (runs jobs only in the leader worker)
+    job_runner.start_scheduler()
 
 @app.on_event("shutdown")
 async def shutdown_event():
     # Stop the price alert monitor
     alert_monitor_service.stop()
+    job_runner.stop_scheduler()
+    await AsyncSafeRequest.aclose()
+    # Return this worker's unused quota leases to the shared budget
+    await run_in_threadpool(quota_service.release_leases)
 
 app.add_middleware(
     CORSMiddleware,
@@ -61,32 +74,60 @@ def get_client_config():
     }
 
 @app.get("/api/v1/market/summary")
-def get_market_summary():
-    return market_provider.get_market_summary()
+async def get_market_summary():
+    return await market_provider.aget_market_summary()
 
 @app.get("/api/v1/market/history/{symbol}")
-def get_market_history(symbol: str, period: str = "1mo", interval: str = "1d"):
+async def get_market_history(symbol: str, period: str = "1mo", interval: str = "1d"):
     """
     GRAFİK VERİSİ: Dinamik yönlendirme (Crypto -> Binance, Stocks -> MarketProvider)
     """
-    s_upper = symbol.upper()
-    if s_upper.endswith("USDT") or s_upper in ["BTC", "ETH", "USDT", "SOL", "BNB", "XRP", "ZEC", "POL", "FDUSD", "DOGE"]:
-        return crypto_service.get_history(symbol, period, interval)
-        
-    return market_provider.get_history(symbol, period, interval)
+    with _route_deadline("DEADLINE_HISTORY_SEC", "15", "market_history"):
+        if symbol_registry.is_crypto(symbol):
+            return await run_in_threadpool(crypto_service.get_history, symbol, period, interval)
+
+        # Mum deposu (SQLite) ve yfinance senkron çalışır; event loop'u bloklamamak için threadpool'da çalıştır
+        return await run_in_threadpool(market_provider.get_history, symbol, period, interval)
 
 @app.get("/api/v1/market/detail/{symbol}")
-def get_asset_detail(symbol: str):
+async def get_asset_detail(symbol: str):
     """
     DETAY VERİSİ: Dinamik yönlendirme (Crypto -> Binance, Stocks -> MarketProvider)
     """
-    s_upper = symbol.upper()
-    # Crypto Check
-    if s_upper.endswith("USDT") or s_upper in ["BTC", "ETH", "USDT", "SOL", "BNB", "XRP", "ZEC", "POL", "FDUSD", "DOGE"]:
-        return crypto_service.get_asset_detail(symbol)
-    
-    # Stocks, Forex, Gold -> MarketProvider (Yahoo)
-    return market_provider.get_asset_detail(symbol)
+    with _route_deadline("DEADLINE_DETAIL_SEC", "8", "market_detail"):
+        # Crypto Check
+        if symbol_registry.is_crypto(symbol):
+            return await crypto_service.aget_asset_detail(symbol)
+
+        # Stocks, Forex, Gold -> MarketProvider (Yahoo)
+        return await run_in_threadpool(market_provider.get_asset_detail, symbol)
+
+@app.get("/api/v1/market/quotes")
+async def get_market_quotes(symbols: str = ""):
+    """
+    TOPLU KOTASYON: İzleme listesi için tek istek (symbols=THYAO,BTC,AAPL).
+    Semboller sağlayıcılara bölünür, her sağlayıcıya tek batch istek atılır.
+    """
+    return await _market_quotes(symbols.split(","))
+
+@app.post("/api/v1/market/quotes")
+async def post_market_quotes(symbols: list = Body(..., embed=True)):
+    """Uzun listeler için POST gövdesi: {"symbols": ["THYAO", "BTC", ...]}"""
+    return await _market_quotes(symbols)
+
+async def _market_quotes(symbols):
+    symbols = [str(s).strip() for s in symbols if str(s).strip()]
+    if not symbols:
+        raise HTTPException(status_code=400, detail="symbols parametresi boş olamaz")
+    max_symbols = int(settings_service.get_value("QUOTES_MAX_SYMBOLS", "200"))
+    if len(symbols) > max_symbols:
+        raise HTTPException(status_code=400, detail=f"En fazla {max_symbols} sembol istenebilir")
+    with _route_deadline("DEADLINE_QUOTES_SEC", "10", "market_quotes"):
+        return await run_in_threadpool(market_provider.get_quotes, symbols)
+
+def _route_deadline(key, default, name):
+    """Route'un toplam süre bütçesi; tüm sağlayıcı çağrıları kalan süreyle sınırlanır (utils/deadline.py)."""
+    return request_deadline(float(settings_service.get_value(key, default)), name)
 
 @app.get("/api/v1/market/analysis/{symbol}")
 def get_asset_analysis(symbol: str):
@@ -124,11 +165,9 @@ def upload_market_calendar(events: list = Body(..., embed=True), clear: bool = F
     clear=True ise mevcut verileri siler.
     """
     if clear:
-        from database import get_db_connection
-        conn = get_db_connection()
-        conn.execute("DELETE FROM calendar_events")
-        conn.commit()
-        conn.close()
+        from database import db_connection
+        with db_connection() as conn:
+            conn.execute("DELETE FROM calendar_events")
         
     success = market_provider.save_calendar_events(events)
     if not success:
@@ -136,12 +175,12 @@ def upload_market_calendar(events: list = Body(..., embed=True), clear: bool = F
     return {"status": "success", "count": len(events)}
 
 @app.get("/api/v1/market/crypto")
-def get_crypto_markets(limit: int = 50):
-    return crypto_service.get_top_coins(limit)
+async def get_crypto_markets(limit: int = 50):
+    return await crypto_service.aget_top_coins(limit)
 
 @app.get("/api/v1/market/crypto/fear-greed")
-def get_crypto_fear_greed():
-    return crypto_service.get_fear_greed_index()
+async def get_crypto_fear_greed():
+    return await crypto_service.aget_fear_greed_index()
 
 @app.get("/api/v1/funds/top")
 def get_top_funds():
@@ -156,18 +195,41 @@ def get_tcmb_rates():
     return market_provider.get_tcmb_currencies()
 
 @app.get("/api/v1/news")
-def get_latest_news(limit: int = 20):
-    return news_service.get_latest_news(limit)
+async def get_latest_news(limit: int = 20):
+    return await news_service.aget_latest_news(limit)
+
+@app.get("/api/v1/macro")
+async def get_macro_batch(countries: str = "TR,US,DE,GB,CN,JP,IN,BR"):
+    """
+    Birden fazla ülkenin makro göstergelerini tek çağrıda döner (?countries=TR,US,DE).
+    Eksik ülkeler gösterge başına tek World Bank isteğiyle (çoklu ülke sorgusu) çekilir.
+    """
+    codes = [c.strip().upper() for c in countries.split(",") if c.strip()]
+    if not codes:
+        raise HTTPException(status_code=400, detail="countries parametresi boş olamaz")
+    if len(codes) > 50:
+        raise HTTPException(status_code=400, detail="En fazla 50 ülke istenebilir")
+
+    results = await macro_service.aget_countries_indicators(codes)
+    if "TR" in results:
+        # Tekil endpoint ile tutarlı: Türkiye için eksik göstergeler TCMB/TÜİK verisiyle tamamlanır
+        tr = results["TR"]
+        results["TR"] = {
+            **tr,
+            "data": tcmb_service.apply_fallback({k: dict(v) for k, v in tr["data"].items()}),
+            "source": "TCMB & TÜİK (Güncel)"
+        }
+    return {code: results[code] for code in codes}
 
 @app.get("/api/v1/macro/{country_code}")
-def get_macro_indicators(country_code: str):
+async def get_macro_indicators(country_code: str):
     """
     Fetches macro-economic indicators (GDP, Inflation, etc.).
     Uses TCMB/TUIK data for 'TR', World Bank for others.
     """
     if country_code.upper() == "TR":
         # Türkiye için özel TCMB/TÜİK verisi
-        tcmb_data = tcmb_service.get_macro_indicators()
+        tcmb_data = await tcmb_service.aget_macro_indicators()
         if tcmb_data:
             return {
                 "country": "TR",
@@ -177,7 +239,7 @@ def get_macro_indicators(country_code: str):
             }
     
     # Diğer ülkeler veya TR fallback için World Bank
-    return macro_service.get_country_indicators(country_code)
+    return await macro_service.aget_country_indicators(country_code)
 
 # --- SYSTEM MANAGEMENT ENDPOINTS ---
 
@@ -394,13 +456,12 @@ async def update_ui_config(updates: dict = Body(...)):
 
 @app.get("/api/v1/system/alerts")
 def list_system_alerts(limit: int = 100):
-    from database import get_db_connection
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM price_alerts ORDER BY created_at DESC LIMIT ?", (limit,))
-    rows = cursor.fetchall()
-    alerts = [dict(row) for row in rows]
-    conn.close()
+    from database import db_connection
+    with db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT * FROM price_alerts ORDER BY created_at DESC LIMIT ?", (limit,))
+        rows = cursor.fetchall()
+        alerts = [dict(row) for row in rows]
     return alerts
 
 @app.post("/api/v1/system/alerts")
@@ -408,25 +469,21 @@ def create_alert(payload: dict = Body(...)):
     """
     Payload: {user_id, symbol, target_price, is_above}
     """
-    from database import get_db_connection
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute("""
-        INSERT INTO price_alerts (user_id, symbol, target_price, is_above)
-        VALUES (?, ?, ?, ?)
-    """, (payload["user_id"], payload["symbol"].upper(), payload["target_price"], payload.get("is_above", 1)))
-    conn.commit()
-    conn.close()
+    from database import db_connection
+    with db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            INSERT INTO price_alerts (user_id, symbol, target_price, is_above)
+            VALUES (?, ?, ?, ?)
+        """, (payload["user_id"], payload["symbol"].upper(), payload["target_price"], payload.get("is_above", 1)))
     return {"status": "success"}
 
 @app.delete("/api/v1/system/alerts/{alert_id}")
 def delete_alert(alert_id: int):
-    from database import get_db_connection
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute("DELETE FROM price_alerts WHERE id = ?", (alert_id,))
-    conn.commit()
-    conn.close()
+    from database import db_connection
+    with db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("DELETE FROM price_alerts WHERE id = ?", (alert_id,))
     return {"status": "success"}
 
 if __name__ == "__main__":
@@ -0,0 +1,65 @@
+import os
+import sys
+import time
+import random
+
+# moneyplanpro kökünü path'e ekle (scripts/ altından çalıştırılabilsin)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from services.alert_index import AlertIndex
+
+
+def linear_scan(alerts, prices):
+    """Eski yöntem: her aktif alarmı fiyatla tek tek karşılaştırır."""
+    fired = []
+    for a in alerts:
+        price = prices.get(a["symbol"], 0)
+        if price <= 0:
+            continue
+        if (a["is_above"] and price >= a["target_price"]) or (not a["is_above"] and price <= a["target_price"]):
+            fired.append(a)
+    return fired
+
+
+def bench(total=100_000, symbols=500, trigger_ratio=0.001, seed=42):
+    rnd = random.Random(seed)
+    syms = [f"SYM{i}" for i in range(symbols)]
+    base = {s: rnd.uniform(10, 1000) for s in syms}
+    alerts = []
+    for i in range(total):
+        s = rnd.choice(syms)
+        is_above = rnd.random() < 0.5
+        # Alarmların çoğu güncel fiyattan uzakta; yalnızca ~trigger_ratio kadarı tetiklenir
+        if rnd.random() < trigger_ratio:
+            target = base[s] * (0.99 if is_above else 1.01)
+        else:
+            target = base[s] * (rnd.uniform(1.05, 2.0) if is_above else rnd.uniform(0.3, 0.95))
+        alerts.append({"id": i, "symbol": s, "target_price": target, "is_above": is_above})
+
+    index = AlertIndex()
+    t0 = time.perf_counter()
+    index.sync(alerts)
+    build = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    index.sync(alerts)
+    resync = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    expected = linear_scan(alerts, base)
+    scan = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    fired = [a for s in syms for a in index.pop_triggered(s, base[s])]
+    indexed = time.perf_counter() - t0
+
+    assert {a["id"] for a in fired} == {a["id"] for a in expected}
+    print(f"Alarm: {total:,}  Sembol: {symbols}  Tetiklenen: {len(fired)}")
+    print(f"  İndeks kurulumu      : {build * 1000:8.1f} ms")
+    print(f"  Değişmeyen liste sync: {resync * 1000:8.1f} ms")
+    print(f"  Doğrusal tarama      : {scan * 1000:8.1f} ms")
+    print(f"  İndeks (bisect)      : {indexed * 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    bench(total=total)
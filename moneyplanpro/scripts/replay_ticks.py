@@ -0,0 +1,28 @@
+import os
+import sys
+
+# moneyplanpro kökünü path'e ekle (scripts/ altından çalıştırılabilsin)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from services.price_bus import price_bus
+
+
+def main():
+    """
+    Kayıtlı bir tick dosyasını çalışan API'nin price bus'ına oynatır.
+    Tick'ler alarm liderinin unix soketine iletilir; her satır {"ts": epoch, "symbol": "BTC", "price": 65000.0}.
+    Kullanım: python scripts/replay_ticks.py ticks.jsonl [hız]   (hız 0 = bekleme yok, 1 = gerçek zamanlı)
+    """
+    if len(sys.argv) < 2:
+        print(main.__doc__)
+        sys.exit(1)
+    if not os.path.exists(price_bus.socket_path):
+        print(f"❌ Dinleyen alarm lideri yok ({price_bus.socket_path}).")
+        sys.exit(1)
+    speed = float(sys.argv[2]) if len(sys.argv) > 2 else 0.0
+    count = price_bus.replay(sys.argv[1], speed=speed)
+    stats = price_bus.stats()
+    print(f"✅ {count} tick oynatıldı, {stats['forwarded']} iletildi, {stats['errors']} hata.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+import threading
+from bisect import bisect_left, bisect_right
+
+
+class _SymbolThresholds:
+    """Tek bir sembolün sıralı eşik dizileri ("above" ve "below")."""
+
+    def __init__(self):
+        # Paralel diziler: hedef fiyatlar sıralı, id'ler aynı sırada
+        self.above_prices, self.above_ids = [], []
+        self.below_prices, self.below_ids = [], []
+
+    def __len__(self):
+        return len(self.above_ids) + len(self.below_ids)
+
+    def add(self, alert_id, target, is_above):
+        prices, ids = (self.above_prices, self.above_ids) if is_above else (self.below_prices, self.below_ids)
+        # Aynı fiyattaki eşikler eklenme sırasını korur (bisect_right)
+        pos = bisect_right(prices, target)
+        prices.insert(pos, target)
+        ids.insert(pos, alert_id)
+
+    def remove(self, alert_id, target, is_above):
+        prices, ids = (self.above_prices, self.above_ids) if is_above else (self.below_prices, self.below_ids)
+        lo, hi = bisect_left(prices, target), bisect_right(prices, target)
+        for pos in range(lo, hi):
+            if ids[pos] == alert_id:
+                del prices[pos], ids[pos]
+                return True
+        return False
+
+    def pop_triggered(self, price):
+        # "above": hedef <= fiyat olanlar dizinin başında; "below": hedef >= fiyat olanlar sonunda
+        k = bisect_right(self.above_prices, price)
+        fired = self.above_ids[:k]
+        del self.above_prices[:k], self.above_ids[:k]
+
+        k = bisect_left(self.below_prices, price)
+        fired += self.below_ids[k:]
+        del self.below_prices[k:], self.below_ids[k:]
+        return fired
+
+
+class AlertIndex:
+    """
+    Fiyat alarmları için bellek içi eşik indeksi.
+
+    Her sembol için "above" ve "below" hedefleri ayrı sıralı dizilerde tutulur; bir fiyat
+    güncellemesinde tetiklenen alarmlar bisect ile bulunur. Değerlendirme maliyeti toplam alarm
+    sayısıyla değil, tetiklenen alarm sayısıyla (artı O(log n)) orantılıdır.
+    Alarmlar eklendikçe/tetiklendikçe indeks artımlı güncellenir; sync() Supabase'den gelen
+    aktif listeyle yalnızca farkları uygular.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._symbols = {}
+        # id -> (symbol, target, is_above, alert)
+        self._alerts = {}
+
+    def __len__(self):
+        return len(self._alerts)
+
+    def symbols(self):
+        with self._lock:
+            return [s for s, t in self._symbols.items() if len(t)]
+
+    def add(self, alert):
+        """Alarmı indekse ekler; aynı id zaten varsa eşiği güncellenir."""
+        key = self._key(alert)
+        if key is None:
+            return False
+        with self._lock:
+            self._remove_locked(alert["id"])
+            self._add_locked(alert, key)
+        return True
+
+    def remove(self, alert_id):
+        with self._lock:
+            return self._remove_locked(alert_id)
+
+    def sync(self, alerts):
+        """
+        Aktif alarm listesini indekse yansıtır: yeni alarmlar eklenir, eşiği değişenler taşınır,
+        listede olmayanlar çıkarılır. Değişmeyen alarmlara dokunulmaz.
+        Dönüş: (eklenen, çıkarılan) sayıları.
+        """
+        incoming = {}
+        for alert in alerts:
+            key = self._key(alert)
+            if key is not None:
+                incoming[alert["id"]] = (key, alert)
+
+        added = removed = 0
+        with self._lock:
+            if not self._alerts:
+                # İlk yükleme: tek tek insert yerine sembol başına bir kez sırala
+                self._build_locked(incoming)
+                return len(incoming), 0
+            for alert_id in [a for a in self._alerts if a not in incoming]:
+                self._remove_locked(alert_id)
+                removed += 1
+            for alert_id, (key, alert) in incoming.items():
+                current = self._alerts.get(alert_id)
+                if current is not None and current[:3] == key:
+                    # Eşik aynı; yalnızca alarm verisini tazele (mesaj metni vb. için)
+                    self._alerts[alert_id] = key + (alert,)
+                    continue
+                if current is not None:
+                    self._remove_locked(alert_id)
+                self._add_locked(alert, key)
+                added += 1
+        return added, removed
+
+    def apply(self, rows):
+        """
+        Değişen satırları (delta) uygular: aktif olanlar eklenir/güncellenir, pasifleşenler çıkarılır.
+        Dönüş: (eklenen/güncellenen, çıkarılan) sayıları.
+        """
+        added = removed = 0
+        for row in rows:
+            if row.get("is_active", True):
+                added += self.add(row)
+            elif self.remove(row.get("id")):
+                removed += 1
+        return added, removed
+
+    def pop_triggered(self, symbol, price):
+        """Verilen fiyatta tetiklenen alarmları indeksten çıkarıp döner."""
+        with self._lock:
+            thresholds = self._symbols.get(symbol)
+            if not thresholds:
+                return []
+            return [self._alerts.pop(alert_id)[3] for alert_id in thresholds.pop_triggered(price)]
+
+    def _build_locked(self, incoming):
+        grouped = {}
+        for alert_id, (key, alert) in incoming.items():
+            symbol, target, is_above = key
+            grouped.setdefault(symbol, ([], []))[0 if is_above else 1].append((target, alert_id))
+            self._alerts[alert_id] = key + (alert,)
+        self._symbols = {}
+        for symbol, (above, below) in grouped.items():
+            thresholds = _SymbolThresholds()
+            # sorted() kararlıdır: aynı fiyattaki eşikler geliş sırasını korur
+            above.sort(key=lambda x: x[0])
+            below.sort(key=lambda x: x[0])
+            thresholds.above_prices = [t for t, _ in above]
+            thresholds.above_ids = [i for _, i in above]
+            thresholds.below_prices = [t for t, _ in below]
+            thresholds.below_ids = [i for _, i in below]
+            self._symbols[symbol] = thresholds
+
+    def _add_locked(self, alert, key):
+        symbol, target, is_above = key
+        self._symbols.setdefault(symbol, _SymbolThresholds()).add(alert["id"], target, is_above)
+        self._alerts[alert["id"]] = key + (alert,)
+
+    def _remove_locked(self, alert_id):
+        entry = self._alerts.pop(alert_id, None)
+        if entry is None:
+            return False
+        symbol, target, is_above, _ = entry
+        return self._symbols[symbol].remove(alert_id, target, is_above)
+
+    @staticmethod
+    def _key(alert):
+        symbol = str(alert.get("symbol") or "").upper().strip()
+        if not symbol or alert.get("id") is None:
+            return None
+        try:
+            target = float(alert.get("target_price", 0))
+        except (TypeError, ValueError):
+            return None
+        return symbol, target, bool(alert.get("is_above", True))
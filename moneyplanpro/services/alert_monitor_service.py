@@ -2,18 +2,39 @@ import time
 import threading
 import logging
 import requests
-from datetime import datetime
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
 from services.market_service import market_provider
 from services.notification_service import notification_service
 from services.settings_service import settings_service
+from utils.network import SafeRequest
+from utils.leader import alert_leader
+from services.alert_index import AlertIndex
+from services.price_bus import price_bus
+from services.quota_service import quota_service
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Columns the monitor needs from price_alerts (keeps delta pages small)
+ALERT_COLUMNS = "id,user_id,symbol,target_price,is_above,is_active,updated_at"
+# Alert ids per id=in.(...) PATCH (keeps the URL well under proxy limits with UUIDs)
+PATCH_CHUNK = 200
+# Parallel OneSignal calls when a cycle fires many distinct messages
+PUSH_WORKERS = 8
+
 class AlertMonitorService:
     def __init__(self):
         self._stop_event = threading.Event()
         self._thread = None
+        # Local replica of active alerts, indexed by symbol and threshold
+        self._index = AlertIndex()
+        # updated_at cursor for delta syncs; None forces a full (paged) reload
+        self._cursor = None
+        self._last_full_sync = 0
+        # Last price-bus tick per symbol; symbols that ticked within the interval are not polled
+        self._last_tick = {}
+        self._streaming = False
 
     def start(self):
         """Starts the background monitoring thread."""
@@ -24,24 +45,37 @@ class AlertMonitorService:
         self._stop_event.clear()
         self._thread = threading.Thread(target=self._monitor_loop, daemon=True)
         self._thread.start()
-        logger.info("Alert Monitor Service started (Supabase Mode).")
+        logger.info("Alert Monitor Service started (Supabase Mode, leader-elected).")
 
     def stop(self):
         """Stops the background monitoring thread."""
         self._stop_event.set()
         if self._thread:
             self._thread.join()
+        self._stop_streaming()
+        # Hand leadership over right away instead of waiting for process exit
+        alert_leader.release()
         logger.info("Alert Monitor Service stopped.")
 
     def _monitor_loop(self):
+        # Every uvicorn worker runs this loop, but only the worker holding alert_leader
+        # polls Supabase. Followers retry the lock each interval, so if the leader dies
+        # another worker takes over within one interval.
         while not self._stop_event.is_set():
             try:
                 # 1. Check if monitoring is enabled in settings
                 is_enabled = settings_service.get_value("ALERT_MONITOR_ENABLED", "1") == "1"
                 interval = int(settings_service.get_value("ALERT_MONITOR_INTERVAL_SEC", "60"))
 
-                if is_enabled:
-                    self._check_supabase_alerts()
+                if is_enabled and alert_leader.try_acquire():
+                    alert_leader.heartbeat()
+                    self._start_streaming()
+                    # Alert price lookups outrank prefetch and user requests when provider budgets run low
+                    with quota_service.priority("critical"):
+                        self._check_supabase_alerts()
+                    alert_leader.heartbeat()
+                else:
+                    self._stop_streaming()
 
                 # Sleep until next check
                 self._stop_event.wait(interval)
@@ -60,106 +94,205 @@ class AlertMonitorService:
             logger.warning("Supabase URL or Service Role Key is missing. Monitor skipped.")
             return
 
-        headers = {
-            "apikey": key,
-            "Authorization": f"Bearer {key}",
-            "Content-Type": "application/json"
-        }
+        headers = self._supabase_headers(key)
 
         try:
-            # Fetch active alerts from Supabase
-            params = {"is_active": "eq.true"}
-            response = requests.get(f"{url}/rest/v1/price_alerts", 
-                                    headers=headers, 
-                                    params=params,
-                                    timeout=15)
-            
-            if response.status_code != 200:
-                logger.error(f"Failed to fetch alerts from Supabase: {response.status_code} - {response.text}")
+            if not self._sync_alerts(url, headers):
                 return
-            
-            alerts = response.json()
-            if not alerts:
+            if not len(self._index):
                 return
 
-            logger.info(f"Checking {len(alerts)} active price alerts...")
-            
-            price_cache = {}
+            # Resolve every distinct symbol up front through the providers' batch APIs.
+            # Symbols that ticked on the price bus during the last interval were already evaluated.
+            interval = int(settings_service.get_value("ALERT_MONITOR_INTERVAL_SEC", "60"))
+            now = time.time()
+            symbols = [s for s in self._index.symbols() if now - self._last_tick.get(s, 0) >= interval]
+            logger.info(f"Checking {len(self._index)} active price alerts; polling {len(symbols)} symbols...")
+            prices = market_provider.get_prices(symbols) if symbols else {}
 
-            for alert in alerts:
-                self._handle_single_alert(alert, price_cache, url, headers)
+            # Only the alerts whose threshold was crossed are touched (bisect on the symbol's index)
+            fired = []
+            for symbol, current_price in prices.items():
+                if current_price > 0:
+                    fired.extend((alert, current_price) for alert in self._index.pop_triggered(symbol, current_price))
+            if fired:
+                self._trigger_alerts(fired, url, headers)
 
         except requests.exceptions.RequestException as e:
             logger.error(f"Connection error while fetching alerts: {e}")
         except Exception as e:
             logger.error(f"Unexpected error in _check_supabase_alerts: {e}")
 
-    def _handle_single_alert(self, alert, price_cache, url, headers):
-        symbol = alert.get("symbol")
-        if not symbol: return
-        
-        if symbol not in price_cache:
-            try:
-                asset_data = market_provider.get_asset_detail(symbol)
-                price_cache[symbol] = float(asset_data.get("price", 0))
-            except Exception as e:
-                logger.error(f"Error getting price for {symbol}: {e}")
-                price_cache[symbol] = 0
+    def _start_streaming(self):
+        """Subscribes to the price bus and accepts ticks forwarded by the other workers."""
+        if self._streaming:
+            return
+        try:
+            price_bus.listen()
+        except OSError as e:
+            logger.error(f"Price bus listener failed, relying on polling only: {e}")
+        price_bus.subscribe(self._on_ticks)
+        self._streaming = True
 
-        current_price = price_cache[symbol]
-        if current_price <= 0:
+    def _stop_streaming(self):
+        if not self._streaming:
             return
+        price_bus.unsubscribe(self._on_ticks)
+        price_bus.close()
+        self._streaming = False
 
-        target_price = float(alert.get("target_price", 0))
-        is_above = bool(alert.get("is_above", True))
-        
-        triggered = (is_above and current_price >= target_price) or (not is_above and current_price <= target_price)
+    def _on_ticks(self, ticks):
+        """Price bus callback: evaluates only the symbols that ticked."""
+        now = time.time()
+        fired = []
+        for symbol, price in ticks.items():
+            self._last_tick[symbol] = now
+            fired.extend((alert, price) for alert in self._index.pop_triggered(symbol, price))
+        if not fired:
+            return
+        url, key = self._get_supabase_config()
+        if not url or not key:
+            return
+        self._trigger_alerts(fired, url, self._supabase_headers(key))
 
-        if triggered:
-            self._trigger_supabase_alert(alert, current_price, url, headers)
+    def _supabase_headers(self, key):
+        return {
+            "apikey": key,
+            "Authorization": f"Bearer {key}",
+            "Content-Type": "application/json"
+        }
 
-    def _trigger_supabase_alert(self, alert, current_price, url, headers):
-        alert_id = alert.get("id")
-        user_id = alert.get("user_id")
-        symbol = alert.get("symbol")
-        
-        if not alert_id or not user_id: return
+    def _sync_alerts(self, url, headers):
+        """
+        Keeps the local alert replica up to date.
+        The first cycle (and every ALERT_FULL_SYNC_SEC) pages through all active alerts;
+        other cycles only pull rows whose updated_at moved past the cursor.
+        Hard deletes are not visible to the delta query and are picked up by the next full reload.
+        """
+        full_every = int(settings_service.get_value("ALERT_FULL_SYNC_SEC", "3600"))
+        if self._cursor is None or time.time() - self._last_full_sync >= full_every:
+            started = time.time()
+            rows = self._fetch_alert_pages(url, headers, {"is_active": "eq.true"})
+            if rows is None:
+                return False
+            added, removed = self._index.sync(rows)
+            self._last_full_sync = started
+            mode = "full"
+        else:
+            # Re-read a short overlap window so rows committed late (or updated mid-page) are not missed
+            overlap = int(settings_service.get_value("ALERT_SYNC_OVERLAP_SEC", "120"))
+            since = self._cursor - timedelta(seconds=overlap)
+            rows = self._fetch_alert_pages(url, headers, {"updated_at": f"gte.{since.isoformat()}"})
+            if rows is None:
+                return False
+            added, removed = self._index.apply(rows)
+            mode = "delta"
+
+        stamps = [ts for ts in map(self._parse_ts, (r.get("updated_at") for r in rows)) if ts]
+        if self._cursor is not None:
+            stamps.append(self._cursor)
+        # Empty table: deltas can start from now (the overlap window absorbs clock skew)
+        self._cursor = max(stamps) if stamps else datetime.now().astimezone()
+        if added or removed:
+            logger.info(f"Alert replica {mode} sync: +{added}/-{removed} ({len(self._index)} active)")
+        return True
+
+    def _fetch_alert_pages(self, url, headers, filters):
+        """Keyset-paged PostgREST read (id=gt.<last id>, order=id.asc). Returns None on failure."""
+        page_size = int(settings_service.get_value("ALERT_SYNC_PAGE_SIZE", "1000"))
+        rows, last_id = [], None
+        while True:
+            params = dict(filters, select=ALERT_COLUMNS, order="id.asc", limit=str(page_size))
+            if last_id is not None:
+                params["id"] = f"gt.{last_id}"
+            response = SafeRequest.request("GET", f"{url}/rest/v1/price_alerts",
+                                           headers=headers, params=params, timeout=15)
+            if response.status_code != 200:
+                logger.error(f"Failed to fetch alerts from Supabase: {response.status_code} - {response.text}")
+                return None
+            page = response.json()
+            rows.extend(page)
+            if len(page) < page_size:
+                return rows
+            last_id = page[-1]["id"]
+
+    @staticmethod
+    def _parse_ts(value):
+        try:
+            return datetime.fromisoformat(value)
+        except (TypeError, ValueError):
+            return None
+
+    def _trigger_alerts(self, fired, url, headers):
+        """
+        Fires one cycle's triggered alerts in bulk:
+        one id=in.(...) PATCH per chunk claims them, then pushes go out grouped by identical
+        message, each group as include_external_user_ids batches.
+        """
+        fired = [(alert, price) for alert, price in fired if alert.get("id") and alert.get("user_id")]
+        claimed, failed = self._deactivate_alerts([alert["id"] for alert, _ in fired], url, headers)
 
+        groups = {}
+        for alert, price in fired:
+            if alert["id"] in failed:
+                # Supabase unreachable: put the alert back so the next cycle retries it
+                self._index.add(alert)
+            elif alert["id"] in claimed:
+                groups.setdefault(self._alert_message(alert, price), []).append(alert["user_id"])
+
+        logger.info(f"Triggered {len(claimed)} alerts ({len(fired) - len(claimed) - len(failed)} already inactive), "
+                    f"{len(groups)} push groups")
+        with ThreadPoolExecutor(max_workers=PUSH_WORKERS) as executor:
+            for (title, message), user_ids in groups.items():
+                executor.submit(self._send_group, title, message, user_ids)
+
+    def _alert_message(self, alert, current_price):
+        symbol = alert.get("symbol")
         target_price = float(alert.get("target_price", 0))
         is_above = bool(alert.get("is_above", True))
 
         direction = "üstüne çıktı" if is_above else "altına düştü"
         title = f"🎯 {symbol} Hedefe Ulaştı!"
         message = f"{symbol} şu an {current_price:.2f} seviyesinde. Hedefiniz olan {target_price:.2f} {direction}."
+        return title, message
 
-        logger.info(f"Triggering alert {alert_id} for user {user_id} on {symbol}")
-
-        # Send push notification
+    def _send_group(self, title, message, user_ids):
         try:
-            success, res_msg = notification_service.send_push(
-                title=title,
-                message=message,
-                segment=f"user_{user_id}" 
-            )
-            if not success:
-                logger.error(f"Push failed: {res_msg}")
+            for success, res_msg in notification_service.send_push_batch(title, message, user_ids):
+                if not success:
+                    logger.error(f"Push failed: {res_msg}")
         except Exception as e:
             logger.error(f"Error sending push: {e}")
 
-        # Update Supabase: Mark as inactive
-        try:
-            payload = {
-                "is_active": False,
-                "last_triggered_at": datetime.now().isoformat()
-            }
-            resp = requests.patch(f"{url}/rest/v1/price_alerts", 
-                                  headers=headers, 
-                                  params={"id": f"eq.{alert_id}"},
-                                  json=payload, 
-                                  timeout=10)
-            if resp.status_code not in [200, 201, 204]:
-                logger.error(f"Failed to update alert status in Supabase: {resp.text}")
-        except Exception as e:
-            logger.error(f"Error updating alert in Supabase: {e}")
+    def _deactivate_alerts(self, alert_ids, url, headers):
+        """
+        Marks alerts inactive in Supabase with id=in.(...) PATCHes (PATCH_CHUNK ids each).
+        Only rows that were still active are returned (claimed); the replica can be a cycle behind,
+        so deleted or already-fired alerts never get a push.
+        Returns (claimed ids, ids whose PATCH failed).
+        """
+        claimed, failed = set(), set()
+        payload = {
+            "is_active": False,
+            "last_triggered_at": datetime.now().isoformat()
+        }
+        for i in range(0, len(alert_ids), PATCH_CHUNK):
+            chunk = alert_ids[i:i + PATCH_CHUNK]
+            try:
+                resp = SafeRequest.request("PATCH", f"{url}/rest/v1/price_alerts", 
+                                      headers=dict(headers, Prefer="return=representation"),
+                                      params={"id": f"in.({','.join(map(str, chunk))})",
+                                              "is_active": "eq.true", "select": "id"},
+                                      json=payload, 
+                                      timeout=15)
+                if resp.status_code not in [200, 201]:
+                    logger.error(f"Failed to update alert status in Supabase: {resp.text}")
+                    failed.update(chunk)
+                    continue
+                claimed.update(row["id"] for row in resp.json())
+            except Exception as e:
+                logger.error(f"Error updating alerts in Supabase: {e}")
+                failed.update(chunk)
+        return claimed, failed
 
 alert_monitor_service = AlertMonitorService()
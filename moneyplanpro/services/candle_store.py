@@ -0,0 +1,194 @@
+import time
+import calendar
+import logging
+from datetime import datetime
+from database import db_connection
+from utils.cache import cache
+from services.settings_service import settings_service
+
+logger = logging.getLogger(__name__)
+
+# Mum aralıklarının saniye karşılıkları (delta kontrol sıklığı için)
+INTERVAL_SECONDS = {
+    "1d": 86400, "5d": 5 * 86400, "1wk": 7 * 86400,
+    "1mo": 30 * 86400, "3mo": 90 * 86400,
+}
+# İlk mum pencere başından bu kadar sonra olsa da pencere kapsanmış sayılır (hafta sonu, tatil)
+COVERAGE_SLACK_SEC = 7 * 86400
+
+# Grafik periyotlarının gün karşılıkları (pencere başlangıcı için)
+PERIOD_DAYS = {
+    "1d": 1, "5d": 5, "1wk": 7, "1mo": 30, "3mo": 90, "6mo": 180,
+    "1y": 365, "2y": 730, "5y": 5 * 365, "10y": 10 * 365,
+}
+
+
+def period_start(period):
+    """Periyodun başlangıç zamanı (epoch). 'max' için None (tüm geçmiş)."""
+    if period == "max":
+        return None
+    if period == "ytd":
+        return datetime(datetime.now().year, 1, 1).timestamp()
+    return time.time() - PERIOD_DAYS.get(period, 30) * 86400
+
+
+class CandleStore:
+    """
+    SQLite tabanlı OHLCV mum deposu (invest_guide.db -> ohlcv_candles).
+
+    Grafik isteklerinde tüm seri upstream'den tekrar indirilmez:
+    - (feed, symbol, interval) için ilk istekte istenen periyot bir kez tam indirilir,
+    - sonraki isteklerde yalnızca son kayıtlı mumdan sonrası (delta) çekilip upsert edilir,
+    - kaynak istenenden kısa seri dönerse (ör. investpy 30 gün, FMP 100 satır) kapsam depodaki ilk mumdur;
+      aynı pencere, delta süresi (refresh_after) dolunca yeniden tam indirilir, her istekte değil,
+    - seri her zaman yerel tablodan okunur.
+    Son mum (henüz kapanmamış gün) her delta'da yeniden yazılır.
+    Gün içi (intraday) aralıklar depolanmaz, doğrudan upstream'den gelir. Depolanan aralıklar gün bazlı
+    olduğundan mum anahtarı (ts) kaynağın tarihinin UTC gün başıdır; kaynak değişse de aynı gün tek mumdur.
+    """
+
+    def supports(self, interval):
+        return interval in INTERVAL_SECONDS
+
+    def refresh_after(self, interval):
+        """Delta kontrolleri arasındaki süre: mum aralığı, ancak en fazla HISTORY_DELTA_MAX_AGE saniye."""
+        max_age = float(settings_service.get_value("HISTORY_DELTA_MAX_AGE", "900"))
+        return min(INTERVAL_SECONDS[interval], max_age)
+
+    def get_series(self, feed, symbol, interval, start, fetch):
+        """
+        start: pencerenin başlangıcı (epoch saniye, None = tüm geçmiş).
+        fetch(since): since None ise periyodun tamamını, değilse since (epoch) ve sonrasındaki mumları döner.
+        """
+        if not self.supports(interval):
+            return fetch(None)
+
+        symbol = symbol.upper()
+        try:
+            # Aynı seri ve pencere için eşzamanlı istekler tek bir upstream delta'sı paylaşır.
+            # Pencere başlangıcı anahtarda: 5y isteği, eşzamanlı 1mo yüklemesine bağlanıp kısa seri almasın.
+            flight_key = f"candles_{feed}_{symbol}_{interval}_{self._day_floor(start)}"
+            cache.flights.do(flight_key, lambda: self._sync(feed, symbol, interval, start, fetch))
+            rows = self._read(feed, symbol, interval, start)
+        except Exception as e:
+            logger.error(f"Candle store error ({feed}:{symbol}:{interval}): {e}")
+            return fetch(None)
+        return rows
+
+    def _sync(self, feed, symbol, interval, start, fetch):
+        now = time.time()
+        want_from = int(start or 0)
+        state = self._state(feed, symbol, interval)
+
+        stale = state is not None and now - (state["last_sync"] or 0) >= self.refresh_after(interval)
+
+        # İlk istek, daha önce denenmemiş daha uzun bir periyot ya da kısa kalmış bir pencerenin
+        # süresi dolmuş kontrolü: tam indirme (backfill)
+        if state is None or state["covered_from"] is None or (want_from < state["covered_from"] and (
+                state["requested_from"] is None or want_from < state["requested_from"] or stale)):
+            bars = fetch(None)
+            if bars:
+                self._upsert(feed, symbol, interval, bars)
+            elif state is None:
+                return
+            # Farklı pencereler paralel indirebilir; daha uzun bir kapsamı geri daraltma
+            state = self._state(feed, symbol, interval) or {"covered_from": None, "requested_from": None}
+            covered = self._coverage(feed, symbol, interval, want_from)
+            if state["covered_from"] is not None:
+                covered = min(covered, state["covered_from"])
+            requested = want_from if state["requested_from"] is None else min(want_from, state["requested_from"])
+            self._save_state(feed, symbol, interval, covered, now, requested)
+            return
+
+        if not stale:
+            return
+
+        last_ts = self._last_ts(feed, symbol, interval)
+        bars = fetch(last_ts)
+        if bars:
+            self._upsert(feed, symbol, interval, bars)
+        # Boş delta (hafta sonu, tatil) da bir kontrol sayılır; upstream'i boşuna yoklamayalım
+        self._save_state(feed, symbol, interval, state["covered_from"], now, state["requested_from"])
+
+    def _coverage(self, feed, symbol, interval, want_from):
+        """Depodaki serinin kapsadığı en eski zaman: ilk mum pencere başına yakınsa pencere başı, değilse ilk mum."""
+        with db_connection() as conn:
+            first = conn.execute(
+                "SELECT MIN(ts) FROM ohlcv_candles WHERE feed = ? AND symbol = ? AND interval = ?",
+                (feed, symbol, interval)
+            ).fetchone()[0]
+        if first is None:
+            return None
+        slack = max(COVERAGE_SLACK_SEC, 2 * INTERVAL_SECONDS[interval])
+        return first if first - want_from > slack else min(want_from, first)
+
+    def _state(self, feed, symbol, interval):
+        with db_connection() as conn:
+            row = conn.execute(
+                "SELECT covered_from, requested_from, last_sync FROM ohlcv_sync_state "
+                "WHERE feed = ? AND symbol = ? AND interval = ?",
+                (feed, symbol, interval)
+            ).fetchone()
+            return dict(row) if row else None
+
+    def _save_state(self, feed, symbol, interval, covered_from, last_sync, requested_from=None):
+        with db_connection() as conn:
+            conn.execute("""
+                INSERT OR REPLACE INTO ohlcv_sync_state (feed, symbol, interval, covered_from, requested_from, last_sync)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, (feed, symbol, interval, covered_from, requested_from, last_sync))
+
+    def _last_ts(self, feed, symbol, interval):
+        with db_connection() as conn:
+            row = conn.execute(
+                "SELECT MAX(ts) FROM ohlcv_candles WHERE feed = ? AND symbol = ? AND interval = ?",
+                (feed, symbol, interval)
+            ).fetchone()
+            return row[0]
+
+    def _upsert(self, feed, symbol, interval, bars):
+        rows = []
+        for bar in bars:
+            ts = self._to_ts(bar.get("date"))
+            if ts is None:
+                continue
+            rows.append((feed, symbol, interval, ts, str(bar["date"]), bar.get("open"), bar.get("high"),
+                         bar.get("low"), bar.get("close"), bar.get("volume")))
+        if not rows:
+            return
+        with db_connection() as conn:
+            conn.executemany("""
+                INSERT OR REPLACE INTO ohlcv_candles (feed, symbol, interval, ts, date, open, high, low, close, volume)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, rows)
+
+    def _read(self, feed, symbol, interval, start):
+        # Pencereyi gün başına yuvarla ki periyodun ilk günü de dahil olsun
+        floor = self._day_floor(start)
+        with db_connection() as conn:
+            rows = conn.execute("""
+                SELECT date, open, high, low, close, volume FROM ohlcv_candles
+                WHERE feed = ? AND symbol = ? AND interval = ? AND ts >= ?
+                ORDER BY ts
+            """, (feed, symbol, interval, floor)).fetchall()
+            return [dict(r) for r in rows]
+
+    @staticmethod
+    def _day_floor(start):
+        """Pencere başlangıcının (yerel) takvim gününün UTC gün başı; None = tüm geçmiş (0)."""
+        if not start:
+            return 0
+        return calendar.timegm(datetime.fromtimestamp(start).date().timetuple())
+
+    @staticmethod
+    def _to_ts(value):
+        """Mum anahtarı: tarihin kendi saat dilimindeki takvim gününün UTC gece yarısı (epoch)."""
+        try:
+            if not isinstance(value, datetime):
+                value = datetime.fromisoformat(str(value))
+            return calendar.timegm(value.date().timetuple())
+        except (TypeError, ValueError):
+            return None
+
+
+candle_store = CandleStore()
@@ -1,84 +1,138 @@
+import time
+import asyncio
+from datetime import datetime
 from pycoingecko import CoinGeckoAPI
 from utils.cache import cache
+from utils.network import SafeRequest, AsyncSafeRequest
 from services.settings_service import settings_service
+from services.candle_store import candle_store, INTERVAL_SECONDS
+from services.price_bus import price_bus
+from services.symbol_registry import symbol_registry
+
+COINGECKO_MARKETS_URL = "https://api.coingecko.com/api/v3/coins/markets"
+FEAR_GREED_URL = "https://api.alternative.me/fng/?limit=1"
+BINANCE_24H_URL = "https://api.binance.com/api/v3/ticker/24hr"
+BINANCE_KLINES_URL = "https://api.binance.com/api/v3/klines"
+BINANCE_PRICE_URL = "https://api.binance.com/api/v3/ticker/price"
+FEAR_GREED_DEFAULT = {"value": 50, "classification": "Neutral", "timestamp": "0"}
 
 class CryptoService:
     def __init__(self):
         self.cg = CoinGeckoAPI()
 
-    def get_top_coins(self, limit=50):
+    def get_top_coins(self, limit=50, force_refresh=False):
         """
         Binance API (US Kısıtlaması) yerine CoinGecko Markets API kullanılır.
         """
-        cache_key = f"crypto_gecko_top_{limit}"
-        cached = cache.get(cache_key)
-        if cached:
-            return cached
+        # Varsayılan 10 dk taze, sonraki 1 saat bayat veri anında dönüp arka planda yenilenir
+        ttl = int(settings_service.get_value("CACHE_TTL_CRYPTO", 600))
+        return cache.get_or_load(f"crypto_gecko_top_{limit}", lambda: self._fetch_top_coins(limit),
+                                 ttl_seconds=ttl, stale_ttl_seconds=3600, force_refresh=force_refresh)
+
+    async def aget_top_coins(self, limit=50, force_refresh=False):
+        """get_top_coins'in async versiyonu (aynı cache anahtarını paylaşır)."""
+        ttl = int(settings_service.get_value("CACHE_TTL_CRYPTO", 600))
+        return await cache.aget_or_load(f"crypto_gecko_top_{limit}", lambda: self._afetch_top_coins(limit),
+                                        ttl_seconds=ttl, stale_ttl_seconds=3600, force_refresh=force_refresh)
 
+    def _markets_params(self, limit):
+        # CoinGecko Markets (Resim, Fiyat, Değişim hepsi tek endpointte)
+        return {
+            "vs_currency": "usd",
+            "order": "volume_desc", # Hacme göre sırala
+            "per_page": limit,
+            "page": 1,
+            "sparkline": "false"
+        }
+
+    def _fetch_top_coins(self, limit):
         try:
-            import requests
-            # CoinGecko Markets (Resim, Fiyat, Değişim hepsi tek endpointte)
-            url = "https://api.coingecko.com/api/v3/coins/markets"
-            params = {
-                "vs_currency": "usd",
-                "order": "volume_desc", # Hacme göre sırala
-                "per_page": limit,
-                "page": 1,
-                "sparkline": "false"
-            }
             # Demo API (Rate limit: 30 calls/min)
-            resp = requests.get(url, params=params, timeout=10)
-            
+            resp = SafeRequest.request("GET", COINGECKO_MARKETS_URL, params=self._markets_params(limit), timeout=10)
             if resp.status_code == 200:
-                data = resp.json()
-                results = []
-                for item in data:
-                    results.append({
-                        "id": item['id'],
-                        "symbol": item['symbol'].upper(),
-                        "name": item['name'],
-                        "price": float(item['current_price'] or 0),
-                        "change_24h": float(item['price_change_percentage_24h'] or 0),
-                        "market_cap": float(item['market_cap'] or 0),
-                        "volume": float(item['total_volume'] or 0),
-                        "image": item['image']
-                    })
-                
-                cache.set(cache_key, results, ttl_seconds=600)
-                return results
+                return self._parse_markets(resp.json())
+        except Exception as e:
+            print(f"CoinGecko Error: {e}")
+
+        return []
 
+    async def _afetch_top_coins(self, limit):
+        try:
+            resp = await AsyncSafeRequest.get(COINGECKO_MARKETS_URL, params=self._markets_params(limit), timeout=10)
+            if resp.status_code == 200:
+                return self._parse_markets(resp.json())
         except Exception as e:
             print(f"CoinGecko Error: {e}")
-            
+
         return []
 
+    def _parse_markets(self, data):
+        results = []
+        for item in data:
+            results.append({
+                "id": item['id'],
+                "symbol": item['symbol'].upper(),
+                "name": item['name'],
+                "price": float(item['current_price'] or 0),
+                "change_24h": float(item['price_change_percentage_24h'] or 0),
+                "market_cap": float(item['market_cap'] or 0),
+                "volume": float(item['total_volume'] or 0),
+                "image": item['image']
+            })
+        self._publish_ticks({item["symbol"]: item["price"] for item in results})
+        return results
+
+    def _publish_ticks(self, prices):
+        """
+        Yalnızca sembol kaydında kripto olan semboller yayınlanır: bus tick'leri sınıfsız sembolle
+        anahtarlandığı için EURUSDT -> EUR ya da TUSDT -> T gibi çiftler döviz/hisse alarmlarını tetiklememeli.
+        """
+        price_bus.publish_many({s: p for s, p in prices.items() if symbol_registry.is_crypto(s)})
+
     def get_fear_greed_index(self):
         """
         Kripto Korku ve Açgözlülük Endeksini getirir.
         Cache: 1 saat
         """
-        cache_key = "crypto_fear_greed"
-        cached = cache.get(cache_key)
-        if cached:
-            return cached
+        result = cache.get_or_load("crypto_fear_greed", self._fetch_fear_greed_index, ttl_seconds=3600)
+        return result if result else FEAR_GREED_DEFAULT
+
+    async def aget_fear_greed_index(self):
+        result = await cache.aget_or_load("crypto_fear_greed", self._afetch_fear_greed_index, ttl_seconds=3600)
+        return result if result else FEAR_GREED_DEFAULT
 
+    def _fetch_fear_greed_index(self):
         try:
-            import requests
-            resp = requests.get("https://api.alternative.me/fng/?limit=1", timeout=5)
+            resp = SafeRequest.request("GET", FEAR_GREED_URL, timeout=5)
             if resp.status_code == 200:
-                data = resp.json()
-                if data and "data" in data and len(data["data"]) > 0:
-                    result = {
-                        "value": int(data["data"][0]["value"]),
-                        "classification": data["data"][0]["value_classification"],
-                        "timestamp": data["data"][0]["timestamp"]
-                    }
-                    cache.set(cache_key, result, ttl_seconds=3600)
-                    return result
+                return self._parse_fear_greed(resp.json())
         except Exception as e:
             print(f"Fear & Greed Error: {e}")
-        
-        return {"value": 50, "classification": "Neutral", "timestamp": "0"}
+
+        return None
+
+    async def _afetch_fear_greed_index(self):
+        try:
+            resp = await AsyncSafeRequest.get(FEAR_GREED_URL, timeout=5)
+            if resp.status_code == 200:
+                return self._parse_fear_greed(resp.json())
+        except Exception as e:
+            print(f"Fear & Greed Error: {e}")
+
+        return None
+
+    def _parse_fear_greed(self, data):
+        if data and "data" in data and len(data["data"]) > 0:
+            return {
+                "value": int(data["data"][0]["value"]),
+                "classification": data["data"][0]["value_classification"],
+                "timestamp": data["data"][0]["timestamp"]
+            }
+        return None
+
+    def _binance_headers(self):
+        binance_key = settings_service.get_value("BINANCE_API_KEY")
+        return {"X-MBX-APIKEY": binance_key} if binance_key else {}
 
     def get_asset_detail(self, symbol):
         """
@@ -87,106 +141,183 @@ class CryptoService:
         - 52 Hafta (1 Yıl) En Yüksek / En Düşük (Klines üzerinden hesaplanır)
         """
         symbol = self._get_binance_symbol(symbol)
-        result = {}
-        
+
         try:
-            binance_key = settings_service.get_value("BINANCE_API_KEY")
-            headers = {"X-MBX-APIKEY": binance_key} if binance_key else {}
+            headers = self._binance_headers()
 
             # 1. 24 Saatlik İstatistikler (Hacim, Günlük Aralık)
             # https://api.binance.com/api/v3/ticker/24hr?symbol=BTCUSDT
-            url_24h = "https://api.binance.com/api/v3/ticker/24hr"
-            r1 = requests.get(url_24h, params={"symbol": symbol}, headers=headers, timeout=5)
-            if r1.status_code == 200:
-                d = r1.json()
-                result["price"] = float(d.get("lastPrice", 0))
-                result["change_percent"] = float(d.get("priceChangePercent", 0))
-                result["volume"] = float(d.get("quoteVolume", 0)) # USDT Hacmi
-                result["high_24h"] = float(d.get("highPrice", 0))
-                result["low_24h"] = float(d.get("lowPrice", 0))
-                # Market Cap Binance'de yok, frontend "-" gösterecek veya 0
-                result["market_cap"] = 0 
-            
+            r1 = SafeRequest.request("GET", BINANCE_24H_URL, params={"symbol": symbol}, headers=headers, timeout=5)
+
             # 2. 52 Haftalık (1 Yıllık) En Yüksek / Düşük Hesabı
             # Haftalık mumlardan son 52 tanesini alıp min/max bulacağız
-            url_kline = "https://api.binance.com/api/v3/klines"
-            r2 = requests.get(url_kline, params={"symbol": symbol, "interval": "1w", "limit": 52}, headers=headers, timeout=5)
-            if r2.status_code == 200:
-                klines = r2.json()
-                highs = [float(k[2]) for k in klines]
-                lows = [float(k[3]) for k in klines]
-                if highs and lows:
-                    result["high_52w"] = max(highs)
-                    result["low_52w"] = min(lows)
-            
-            # Ek bilgiler
-            result["symbol"] = symbol.replace("USDT", "")
-            result["currency"] = "USD"
-            
-            return result
+            r2 = SafeRequest.request("GET", BINANCE_KLINES_URL, params={"symbol": symbol, "interval": "1w", "limit": 52}, headers=headers, timeout=5)
+
+            return self._build_asset_detail(symbol, r1, r2)
+
+        except Exception as e:
+            print(f"Asset Detail Error ({symbol}): {e}")
+            return {"price": 0}
+
+    async def aget_asset_detail(self, symbol):
+        """get_asset_detail'in async versiyonu: 24s ve 52h istekleri paralel atılır."""
+        symbol = self._get_binance_symbol(symbol)
+
+        try:
+            headers = self._binance_headers()
+            r1, r2 = await asyncio.gather(
+                AsyncSafeRequest.get(BINANCE_24H_URL, params={"symbol": symbol}, headers=headers, timeout=5),
+                AsyncSafeRequest.get(BINANCE_KLINES_URL, params={"symbol": symbol, "interval": "1w", "limit": 52}, headers=headers, timeout=5)
+            )
+            return self._build_asset_detail(symbol, r1, r2)
 
         except Exception as e:
             print(f"Asset Detail Error ({symbol}): {e}")
             return {"price": 0}
 
+    def get_prices(self, symbols):
+        """
+        Çoklu kripto fiyatı: Binance ticker/price tek istekte tüm çiftleri döner (ağırlık 4).
+        Geçersiz bir sembol tüm batch'i 400 ile düşürdüğü için sembol listesi gönderilmez.
+        Dönüş: {istenen_sembol: USDT fiyatı}
+        """
+        if not symbols:
+            return {}
+        tickers = cache.get_or_load("binance_all_prices", self._fetch_all_prices, ttl_seconds=5)
+        results = {}
+        for s in symbols:
+            price = (tickers or {}).get(self._get_binance_symbol(s))
+            if price:
+                results[s] = price
+        return results
+
+    def _fetch_all_prices(self):
+        try:
+            r = SafeRequest.request("GET", BINANCE_PRICE_URL, headers=self._binance_headers(), timeout=10)
+            if r.status_code == 200:
+                tickers = {t["symbol"]: float(t["price"]) for t in r.json()}
+                # USDT çiftleri baz sembolle yayınlanır (BTCUSDT -> BTC)
+                self._publish_ticks({s[:-4]: p for s, p in tickers.items() if s.endswith("USDT") and len(s) > 4})
+                return tickers
+            print(f"Binance Price Error: {r.status_code}")
+        except Exception as e:
+            print(f"Binance Price Error: {e}")
+        return None
+
+    def get_quotes(self, symbols):
+        """
+        Çoklu kripto kotasyonu (fiyat + 24s değişim): ticker/24hr parametresiz tek istekte tüm çiftleri döner.
+        Ağırlığı yüksek (80) olduğu için sonuç kısa süre cache'lenir.
+        Dönüş: {istenen_sembol: {"price", "change_percent", "volume", "high_24h", "low_24h"}}
+        """
+        if not symbols:
+            return {}
+        tickers = cache.get_or_load("binance_all_24h", self._fetch_all_24h, ttl_seconds=10)
+        results = {}
+        for s in symbols:
+            quote = (tickers or {}).get(self._get_binance_symbol(s))
+            if quote and quote["price"]:
+                results[s] = quote
+        return results
+
+    def _fetch_all_24h(self):
+        try:
+            r = SafeRequest.request("GET", BINANCE_24H_URL, headers=self._binance_headers(), timeout=10)
+            if r.status_code == 200:
+                return {t["symbol"]: {
+                    "price": float(t.get("lastPrice", 0)),
+                    "change_percent": float(t.get("priceChangePercent", 0)),
+                    "volume": float(t.get("quoteVolume", 0)),
+                    "high_24h": float(t.get("highPrice", 0)),
+                    "low_24h": float(t.get("lowPrice", 0))
+                } for t in r.json()}
+            print(f"Binance 24h Error: {r.status_code}")
+        except Exception as e:
+            print(f"Binance 24h Error: {e}")
+        return None
+
+    def _build_asset_detail(self, symbol, r1, r2):
+        result = {}
+        if r1.status_code == 200:
+            d = r1.json()
+            result["price"] = float(d.get("lastPrice", 0))
+            result["change_percent"] = float(d.get("priceChangePercent", 0))
+            result["volume"] = float(d.get("quoteVolume", 0)) # USDT Hacmi
+            result["high_24h"] = float(d.get("highPrice", 0))
+            result["low_24h"] = float(d.get("lowPrice", 0))
+            # Market Cap Binance'de yok, frontend "-" gösterecek veya 0
+            result["market_cap"] = 0
+
+        if r2.status_code == 200:
+            klines = r2.json()
+            highs = [float(k[2]) for k in klines]
+            lows = [float(k[3]) for k in klines]
+            if highs and lows:
+                result["high_52w"] = max(highs)
+                result["low_52w"] = min(lows)
+
+        # Ek bilgiler
+        result["symbol"] = symbol.replace("USDT", "")
+        result["currency"] = "USD"
+
+        return result
+
     def _get_binance_symbol(self, symbol):
-        s = symbol.upper()
-        if not s.endswith("USDT") and s != "USDT":
-            return f"{s}USDT"
-        return s
+        return symbol_registry.lookup(symbol)["binance"]
+
+    def _history_params(self, symbol, period, interval):
+        # Period -> Limit dönüşümü (Basit mantık)
+        limit = 30
+        if period == "1wk": limit = 7
+        elif period == "1mo": limit = 30
+        elif period == "3mo": limit = 90
+        elif period == "1y": limit = 365
+        elif period == "ytd": limit = 180
+        elif period == "max": limit = 500
+
+        return {
+            "symbol": self._get_binance_symbol(symbol),
+            "interval": interval if interval in ['1d', '1wk', '1mo'] else '1d',
+            "limit": limit
+        }
 
     def get_history(self, symbol, period="1mo", interval="1d"):
         """
         Binance API üzerinden tarihsel verileri (Klines) çeker.
         Symbol: BTC, ETH vs. (Sonuna USDT eklenir)
+        Mumlar yerel depoda tutulur; Binance'e yalnızca son mumdan sonrası için gidilir.
         """
+        params = self._history_params(symbol, period, interval)
+        start = time.time() - params["limit"] * INTERVAL_SECONDS.get(params["interval"], 86400)
+        return candle_store.get_series("binance", params["symbol"], params["interval"], start,
+                                       lambda since: self._fetch_klines(params, since))
+
+    def _fetch_klines(self, params, since=None):
+        if since:
+            # Delta: son kayıtlı mumdan (dahil) itibaren; son mum kapanmamış olabilir, yeniden yazılır
+            params = {**params, "startTime": int(since * 1000), "limit": 1000}
         try:
-            import requests
-            # Sembolü düzelt (BTC -> BTCUSDT)
-            symbol = symbol.upper()
-            if not symbol.endswith("USDT") and symbol != "USDT": 
-                symbol = f"{symbol}USDT"
-            
-            # Period -> Limit dönüşümü (Basit mantık)
-            limit = 30
-            if period == "1wk": limit = 7
-            elif period == "1mo": limit = 30
-            elif period == "3mo": limit = 90
-            elif period == "1y": limit = 365
-            elif period == "ytd": limit = 180
-            elif period == "max": limit = 500
-
-            # Binance Klines Endpoint
-            url = "https://api.binance.com/api/v3/klines"
-            params = {
-                "symbol": symbol,
-                "interval": interval if interval in ['1d', '1wk', '1mo'] else '1d',
-                "limit": limit
-            }
-            
-            # API Key
-            binance_key = settings_service.get_value("BINANCE_API_KEY")
-            headers = {"X-MBX-APIKEY": binance_key} if binance_key else {}
-            
-            r = requests.get(url, params=params, headers=headers, timeout=10)
+            r = SafeRequest.request("GET", BINANCE_KLINES_URL, params=params,
+                                    headers=self._binance_headers(), timeout=10)
             if r.status_code == 200:
-                klines = r.json()
-                # Binance Format: [Open Time, Open, High, Low, Close, Volume, ...]
-                # Frontend Beklentisi: {"timestamp": ..., "close": ...}
-                formatted = []
-                from datetime import datetime
-                for k in klines:
-                    formatted.append({
-                        "date": datetime.fromtimestamp(k[0] / 1000).isoformat(), # Timestamp (ms) -> ISO String
-                        "close": float(k[4]),
-                        "high": float(k[2]),
-                        "low": float(k[3]),
-                        "open": float(k[1]),
-                        "volume": float(k[5])
-                    })
-                return formatted
+                return self._format_klines(r.json())
         except Exception as e:
-            print(f"Crypto History Error ({symbol}): {e}")
+            print(f"Crypto History Error ({params['symbol']}): {e}")
         return []
 
+    def _format_klines(self, klines):
+        # Binance Format: [Open Time, Open, High, Low, Close, Volume, ...]
+        # Frontend Beklentisi: {"timestamp": ..., "close": ...}
+        formatted = []
+        for k in klines:
+            formatted.append({
+                "date": datetime.fromtimestamp(k[0] / 1000).isoformat(), # Timestamp (ms) -> ISO String
+                "close": float(k[4]),
+                "high": float(k[2]),
+                "low": float(k[3]),
+                "open": float(k[1]),
+                "volume": float(k[5])
+            })
+        return formatted
+
 crypto_service = CryptoService()
@@ -1,5 +1,14 @@
 import os
-import requests
+from database import db_pool
+from utils.cache import cache
+from utils.network import SafeRequest, http_sessions
+from utils.leader import background_leader, alert_leader
+from services.price_bus import price_bus
+from services.symbol_registry import symbol_registry
+from utils.circuit_breaker import provider_breakers
+from utils.hedge import hedger
+from utils import deadline
+from services.quota_service import quota_service
 from services.settings_service import settings_service
 
 class DiagnosticsService:
@@ -9,7 +18,20 @@ class DiagnosticsService:
             "onesignal": self.check_onesignal(),
             "supabase": self.check_supabase(),
             "fmp": self.check_fmp(),
-            "twelve_data": self.check_twelve_data()
+            "twelve_data": self.check_twelve_data(),
+            "cache": cache.stats(),
+            "http_pool": http_sessions.stats(),
+            "database": db_pool.stats(),
+            "leaders": {
+                "background_worker": background_leader.status(),
+                "alert_monitor": alert_leader.status()
+            },
+            "price_bus": price_bus.stats(),
+            "symbol_registry": symbol_registry.stats(),
+            "providers": provider_breakers.stats(),
+            "hedging": hedger.stats(),
+            "deadlines": deadline.stats(),
+            "quotas": quota_service.stats()
         }
         return results
 
@@ -21,7 +43,7 @@ class DiagnosticsService:
         try:
             # Use a simple public endpoint to check connectivity
             # If key exists, connectivity is assumed OK (key validity checked on actual use)
-            resp = requests.get("https://api.binance.com/api/v3/ticker/price?symbol=BTCUSDT", timeout=5)
+            resp = SafeRequest.request("GET", "https://api.binance.com/api/v3/ticker/price?symbol=BTCUSDT", timeout=5)
             if resp.status_code == 200:
                 return {"status": "ok", "message": "Key configured, API reachable"}
             return {"status": "error", "message": f"API unreachable (Status {resp.status_code})"}
@@ -38,7 +60,7 @@ class DiagnosticsService:
             # OneSignal REST API Key is already the full key, use Bearer auth
             url = f"https://api.onesignal.com/apps/{app_id}"
             headers = {"Authorization": f"Bearer {api_key}"}
-            resp = requests.get(url, headers=headers, timeout=5)
+            resp = SafeRequest.request("GET", url, headers=headers, timeout=5)
             if resp.status_code == 200:
                 return {"status": "ok", "message": "App verified"}
             return {"status": "error", "message": f"Status {resp.status_code}: {resp.text[:100]}"}
@@ -54,7 +76,7 @@ class DiagnosticsService:
             # Try to list users (requires service_role)
             check_url = f"{url}/auth/v1/admin/users"
             headers = {"apikey": key, "Authorization": f"Bearer {key}"}
-            resp = requests.get(check_url, headers=headers, timeout=5)
+            resp = SafeRequest.request("GET", check_url, headers=headers, timeout=5)
             if resp.status_code == 200:
                 return {"status": "ok", "message": "Admin access verified"}
             return {"status": "error", "message": f"Status {resp.status_code}"}
@@ -73,7 +95,7 @@ class DiagnosticsService:
         key = settings_service.get_value("TWELVEAPI_TOKEN")
         if not key: return {"status": "missing"}
         try:
-            resp = requests.get(f"https://api.twelvedata.com/quote?symbol=AAPL&apikey={key}", timeout=5)
+            resp = SafeRequest.request("GET", f"https://api.twelvedata.com/quote?symbol=AAPL&apikey={key}", timeout=5)
             if resp.status_code == 200: return {"status": "ok"}
             return {"status": "error"}
         except: return {"status": "error"}
@@ -1,7 +1,7 @@
 import os
-import requests
 from utils.cache import cache
 from dotenv import load_dotenv
+from utils.network import SafeRequest
 
 load_dotenv()
 
@@ -25,7 +25,7 @@ class ExchangeApiService:
         try:
             # TRY'yi baz alarak tüm karşılıkları çek
             url = f"{self.base_url}/TRY"
-            response = requests.get(url, timeout=10)
+            response = SafeRequest.request("GET", url, timeout=10)
             data = response.json()
 
             if data.get("result") == "success":
@@ -1,5 +1,5 @@
-import requests
 from utils.cache import cache
+from utils.network import SafeRequest
 
 class FawazAhmedCurrencyService:
     def __init__(self):
@@ -19,7 +19,7 @@ class FawazAhmedCurrencyService:
         
         for url in [self.base_url, self.fallback_url]:
             try:
-                response = requests.get(url, timeout=10)
+                response = SafeRequest.request("GET", url, timeout=10)
                 if response.status_code == 200:
                     data = response.json()
                     # Data yapısı: {"date": "...", "try": {"usd": 0.033, ...}}
@@ -104,9 +104,8 @@ class FeatureFlagService:
     @staticmethod
     async def get_all_flags() -> FeatureFlagsResponse:
         """Get all feature flags from database"""
-        from database import get_db_connection
-        db = get_db_connection()
-        try:
+        from database import db_connection
+        with db_connection() as db:
             # Get from settings table
             result = db.execute(
                 "SELECT value, updated_at FROM settings WHERE key = 'feature_flags'"
@@ -148,8 +147,6 @@ class FeatureFlagService:
                 version=version,
                 cached_until=datetime.now() + timedelta(hours=1)  # Cache for 1 hour
             )
-        finally:
-            db.close()
     
     @staticmethod
     async def _initialize_defaults(db):
@@ -173,9 +170,8 @@ class FeatureFlagService:
     @staticmethod
     async def update_flag(flag_id: str, updates: dict) -> Optional[FeatureFlag]:
         """Update a specific feature flag"""
-        from database import get_db_connection
-        db = get_db_connection()
-        try:
+        from database import db_connection
+        with db_connection() as db:
             # Get current flags
             result = db.execute(
                 "SELECT value FROM settings WHERE key = 'feature_flags'"
@@ -212,8 +208,6 @@ class FeatureFlagService:
                 created_at=datetime.fromisoformat(flags_data[flag_id]["created_at"]),
                 updated_at=now
             )
-        finally:
-            db.close()
     
     @staticmethod
     async def get_flag(flag_id: str) -> Optional[FeatureFlag]:
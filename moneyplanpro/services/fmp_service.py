@@ -1,6 +1,8 @@
-import requests
+from datetime import datetime
 from utils.cache import cache
+from utils.network import SafeRequest, AsyncSafeRequest, UpstreamError, raise_for_upstream
 from services.settings_service import settings_service
+from services.symbol_registry import symbol_registry
 
 class FmpService:
     def __init__(self):
@@ -57,61 +59,70 @@ class FmpService:
         cache.set(cache_key, sorted_stocks, ttl_seconds=self.LIST_TTL)
         return sorted_stocks
 
-    def get_history(self, symbol, period="1mo"):
+    def get_history(self, symbol, period="1mo", since=None):
         """
         FMP Tarihsel Veri (Charts İçin)
         Endpoint: /historical-price-full/{symbol}
         Limit: Ücretsiz tier için kısıtlı olabilir (son 5 yıl genelde açık)
+        since (epoch) verilirse yalnızca o günden itibaren olan mumlar istenir (mum deposu delta'sı).
+        Bağlantı hatası ve 200 dışı yanıtlar fırlatılır (fallback zinciri kesintiyi "veri yok"tan ayırır).
         """
         # Cache süresi uzun tutulmalı (Limit koruması)
         cache_key = f"fmp_history_{symbol}_{period}"
+        if not since:
+            cached = cache.get(cache_key)
+            if cached: return cached
+
+        url = f"{self.base_url}/historical-price-full/{self._fmp_symbol(symbol)}?apikey={self.api_key}&serietype=line"
+        if since:
+            url += f"&from={datetime.fromtimestamp(since).strftime('%Y-%m-%d')}"
+        resp = raise_for_upstream(SafeRequest.request("GET", url, timeout=10), "FMP")
+        formatted = self._format_history(self._check_error(resp.json()))
+        if not since and formatted:
+            cache.set(cache_key, formatted, ttl_seconds=14400) # 4 Saat cache
+        return formatted
+
+    async def aget_history(self, symbol, period="1mo"):
+        """get_history'nin async versiyonu (aynı cache anahtarını kullanır)."""
+        cache_key = f"fmp_history_{symbol}_{period}"
         cached = cache.get(cache_key)
         if cached: return cached
 
         try:
-            # FMP Sembol temizliği (THYAO -> THYAO.IS gerekir mi? FMP genelde .IS ister)
-            # App sembolü standardımız: THYAO (ama FMP .IS ister)
-            fmp_symbol = symbol
-            if not any(x in symbol for x in [".", "USD", "="]) and len(symbol) <= 5:
-                 # Basit heuristik: BIST hissesi ise ve uzantısı yoksa ekle
-                 # Ama global hisse (AAPL) ise ekleme.
-                 # En garantisi: get_quote içinde raw_symbol dönüyorduk, onu kullanmak lazım ama burada symbol string geliyor.
-                 # Şimdilik popüler BIST kontrolü:
-                 if symbol in ["THYAO", "GARAN", "AKBNK", "EREGL", "ASELS", "BIMAS"]:
-                     fmp_symbol = f"{symbol}.IS"
-
-            # Timeseries endpoint
-            url = f"{self.base_url}/historical-price-full/{fmp_symbol}?apikey={self.api_key}&serietype=line"
-            if period == "1d": # Intraday paralıdır, günlük dönelim
-                pass # Default daily
-            
-            resp = requests.get(url, timeout=10)
+            url = f"{self.base_url}/historical-price-full/{self._fmp_symbol(symbol)}?apikey={self.api_key}&serietype=line"
+            resp = await AsyncSafeRequest.get(url, timeout=10)
             if resp.status_code == 200:
-                data = resp.json()
-                historical = data.get("historical", [])
-                
-                # Formatla: [{date:..., close:...}]
-                formatted = []
-                for item in historical[:100]: # Son 100 gün yeterli (Grafik performansı için)
-                    formatted.append({
-                        "date": item["date"], # FMP "YYYY-MM-DD" döner
-                        "open": item.get("open"),
-                        "high": item.get("high"),
-                        "low": item.get("low"),
-                        "close": item.get("close"),
-                        "volume": item.get("volume")
-                    })
-                
-                # FMP veriyi tersten (En yeni en üstte) verebilir, grafiği bozmamak için tarih sırasına sok
-                formatted.sort(key=lambda x: x["date"])
-                
-                cache.set(cache_key, formatted, ttl_seconds=14400) # 4 Saat cache
+                formatted = self._format_history(resp.json())
+                cache.set(cache_key, formatted, ttl_seconds=14400)
                 return formatted
             return []
         except Exception as e:
             print(f"FMP History Error: {e}")
             return []
 
+    def _fmp_symbol(self, symbol):
+        # App sembolü standardımız: THYAO (ama FMP .IS ister); eşleme sembol kaydından gelir
+        return symbol_registry.lookup(symbol)["fmp"]
+
+    def _format_history(self, data):
+        historical = data.get("historical", [])
+
+        # Formatla: [{date:..., close:...}]
+        formatted = []
+        for item in historical[:100]: # Son 100 gün yeterli (Grafik performansı için)
+            formatted.append({
+                "date": item["date"], # FMP "YYYY-MM-DD" döner
+                "open": item.get("open"),
+                "high": item.get("high"),
+                "low": item.get("low"),
+                "close": item.get("close"),
+                "volume": item.get("volume")
+            })
+
+        # FMP veriyi tersten (En yeni en üstte) verebilir, grafiği bozmamak için tarih sırasına sok
+        formatted.sort(key=lambda x: x["date"])
+        return formatted
+
     def get_commodities(self):
         """Emtia Listesi (Quote Endpoint üzerinden Batch)"""
         # Altın, Gümüş, Petrol, Doğalgaz
@@ -124,8 +135,30 @@ class FmpService:
         return self._fetch_quotes_batch(symbols)
 
     def get_quote(self, symbol):
-        """Tekil Sembol Verisi (Yedekli Yapı İçin)"""
-        res = self._fetch_quotes_batch([symbol])
+        """Tekil Sembol Verisi (Yedekli Yapı İçin). Sembol bulunamazsa None, kesintide istisna."""
+        res = self._request_quotes([symbol])
+        if res: return res[0]
+        return None
+
+    def get_quotes(self, symbols, chunk_size=100):
+        """
+        Çoklu sembol fiyatı: virgülle birleştirilmiş batch istekler (chunk başına 1 kredi).
+        Dönüş: {istenen_sembol: quote}; bağlantı hatası ve 200 dışı yanıtlar fırlatılır.
+        """
+        wanted = {}
+        for s in symbols:
+            wanted.setdefault(self._fmp_symbol(s).upper(), s)
+        targets = list(wanted)
+        results = {}
+        for i in range(0, len(targets), chunk_size):
+            for item in self._request_quotes(targets[i:i + chunk_size]):
+                orig = wanted.get(item["raw_symbol"].upper())
+                if orig:
+                    results[orig] = item
+        return results
+
+    async def aget_quote(self, symbol):
+        res = await self._afetch_quotes_batch([symbol])
         if res: return res[0]
         return None
 
@@ -138,7 +171,7 @@ class FmpService:
             if country: url += f"&country={country}"
             if marketCapMoreThan: url += f"&marketCapMoreThan={marketCapMoreThan}"
             
-            resp = requests.get(url, timeout=10)
+            resp = SafeRequest.request("GET", url, timeout=10)
             if resp.status_code == 200:
                 data = resp.json()
                 return [self._map_fmp_to_app(item) for item in data]
@@ -151,16 +184,35 @@ class FmpService:
         """
         Batch Request: Virgülle ayırıp tek seferde sorar (1 Kredi harcar).
         """
-        str_syms = ",".join(symbols_list)
         # Cache Check yapmıyoruz çünkü üst metodlar zaten cacheleyecek veya anlık gerekebilir.
         # Ama yine de 60sn cache koyabiliriz.
         
         try:
-            url = f"{self.base_url}/quote/{str_syms}?apikey={self.api_key}"
-            resp = requests.get(url, timeout=10)
+            return self._request_quotes(symbols_list)
+        except Exception as e:
+            print(f"FMP Batch Error: {e}")
+            return []
+
+    def _request_quotes(self, symbols_list):
+        """Quote isteği; FMP bilinmeyen semboller için boş liste döner, kesintide istisna fırlatılır."""
+        url = f"{self.base_url}/quote/{','.join(symbols_list)}?apikey={self.api_key}"
+        resp = raise_for_upstream(SafeRequest.request("GET", url, timeout=10), "FMP")
+        return [self._map_fmp_to_app(item) for item in self._check_error(resp.json())]
+
+    @staticmethod
+    def _check_error(data):
+        # Limit/yetki hataları bazen 200 + {"Error Message": ...} gövdesiyle gelir
+        if isinstance(data, dict) and data.get("Error Message"):
+            message = data["Error Message"]
+            raise UpstreamError(f"FMP error: {message}", 429 if "Limit" in message else 403)
+        return data
+
+    async def _afetch_quotes_batch(self, symbols_list):
+        try:
+            url = f"{self.base_url}/quote/{','.join(symbols_list)}?apikey={self.api_key}"
+            resp = await AsyncSafeRequest.get(url, timeout=10)
             if resp.status_code == 200:
-                data = resp.json()
-                return [self._map_fmp_to_app(item) for item in data]
+                return [self._map_fmp_to_app(item) for item in resp.json()]
             return []
         except Exception as e:
             print(f"FMP Batch Error: {e}")
@@ -5,26 +5,31 @@ from datetime import datetime
 import os
 import sys
 import json
-from database import get_db_connection
+import logging
+from database import db_connection
+from utils.leader import background_leader
+
+logger = logging.getLogger(__name__)
 
 class JobService:
+    # Scheduler'ın vadesi gelen job'ları kontrol etme sıklığı (saniye)
+    SCHEDULER_TICK_SEC = 5
+
     def __init__(self):
         self.running_processes = {}
+        self._scheduler_stop = threading.Event()
+        self._scheduler_thread = None
         self._sync_db_on_startup()
 
     def _sync_db_on_startup(self):
         """Reset running status to idle if app crashed/restarted"""
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute("UPDATE system_jobs SET status = 'idle' WHERE status = 'running'")
-        conn.commit()
-        conn.close()
+        with db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("UPDATE system_jobs SET status = 'idle' WHERE status = 'running'")
 
     def get_all_jobs(self):
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM system_jobs WHERE is_active = 1")
-        rows = cursor.fetchall()
+        with db_connection() as conn:
+            rows = conn.execute("SELECT * FROM system_jobs WHERE is_active = 1").fetchall()
         
         jobs = []
         for row in rows:
@@ -38,57 +43,49 @@ class JobService:
             # Truncate output for list view
             job["output"] = job["output"][-1000:] if job["output"] else ""
             jobs.append(job)
-            
-        conn.close()
         return jobs
 
     def update_job_definition(self, job_id, updates):
         """Allows editing job name, description, args, path etc."""
-        conn = get_db_connection()
-        cursor = conn.cursor()
+        with db_connection() as conn:
+            cursor = conn.cursor()
         
-        allowed_fields = ["name", "description", "path", "args", "service", "method", "is_active"]
-        update_parts = []
-        params = []
+            allowed_fields = ["name", "description", "path", "args", "service", "method", "is_active", "interval_sec"]
+            update_parts = []
+            params = []
         
-        for field in allowed_fields:
-            if field in updates:
-                val = updates[field]
-                if field == "args" and isinstance(val, list):
-                    val = json.dumps(val)
-                update_parts.append(f"{field} = ?")
-                params.append(val)
+            for field in allowed_fields:
+                if field in updates:
+                    val = updates[field]
+                    if field == "args" and isinstance(val, (list, dict)):
+                        val = json.dumps(val)
+                    update_parts.append(f"{field} = ?")
+                    params.append(val)
         
-        if not update_parts:
-            conn.close()
-            return False, "No valid fields to update"
+            if not update_parts:
+                return False, "No valid fields to update"
             
-        params.append(job_id)
-        cursor.execute(f"UPDATE system_jobs SET {', '.join(update_parts)}, updated_at = CURRENT_TIMESTAMP WHERE id = ?", params)
-        conn.commit()
-        success = cursor.rowcount > 0
-        conn.close()
+            params.append(job_id)
+            cursor.execute(f"UPDATE system_jobs SET {', '.join(update_parts)}, updated_at = CURRENT_TIMESTAMP WHERE id = ?", params)
+            conn.commit()
+            success = cursor.rowcount > 0
         return success, "Updated" if success else "Job not found"
 
     def run_job(self, job_id):
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute("SELECT status FROM system_jobs WHERE id = ?", (job_id,))
-        row = cursor.fetchone()
+        with db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT status FROM system_jobs WHERE id = ?", (job_id,))
+            row = cursor.fetchone()
         
-        if not row:
-            conn.close()
-            return False, "Job not found"
+            if not row:
+                return False, "Job not found"
         
-        if row["status"] == "running":
-            conn.close()
-            return False, "Job already running"
+            if row["status"] == "running":
+                return False, "Job already running"
 
-        # Mark as running in DB immediately
-        cursor.execute("UPDATE system_jobs SET status = 'running', last_run = ? WHERE id = ?", 
-                      (datetime.now().isoformat(), job_id))
-        conn.commit()
-        conn.close()
+            # Mark as running in DB immediately
+            cursor.execute("UPDATE system_jobs SET status = 'running', last_run = ? WHERE id = ?", 
+                          (datetime.now().isoformat(), job_id))
 
         # Run in background thread
         thread = threading.Thread(target=self._execute_job, args=(job_id,))
@@ -96,12 +93,10 @@ class JobService:
         return True, "Job started"
 
     def _execute_job(self, job_id):
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM system_jobs WHERE id = ?", (job_id,))
-        job_data = cursor.fetchone()
+        # Job uzun sürebilir; bağlantı çalışma boyunca tutulmaz, sadece okuma ve sonuç yazımında alınır
+        with db_connection() as conn:
+            job_data = conn.execute("SELECT * FROM system_jobs WHERE id = ?", (job_id,)).fetchone()
         if not job_data:
-            conn.close()
             return
             
         job = dict(job_data)
@@ -112,16 +107,18 @@ class JobService:
             if job["type"] == "script":
                 status, output = self._handle_script_job(job, output)
             elif job["type"] == "internal":
-                status, output = self._handle_internal_job(job, output)
+                # Prefetch calls may use provider budget reserved from user lookups (see quota_service)
+                from services.quota_service import quota_service
+                with quota_service.priority("background"):
+                    status, output = self._handle_internal_job(job, output)
         except Exception as e:
             status = "error"
             output += f"ERROR: {str(e)}\n"
         finally:
             self.running_processes.pop(job_id, None)
             output += f"\n--- Job Completed at {datetime.now().isoformat()} ---\n"
-            cursor.execute("UPDATE system_jobs SET status = ?, output = ? WHERE id = ?", (status, output, job_id))
-            conn.commit()
-            conn.close()
+            with db_connection() as conn:
+                conn.execute("UPDATE system_jobs SET status = ?, output = ? WHERE id = ?", (status, output, job_id))
 
     def _handle_script_job(self, job, output):
         script_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), job["path"])
@@ -149,18 +146,77 @@ class JobService:
     def _handle_internal_job(self, job, output):
         from services.news_service import news_service
         from services.market_service import market_provider
+        from services.crypto_service import crypto_service
+        from services.symbol_registry import symbol_registry
         
-        services = {"news_service": news_service, "market_service": market_provider}
+        services = {"news_service": news_service, "market_service": market_provider, "crypto_service": crypto_service,
+                    "symbol_registry": symbol_registry}
         service = services.get(job["service"])
         
         if service:
             method = getattr(service, job["method"])
             output += f"Executing {job['service']}.{job['method']}...\n"
-            result = method()
+            # args: JSON list -> pozisyonel, JSON object -> keyword argümanlar (örn. {"force_refresh": true})
+            args = json.loads(job["args"]) if job.get("args") else []
+            if isinstance(args, dict):
+                result = method(**args)
+            else:
+                result = method(*args)
             output += f"Success: Modified {len(result) if isinstance(result, list) else 'N/A'} items.\n"
             return "success", output
         
         output += f"Service {job['service']} not found.\n"
         return "failed", output
 
+    # --- SCHEDULER (Periyodik Job'lar) ---
+
+    def start_scheduler(self):
+        """
+        interval_sec > 0 olan aktif job'ları periyodik çalıştıran thread'i başlatır.
+        Job'lar yalnızca lider worker'da çalışır; diğer worker'lar her tick'te liderliği devralmayı dener.
+        """
+        if self._scheduler_thread and self._scheduler_thread.is_alive():
+            return
+        self._scheduler_stop.clear()
+        self._scheduler_thread = threading.Thread(target=self._scheduler_loop, daemon=True)
+        self._scheduler_thread.start()
+        logger.info("Job scheduler started.")
+
+    def stop_scheduler(self):
+        self._scheduler_stop.set()
+        if self._scheduler_thread:
+            self._scheduler_thread.join()
+        logger.info("Job scheduler stopped.")
+
+    def _scheduler_loop(self):
+        from services.settings_service import settings_service
+
+        while not self._scheduler_stop.is_set():
+            try:
+                is_enabled = settings_service.get_value("PREFETCH_ENABLED", "1") == "1"
+                if is_enabled and background_leader.try_acquire():
+                    background_leader.heartbeat()
+                    self._run_due_jobs()
+            except Exception as e:
+                logger.error(f"Error in Job Scheduler Loop: {e}")
+            self._scheduler_stop.wait(self.SCHEDULER_TICK_SEC)
+
+    def _run_due_jobs(self):
+        with db_connection() as conn:
+            rows = conn.execute("""
+                SELECT id, last_run, interval_sec FROM system_jobs
+                WHERE is_active = 1 AND interval_sec > 0 AND status != 'running'
+            """).fetchall()
+
+        now = datetime.now()
+        for row in rows:
+            if row["last_run"]:
+                try:
+                    elapsed = (now - datetime.fromisoformat(row["last_run"])).total_seconds()
+                    if elapsed < row["interval_sec"]:
+                        continue
+                except ValueError:
+                    pass
+            self.run_job(row["id"])
+
 job_runner = JobService()
@@ -1,7 +1,7 @@
 from typing import Optional
 from datetime import datetime
 from models.limits_config import LimitsConfig, TierLimits, RateLimits, UsageQuotas
-from database import get_db_connection
+from database import db_connection
 import json
 
 
@@ -56,8 +56,7 @@ class LimitsService:
     @staticmethod
     async def get_config() -> LimitsConfig:
         """Get current limits configuration"""
-        db = get_db_connection()
-        try:
+        with db_connection() as db:
             result = db.execute(LimitsService._GET_CONFIG_QUERY).fetchone()
             
             if result:
@@ -68,8 +67,6 @@ class LimitsService:
                 config_data = LimitsService.DEFAULT_CONFIG
             
             return LimitsConfig(**config_data)
-        finally:
-            db.close()
     
     @staticmethod
     async def _initialize_defaults(db):
@@ -85,8 +82,7 @@ class LimitsService:
     @staticmethod
     async def update_config(updates: dict) -> LimitsConfig:
         """Update limits configuration"""
-        db = get_db_connection()
-        try:
+        with db_connection() as db:
             # Get current config
             result = db.execute(LimitsService._GET_CONFIG_QUERY).fetchone()
             
@@ -144,8 +140,6 @@ class LimitsService:
             
             # Return updated config
             return await LimitsService.get_config()
-        finally:
-            db.close()
     
     @staticmethod
     async def get_tier_limits(is_pro: bool) -> TierLimits:
@@ -1,67 +1,144 @@
 import re
-import requests
+import asyncio
+import concurrent.futures
 from datetime import datetime
 from utils.cache import cache
+from utils.network import SafeRequest, AsyncSafeRequest
 
 class MacroService:
+    INDICATORS = {
+        "gdp_growth": "NY.GDP.MKTP.KD.ZG",
+        "inflation": "FP.CPI.TOTL.ZG",
+        "interest_rate": "FR.INR.RINR",
+        "unemployment": "SL.UEM.TOTL.ZS"
+    }
+    # Makro veriler genelde aylık/yıllık değişir, ama kullanıcı dinamik istediği için haftalık (1 hafta) cache yeterlidir.
+    CACHE_TTL = 604800
+
     def __init__(self):
         self.wb_url = "https://api.worldbank.org/v2"
         self.country_map = {
-            "TR": "turkey", "US": "united-states", "DE": "germany", 
-            "GB": "united-kingdom", "CN": "china", "JP": "japan", 
+            "TR": "turkey", "US": "united-states", "DE": "germany",
+            "GB": "united-kingdom", "CN": "china", "JP": "japan",
             "IN": "india", "BR": "brazil"
         }
 
     def get_country_indicators(self, country_code: str = "TR"):
-        country_code = country_code.upper()
-        cache_key = f"macro_pro_live_{country_code}"
-        cached = cache.get(cache_key)
-        if cached: return cached
+        return self.get_countries_indicators([country_code])[country_code.upper()]
+
+    async def aget_country_indicators(self, country_code: str = "TR"):
+        result = await self.aget_countries_indicators([country_code])
+        return result[country_code.upper()]
+
+    def get_countries_indicators(self, country_codes):
+        """
+        Birden fazla ülkenin makro göstergelerini döner.
+        Cache'te olmayan ülkeler tek turda çekilir: gösterge başına bir World Bank isteği (TR;US;DE...).
+        """
+        results, missing = self._cached(country_codes)
+        if missing:
+            fetched = self.fetch_world_bank(missing)
+            for code in missing:
+                results[code] = self._store(code, fetched[code])
+        return results
+
+    async def aget_countries_indicators(self, country_codes):
+        results, missing = self._cached(country_codes)
+        if missing:
+            fetched = await self.afetch_world_bank(missing)
+            for code in missing:
+                results[code] = self._store(code, fetched[code])
+        return results
+
+    def fetch_world_bank(self, country_codes, timeout=10):
+        """
+        World Bank API'den verilen ülkeler için tüm göstergeleri paralel çeker.
+        Dönüş: {"TR": {"inflation": {...}, ...}, "US": {...}}
+        """
+        codes = [c.upper() for c in country_codes]
+        with concurrent.futures.ThreadPoolExecutor(max_workers=len(self.INDICATORS)) as executor:
+            futures = {executor.submit(self._fetch_indicator, codes, code, timeout): key
+                       for key, code in self.INDICATORS.items()}
+            rows = {futures[f]: f.result() for f in concurrent.futures.as_completed(futures)}
+        return self._merge(codes, rows)
+
+    async def afetch_world_bank(self, country_codes, timeout=10):
+        codes = [c.upper() for c in country_codes]
+        keys = list(self.INDICATORS.keys())
+        results = await asyncio.gather(*[self._afetch_indicator(codes, self.INDICATORS[k], timeout) for k in keys])
+        return self._merge(codes, dict(zip(keys, results)))
 
-        # Pro Fallback Zinciri: Mynet Verileri > World Bank API
-        # Makro verileri de Mynet üzerinden çekmek Türkiye merkezli bir app için en garanti yoldur
-        data = self._fetch_macro_dynamic(country_code)
+    def _cached(self, country_codes):
+        results = {}
+        missing = []
+        for code in dict.fromkeys(c.upper() for c in country_codes):
+            cached = cache.get(f"macro_pro_live_{code}")
+            if cached:
+                results[code] = cached
+            else:
+                missing.append(code)
+        return results, missing
 
+    def _store(self, country_code, data):
         result = {
             "country": country_code,
             "data": data,
             "timestamp": datetime.now().isoformat(),
             "source": "Dynamic Pro Source"
         }
-        # Makro veriler genelde aylık/yıllık değişir, ama kullanıcı dinamik istediği için haftalık (1 hafta) cache yeterlidir.
-        cache.set(cache_key, result, ttl_seconds=604800)
+        # Tamamen hatalı sonuç bir hafta boyunca cache'te kalmasın
+        if any(v["value"] != 0 for v in data.values()):
+            cache.set(f"macro_pro_live_{country_code}", result, ttl_seconds=self.CACHE_TTL)
         return result
 
-    def _fetch_macro_dynamic(self, country_code):
-        res = {}
-        indicators = {
-            "gdp_growth": "NY.GDP.MKTP.KD.ZG", 
-            "inflation": "FP.CPI.TOTL.ZG", 
-            "interest_rate": "FR.INR.RINR", 
-            "unemployment": "SL.UEM.TOTL.ZS"
-        }
-        
-        # World Bank API her zaman dinamik ve resmi veriyi döner
-        for key, code in indicators.items():
-            try:
-                url = f"{self.wb_url}/country/{country_code}/indicator/{code}?format=json&per_page=1&mrnev=1"
-                r = requests.get(url, timeout=5)
-                if r.status_code == 200:
-                    d = r.json()
-                    if len(d) > 1 and d[1]:
-                        # Tarih formatlamasını iyileştir (örn: 2023 yerine '2023' string olarak geliyor)
-                        val = d[1][0]['value']
-                        date = d[1][0]['date']
-                        res[key] = {
-                            "value": round(float(val), 2) if val is not None else 0,
-                            "date": str(date), 
-                            "is_estimate": False
-                        }
-                    else:
-                        res[key] = {"value": 0, "date": "N/A"}
-            except:
-                res[key] = {"value": 0, "date": "Hata"}
-        return res
+    def _fetch_indicator(self, codes, indicator, timeout):
+        try:
+            r = SafeRequest.request("GET", self._indicator_url(codes, indicator), timeout=timeout)
+            if r.status_code == 200:
+                return self._parse_rows(r.json())
+        except Exception as e:
+            print(f"World Bank Error ({indicator}): {e}")
+        return None
+
+    async def _afetch_indicator(self, codes, indicator, timeout):
+        try:
+            r = await AsyncSafeRequest.get(self._indicator_url(codes, indicator), timeout=timeout)
+            if r.status_code == 200:
+                return self._parse_rows(r.json())
+        except Exception as e:
+            print(f"World Bank Error ({indicator}): {e}")
+        return None
+
+    def _indicator_url(self, codes, indicator):
+        # Çoklu ülke sözdizimi: /country/TR;US;DE/indicator/...  (mrnev=1 -> ülke başına en güncel dolu değer)
+        return (f"{self.wb_url}/country/{';'.join(codes)}/indicator/{indicator}"
+                f"?format=json&mrnev=1&per_page={max(len(codes) * 2, 50)}")
+
+    def _parse_rows(self, d):
+        """World Bank yanıtını {ülke_kodu: {"value", "date"}} haline getirir."""
+        parsed = {}
+        if len(d) > 1 and d[1]:
+            for row in d[1]:
+                iso2 = (row.get("country") or {}).get("id", "").upper()
+                if not iso2 or iso2 in parsed:
+                    continue
+                # Tarih formatlamasını iyileştir (örn: 2023 yerine '2023' string olarak geliyor)
+                val = row['value']
+                parsed[iso2] = {
+                    "value": round(float(val), 2) if val is not None else 0,
+                    "date": str(row['date']),
+                    "is_estimate": False
+                }
+        return parsed
+
+    def _merge(self, codes, rows):
+        res = {code: {} for code in codes}
+        for key, by_country in rows.items():
+            for code in codes:
+                if by_country is None:
+                    res[code][key] = {"value": 0, "date": "Hata"}
+                else:
+                    res[code][key] = by_country.get(code, {"value": 0, "date": "N/A"})
         return res
 
 macro_service = MacroService()
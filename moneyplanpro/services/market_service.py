@@ -1,22 +1,39 @@
 import re
+import asyncio
 import requests
 import time
 import os
 import json
+import threading
 from concurrent.futures import ThreadPoolExecutor
 from utils.cache import cache
-from utils.network import SafeRequest
+from utils.network import SafeRequest, AsyncSafeRequest, UpstreamError
 from services.twelve_data_service import twelve_data_service
+from services.candle_store import candle_store, period_start
+from services.settings_service import settings_service
+from services.price_bus import price_bus
+from services.symbol_registry import symbol_registry
+from utils.circuit_breaker import provider_breakers
+from utils.hedge import hedger
+from utils import deadline
 from dotenv import load_dotenv
 
 load_dotenv()
 
 # --- PRO GÜNCELLEME SIKLIĞI (SANİYE) ---
 TTL_MARKET = 60
+# Soft TTL dolduktan sonra bayat verinin sunulabileceği ek süre (arka planda yenilenir)
+STALE_TTL_MARKET = 600
 # --------------------------------------
 
 DATE_FMT_TR = '%d/%m/%Y'
 
+# Çoklu fiyat çözümlemesi (get_prices): paralel grup sayısı ve TwelveData istek başına sembol sayısı
+PRICE_BATCH_WORKERS = 8
+TWELVE_DATA_BATCH = 50
+# Son başarılı detayın bayat yedek olarak saklanma süresi (deadline dolunca döner)
+DETAIL_STALE_TTL = 86400
+
 # Kullanıcının sağladığı "Gerçekçi Fallback" değerleri (Ocak 2026 Projeksiyonu/Güncel)
 FALLBACK_DATA = {
     "bist100": {"price": 12200.0, "change_percent": 0.5},
@@ -27,6 +44,41 @@ FALLBACK_DATA = {
     "ons_altin": {"price": 3250.0, "change_percent": 0.2} # Ons Altın tahmini
 }
 
+# Piyasa özeti anahtarlarının price bus'a yayınlanacak sembol karşılıkları (bitcoin kaynağa göre TRY/USD olabildiği için hariç)
+SUMMARY_TICK_SYMBOLS = {"bist100": "XU100", "dolar": "USD", "euro": "EUR", "gram_altin": "GAU", "ons_altin": "ONS"}
+
+
+class _YahooSession(requests.Session):
+    """
+    yfinance'e verilen session. yfinance ağ hatalarını yutup "veri yok" gibi davrandığından (boş DataFrame,
+    KeyError), bu thread'deki isteklerin kesintiye (bağlantı hatası, 429, 5xx) uğrayıp uğramadığını
+    durum koduyla kaydeder; yanıt alınamadıysa 503 sayılır.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._local = threading.local()
+
+    def request(self, *args, **kwargs):
+        try:
+            resp = super().request(*args, **kwargs)
+        except requests.exceptions.RequestException:
+            self._local.failed = 503
+            raise
+        if resp.status_code == 429 or resp.status_code >= 500:
+            self._local.failed = resp.status_code
+        return resp
+
+    def reset(self):
+        self._local.failed = None
+
+    def failed(self):
+        """Bu thread'de son reset'ten beri görülen kesinti durumu (yoksa None)."""
+        return getattr(self._local, "failed", None)
+
+
+_yahoo_session = _YahooSession()
+
 DEFAULT_USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
 
 class MarketDataProvider:
@@ -34,18 +86,20 @@ class MarketDataProvider:
         self.mynet_url = "https://finans.mynet.com/"
         self.yahoo_base = "https://query1.finance.yahoo.com/v8/finance/chart/"
 
-    def get_market_summary(self):
+    def get_market_summary(self, force_refresh=False):
         """
         %100 Dinamik ve Hibrit Yaklaşım: 
         1. Mynet (BIST, TR Varlıklar - En hızlı)
         2. Yahoo (Global Varlıklar - Fallback)
         3. Fallback (Sıfır dönmemesi için gerçekçi veriler)
         """
-        cache_key = "market_summary_ultimate_v3"
-        cached = cache.get(cache_key)
-        if cached:
-            return cached
+        # Cache süresi dolduğunda eşzamanlı istekler tek bir scrape'i bekler.
+        # Soft TTL dolmuşsa bayat veri hemen döner, yenileme arka planda yapılır.
+        ttl = int(settings_service.get_value("CACHE_TTL_MARKET_SUMMARY", TTL_MARKET))
+        return cache.get_or_load("market_summary_ultimate_v3", self._fetch_market_summary,
+                                 ttl_seconds=ttl, stale_ttl_seconds=STALE_TTL_MARKET, force_refresh=force_refresh)
 
+    def _fetch_market_summary(self):
         # Başlangıçta fallback değerlerini kopyala
         res = {k: v.copy() for k, v in FALLBACK_DATA.items()}
         
@@ -56,26 +110,60 @@ class MarketDataProvider:
         except Exception as e:
             print(f"Error in get_market_summary: {e}")
 
-        # Cache'le ve döndür
-        cache.set(cache_key, res, ttl_seconds=TTL_MARKET)
+        self._publish_summary(res)
+        return res
+
+    async def aget_market_summary(self, force_refresh=False):
+        """get_market_summary'nin async versiyonu (aynı cache anahtarını paylaşır)."""
+        ttl = int(settings_service.get_value("CACHE_TTL_MARKET_SUMMARY", TTL_MARKET))
+        return await cache.aget_or_load("market_summary_ultimate_v3", self._afetch_market_summary,
+                                        ttl_seconds=ttl, stale_ttl_seconds=STALE_TTL_MARKET, force_refresh=force_refresh)
+
+    async def _afetch_market_summary(self):
+        res = {k: v.copy() for k, v in FALLBACK_DATA.items()}
+
+        try:
+            self._apply_mynet(res, await self._afetch_all_from_mynet())
+            symbols_to_check = self._yahoo_symbols_to_check(res)
+            if symbols_to_check:
+                values = await asyncio.gather(*[self._afetch_yahoo(sym) for _, sym in symbols_to_check])
+                for (key, _), val in zip(symbols_to_check, values):
+                    if val and val["price"] > 0:
+                        res[key] = val
+            self._calculate_gram_gold_if_needed(res)
+        except Exception as e:
+            print(f"Error in aget_market_summary: {e}")
+
+        self._publish_summary(res)
         return res
 
+    def _publish_summary(self, res):
+        """Güncel (fallback olmayan) özet fiyatlarını price bus'a yayınlar."""
+        price_bus.publish_many({symbol: res[key]["price"] for key, symbol in SUMMARY_TICK_SYMBOLS.items()
+                                if res[key]["price"] != FALLBACK_DATA[key]["price"]})
+
     def _update_from_mynet(self, res):
         """Mynet verilerini al ve sonuç kümesini güncelle."""
-        mynet_data = self._fetch_all_from_mynet()
+        self._apply_mynet(res, self._fetch_all_from_mynet())
+
+    def _apply_mynet(self, res, mynet_data):
         if mynet_data:
             for k, val in mynet_data.items():
                 if val["price"] > 0:
                     res[k] = val
 
-    def _update_from_yahoo_if_needed(self, res):
-        """Global varlıklar için Yahoo fallback kontrolü yap."""
+    def _yahoo_symbols_to_check(self, res):
+        """Mynet'ten gelmeyen (fallback'te kalan) global varlıklar için Yahoo sembolleri."""
         symbols_to_check = []
         if res["bitcoin"]["price"] == FALLBACK_DATA["bitcoin"]["price"]:
             symbols_to_check.append(("bitcoin", "BTC-USD"))
         if res["ons_altin"]["price"] == FALLBACK_DATA["ons_altin"]["price"]:
             symbols_to_check.append(("ons_altin", "GC=F"))
-        
+        return symbols_to_check
+
+    def _update_from_yahoo_if_needed(self, res):
+        """Global varlıklar için Yahoo fallback kontrolü yap."""
+        symbols_to_check = self._yahoo_symbols_to_check(res)
         if not symbols_to_check:
             return
 
@@ -105,44 +193,55 @@ class MarketDataProvider:
         """Mynet ana sayfasındaki tüm verileri tek regex taramasıyla alır."""
         try:
             headers = {"User-Agent": DEFAULT_USER_AGENT}
-            resp = requests.get(self.mynet_url, headers=headers, timeout=10)
+            resp = SafeRequest.request("GET", self.mynet_url, headers=headers, timeout=10)
             if resp.status_code != 200:
                 return None
-            
-            html = resp.text
-            extracted = {}
-            
-            mappings = [
-                ("XU100", "bist100"),
-                ("USDTRY", "dolar"),
-                ("EURTRY", "euro"),
-                ("GAUTRY", "gram_altin"),
-                ("BTCUSD", "bitcoin")
-            ]
-            
-            for mynet_id, local_key in mappings:
-                p_match = re.search(fr'dynamic-price-{mynet_id}[^>]*>([^<]+)</span>', html)
-                c_match = re.search(fr'dynamic-direction-{mynet_id}[^>]*>([^<]+)</span>', html)
-                
-                if p_match:
-                    price_str = p_match.group(1).replace(".", "").replace(",", ".").replace("%", "").strip()
-                    change_str = "0"
-                    if c_match:
-                        change_str = c_match.group(1).replace("%", "").replace(",", ".").strip()
-                    
-                    try:
-                        extracted[local_key] = {
-                            "price": float(price_str),
-                            "change_percent": float(change_str)
-                        }
-                    except Exception:
-                        pass
-            
-            return extracted
+            return self._parse_mynet_html(resp.text)
         except Exception as e:
             print(f"Mynet fetch error: {e}")
             return None
 
+    async def _afetch_all_from_mynet(self):
+        try:
+            resp = await AsyncSafeRequest.get(self.mynet_url, headers={"User-Agent": DEFAULT_USER_AGENT}, timeout=10)
+            if resp.status_code != 200:
+                return None
+            return self._parse_mynet_html(resp.text)
+        except Exception as e:
+            print(f"Mynet fetch error: {e}")
+            return None
+
+    def _parse_mynet_html(self, html):
+        extracted = {}
+        
+        mappings = [
+            ("XU100", "bist100"),
+            ("USDTRY", "dolar"),
+            ("EURTRY", "euro"),
+            ("GAUTRY", "gram_altin"),
+            ("BTCUSD", "bitcoin")
+        ]
+        
+        for mynet_id, local_key in mappings:
+            p_match = re.search(fr'dynamic-price-{mynet_id}[^>]*>([^<]+)</span>', html)
+            c_match = re.search(fr'dynamic-direction-{mynet_id}[^>]*>([^<]+)</span>', html)
+            
+            if p_match:
+                price_str = p_match.group(1).replace(".", "").replace(",", ".").replace("%", "").strip()
+                change_str = "0"
+                if c_match:
+                    change_str = c_match.group(1).replace("%", "").replace(",", ".").strip()
+                
+                try:
+                    extracted[local_key] = {
+                        "price": float(price_str),
+                        "change_percent": float(change_str)
+                    }
+                except Exception:
+                    pass
+        
+        return extracted
+
     def _fetch_yahoo(self, symbol):
         """Yahoo Finance API (Fallback)"""
         try:
@@ -151,34 +250,50 @@ class MarketDataProvider:
                 "User-Agent": DEFAULT_USER_AGENT,
                 "Accept": "application/json"
             }
-            r = requests.get(url, headers=headers, timeout=5)
+            r = SafeRequest.request("GET", url, headers=headers, timeout=5)
             if r.status_code == 200:
-                data = r.json()
-                meta = data['chart']['result'][0]['meta']
-                p = meta.get('regularMarketPrice')
-                pre = meta.get('previousClose')
-                
-                if p and pre:
-                    return {
-                        "price": round(p, 2),
-                        "change_percent": round(((p - pre) / pre * 100), 2)
-                    }
+                return self._parse_yahoo_chart(r.json())
+        except Exception:
+            pass
+        return None
+
+    async def _afetch_yahoo(self, symbol):
+        try:
+            url = f"{self.yahoo_base}{symbol}?interval=1m&range=1d"
+            headers = {"User-Agent": DEFAULT_USER_AGENT, "Accept": "application/json"}
+            r = await AsyncSafeRequest.get(url, headers=headers, timeout=5)
+            if r.status_code == 200:
+                return self._parse_yahoo_chart(r.json())
+        except Exception:
+            pass
+        return None
+
+    def _parse_yahoo_chart(self, data):
+        try:
+            meta = data['chart']['result'][0]['meta']
+            p = meta.get('regularMarketPrice')
+            pre = meta.get('previousClose')
+            
+            if p and pre:
+                return {
+                    "price": round(p, 2),
+                    "change_percent": round(((p - pre) / pre * 100), 2)
+                }
         except Exception:
             pass
         return None
 
     def get_calendar(self, country_code: str = "ALL"):
-        from database import get_db_connection
+        from database import db_connection
         from datetime import datetime
         
         try:
-            conn = get_db_connection()
-            cursor = conn.cursor()
+            with db_connection() as conn:
+                cursor = conn.cursor()
             
-            query, params = self._build_calendar_query(country_code)
-            cursor.execute(query, tuple(params))
-            rows = cursor.fetchall()
-            conn.close()
+                query, params = self._build_calendar_query(country_code)
+                cursor.execute(query, tuple(params))
+                rows = cursor.fetchall()
             
             formatted = self._format_calendar_rows(rows)
             
@@ -288,7 +403,7 @@ class MarketDataProvider:
                 "User-Agent": "Mozilla/5.0"
             }
             
-            resp = requests.get(url, headers=headers, timeout=10)
+            resp = SafeRequest.request("GET", url, headers=headers, timeout=10)
             if resp.status_code != 200:
                 print(f"FXStreet API Error: {resp.status_code}")
                 return []
@@ -354,66 +469,64 @@ class MarketDataProvider:
             return None
 
     def save_calendar_events(self, events: list):
-        from database import get_db_connection
+        from database import db_connection
         from datetime import datetime
         try:
-            conn = get_db_connection()
-            cursor = conn.cursor()
-            for ev in events:
-                dt_str = ev.get("date_time") or datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-                cursor.execute("""
-                    INSERT INTO calendar_events 
-                    (event_id, date_time, country_id, currency, title, impact, actual, forecast, previous, unit)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                """, (
-                    str(ev.get("event_id", "")), dt_str, ev.get("country_id", 0),
-                    ev.get("currency", ""), ev.get("short_name") or ev.get("title") or "Olay",
-                    ev.get("importance") or ev.get("impact") or "Medium",
-                    ev.get("actual", "-"), ev.get("forecast", "-"),
-                    ev.get("previous", "-"), ev.get("unit", "")
-                ))
-            conn.commit()
-            conn.close()
+            with db_connection() as conn:
+                cursor = conn.cursor()
+                for ev in events:
+                    dt_str = ev.get("date_time") or datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+                    cursor.execute("""
+                        INSERT INTO calendar_events 
+                        (event_id, date_time, country_id, currency, title, impact, actual, forecast, previous, unit)
+                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    """, (
+                        str(ev.get("event_id", "")), dt_str, ev.get("country_id", 0),
+                        ev.get("currency", ""), ev.get("short_name") or ev.get("title") or "Olay",
+                        ev.get("importance") or ev.get("impact") or "Medium",
+                        ev.get("actual", "-"), ev.get("forecast", "-"),
+                        ev.get("previous", "-"), ev.get("unit", "")
+                    ))
             return True
         except Exception as e:
             print(f"Error saving events: {e}")
             return False
     
     def get_history(self, symbol, period="1mo", interval="1d"):
-        """Fetches historical data from various sources (InvestPy, Yahoo, FMP)."""
-        try:
-            # 1. InvestPy Source
-            history = self._get_history_from_investpy(symbol, period)
-            if history:
-                return history
-        except Exception as e:
-            print(f"InvestPy Error ({symbol}): {e}")
+        """Grafik verisi: yerel mum deposundan okunur, upstream'den yalnızca son mumdan sonrası çekilir."""
+        return candle_store.get_series("market", symbol, interval, period_start(period),
+                                       lambda since: self._fetch_history(symbol, period, interval, since))
 
-        # 2. FMP Fallback
+    def _fetch_history(self, symbol, period="1mo", interval="1d", since=None):
+        """Fetches historical data from various sources (InvestPy, FMP, Yahoo), healthiest source first."""
         from services.fmp_service import fmp_service
-        history = fmp_service.get_history(symbol, period)
-        if history:
-            return history
-        
-        # 3. Yahoo Finance Fallback
-        return self._get_history_from_yahoo(symbol, period, interval)
+        history, _ = hedger.run_chain([
+            ("investpy", lambda: self._get_history_from_investpy(symbol, period, since)),
+            ("fmp", lambda: fmp_service.get_history(symbol, period, since=since)),
+            ("yfinance", lambda: self._get_history_from_yahoo(symbol, period, interval, since)),
+        ])
+        return history or []
 
-    def _get_history_from_investpy(self, symbol, period):
+    def _get_history_from_investpy(self, symbol, period, since=None):
         import investpy
         from datetime import datetime, timedelta
         
         end_date = datetime.now().strftime(DATE_FMT_TR)
-        days_back = self._get_days_back(period)
-        start_date = (datetime.now() - timedelta(days=days_back)).strftime(DATE_FMT_TR)
+        if since:
+            # investpy from_date < to_date ister; son mumun gününü de kapsayacak şekilde bir gün geri al
+            start_date = (datetime.fromtimestamp(since) - timedelta(days=1)).strftime(DATE_FMT_TR)
+        else:
+            days_back = self._get_days_back(period)
+            start_date = (datetime.now() - timedelta(days=days_back)).strftime(DATE_FMT_TR)
 
         df = None
         if ".IS" in symbol or symbol in ["THYAO", "GARAN", "AKBNK", "EREGL"]:
             clean = symbol.replace(".IS", "")
-            df = investpy.get_stock_historical_data(stock=clean, country='turkey', from_date=start_date, to_date=end_date)
+            df = self._fetch_stock_from_investpy(clean, 'turkey', start_date, end_date)
         elif self._is_tefas_fund(symbol):
             df = self._fetch_fund_from_investpy(symbol, start_date, end_date)
         elif symbol in ["AAPL", "TSLA", "MSFT", "AMZN", "GOOGL", "NVDA", "META"]:
-            df = investpy.get_stock_historical_data(stock=symbol, country='united states', from_date=start_date, to_date=end_date)
+            df = self._fetch_stock_from_investpy(symbol, 'united states', start_date, end_date)
         elif "TRY" in symbol or symbol in ["USD", "EUR", "GBP", "CHF", "JPY"]: 
             df = self._fetch_currency_from_investpy(symbol, start_date, end_date)
         
@@ -428,6 +541,15 @@ class MarketDataProvider:
         mapping = {"3mo": 90, "1y": 365, "5y": 365 * 5}
         return mapping.get(period, 30)
 
+    def _fetch_stock_from_investpy(self, stock, country, start_date, end_date):
+        import investpy
+        try:
+            return investpy.get_stock_historical_data(stock=stock, country=country, from_date=start_date, to_date=end_date)
+        except (ValueError, RuntimeError, IndexError):
+            # investpy bilinmeyen hisse / boş sonuç için bu hataları fırlatır: kesin "veri yok" yanıtı.
+            # Bağlantı hataları (ConnectionError) zincire kesinti olarak çıkar.
+            return None
+
     def _fetch_currency_from_investpy(self, symbol, start_date, end_date):
         import investpy
         cross = symbol
@@ -439,49 +561,206 @@ class MarketDataProvider:
         except (ValueError, RuntimeError, requests.exceptions.RequestException):
             return None
 
-    def _get_history_from_yahoo(self, symbol, period, interval):
+    def _get_history_from_yahoo(self, symbol, period, interval, since=None):
         try:
             import yfinance as yf
-            y_sym = self._get_yahoo_symbol(symbol)
-            df = yf.Ticker(y_sym).history(period=period, interval=interval)
-            if not df.empty:
-                return [{
-                    "date": date.isoformat(), "open": float(row['Open']), "high": float(row['High']),
-                    "low": float(row['Low']), "close": float(row['Close']), "volume": float(row['Volume'])
-                } for date, row in df.iterrows()]
-        except (ImportError, ValueError, RuntimeError, requests.exceptions.RequestException):
-            pass
-        return []
+        except ImportError:
+            return []
+        y_sym = self._get_yahoo_symbol(symbol)
+
+        def load():
+            tk = yf.Ticker(y_sym, session=_yahoo_session)
+            if since:
+                from datetime import datetime
+                start = datetime.fromtimestamp(since).strftime("%Y-%m-%d")
+                df = tk.history(start=start, interval=interval)
+            else:
+                df = tk.history(period=period, interval=interval)
+            if df.empty:
+                return []
+            return [{
+                "date": date.isoformat(), "open": float(row['Open']), "high": float(row['High']),
+                "low": float(row['Low']), "close": float(row['Close']), "volume": float(row['Volume'])
+            } for date, row in df.iterrows()]
+        return self._yahoo_call(load) or []
+
+    @staticmethod
+    def _yahoo_call(load):
+        """
+        yfinance çağrısını sarar: istek kesintiye uğradıysa UpstreamError fırlatır (zincir hatayı görsün),
+        yanıt geldiği halde veri yoksa (bilinmeyen sembol) boş sonuç döner.
+        """
+        _yahoo_session.reset()
+        try:
+            result = load()
+        except Exception as e:
+            if _yahoo_session.failed():
+                raise UpstreamError(f"yfinance unreachable: {e}", _yahoo_session.failed()) from e
+            return None
+        if not result and _yahoo_session.failed():
+            raise UpstreamError("yfinance unreachable", _yahoo_session.failed())
+        return result
 
     def get_asset_detail(self, symbol):
-        if self._is_tefas_fund(symbol):
-            tefas_data = self._get_tefas_data(symbol)
-            if tefas_data: return tefas_data
-            
+        """
+        Detay zinciri: TEFAS (yalnızca fonlar), FMP, yfinance, TradingView, TwelveData.
+        Sıra sabit değildir; provider_breakers sağlıklı ve hızlı sağlayıcıyı öne alır, devresi açık olanı atlar.
+        HEDGE_ENABLED=1 iken yavaş kalan sağlayıcıya paralel olarak sıradaki de sorulur (utils/hedge.py).
+        Route'un deadline'ı dolarsa zincir kesilir ve son başarılı detay stale=True ile döner.
+        Negatif cache: tüm sağlayıcıların kesin olarak "veri yok" dediği sembol bir süre (her tekrarda uzayarak)
+        zincire sokulmaz; başka sağlayıcının çözdüğü sembole art arda UNSUPPORTED_MIN_MISSES kez boş dönen
+        sağlayıcı da o sembol için atlanır. Kesinti (istisna), bütçe tükenmesi ve deadline nedeniyle boş kalan
+        sonuçlar bu kayıtları oluşturmaz; hiç sağlayıcı sorulmadıysa (hepsi atlandıysa) negatif kayıt yazılmaz.
+        """
         from services.fmp_service import fmp_service
-        from services.ta_service import ta_service
-        fmp_data = fmp_service.get_quote(symbol)
-        if fmp_data and fmp_data.get("price", 0) > 0: return fmp_data
 
+        symbol_key = symbol.upper()
+        stale = cache.get(f"detail_last_{symbol_key}")
+        if self._is_negative(symbol_key):
+            return dict(stale, stale=True) if stale else {"price": 0.0}
+
+        providers = []
+        if self._is_tefas_fund(symbol):
+            providers.append(("tefas", lambda: self._get_tefas_data(symbol)))
+        providers += [
+            ("fmp", lambda: fmp_service.get_quote(symbol)),
+            ("yfinance", lambda: self._get_detail_from_yahoo(symbol)),
+            ("tradingview", lambda: self._get_detail_from_ta(symbol)),
+            ("twelvedata", lambda: twelve_data_service.get_quotes([symbol], raise_errors=True).get(symbol)),
+        ]
+        # Sembolü desteklemediği bilinen sağlayıcılar atlanır; kalanların "boş yanıt"ları izlenir
+        empty = []
+        providers = [(name, self._track_empty(name, fn, empty)) for name, fn in providers
+                     if not self._is_unsupported(name, symbol_key)]
+
+        detail, winner = hedger.run_chain(providers, is_valid=self._has_price)
+        if detail:
+            # Statik profil (isim, açıklama, logo...) cache'te varsa sağlayıcının boş bıraktığı alanları tamamlar
+            profile = cache.get(f"asset_profile_{symbol_key}")
+            if profile:
+                detail = dict(detail, **{k: v for k, v in profile.items() if v and not detail.get(k)})
+            cache.set(f"detail_last_{symbol_key}", detail, ttl_seconds=DETAIL_STALE_TTL)
+            cache.delete(f"neg_detail_{symbol_key}")
+            # Sembol geçerli: boş dönen diğer sağlayıcılar bu sembolü tanımıyor olabilir
+            self._mark_unsupported([name for name in empty if name != winner], [symbol_key])
+            cache.delete(f"unsupported_miss_{winner}_{symbol_key}")
+            return detail
+        # Negatif kayıt yalnızca her sağlayıcı yanıt verip sembolü tanımadıysa (hata veya atlanan devre yoksa)
+        if providers and len(set(empty)) == len(providers) and not deadline.expired():
+            self._mark_negative(symbol_key)
+        # Süre doldu veya tüm sağlayıcılar başarısız: son başarılı detay (bayat) döner
+        if stale:
+            return dict(stale, stale=True)
+        return {"price": 0.0}
+
+    def _track_empty(self, name, fn, empty):
+        def call():
+            result = fn()
+            # Sağlayıcılar kesintide istisna fırlatır; buraya gelen boş sonuç kesin "veri yok" yanıtıdır
+            if not self._has_price(result) and not deadline.expired():
+                empty.append(name)
+            return result
+        return call
+
+    def _is_negative(self, symbol_key):
+        entry = cache.get(f"neg_detail_{symbol_key}")
+        return bool(entry) and time.time() < entry["until"]
+
+    def _mark_negative(self, symbol_key):
+        """Süre her ardışık başarısızlıkta ikiye katlanır (NEG_CACHE_BASE_SEC .. NEG_CACHE_MAX_SEC)."""
+        base = int(settings_service.get_value("NEG_CACHE_BASE_SEC", "60"))
+        max_ttl = int(settings_service.get_value("NEG_CACHE_MAX_SEC", "3600"))
+        key = f"neg_detail_{symbol_key}"
+        failures = ((cache.get(key) or {}).get("failures") or 0) + 1
+        ttl = min(max_ttl, base * 2 ** (failures - 1))
+        # Sayaç, negatif süre bittikten sonra da bir sonraki uzatma için saklanır
+        cache.set(key, {"failures": failures, "until": time.time() + ttl}, ttl_seconds=ttl + max_ttl)
+
+    def _is_unsupported(self, provider, symbol_key):
+        return bool(cache.get(f"unsupported_{provider}_{symbol_key}"))
+
+    def _mark_unsupported(self, providers, symbol_keys, definitive=False):
+        """
+        Başka kaynaktan çözülen sembole boş dönen sağlayıcıyı işaretler. Tek boş yanıt geçici olabilir:
+        sağlayıcı ancak art arda UNSUPPORTED_MIN_MISSES boş yanıttan ya da açık bir "bulunamadı"
+        yanıtından (definitive=True) sonra o sembol için atlanır.
+        """
+        if not providers or not symbol_keys:
+            return
+        ttl = int(settings_service.get_value("UNSUPPORTED_TTL_SEC", "21600"))
+        min_misses = int(settings_service.get_value("UNSUPPORTED_MIN_MISSES", "3"))
+        for provider in providers:
+            for s in symbol_keys:
+                misses = min_misses if definitive else (cache.get(f"unsupported_miss_{provider}_{s}") or 0) + 1
+                if misses >= min_misses:
+                    cache.set(f"unsupported_{provider}_{s}", True, ttl_seconds=ttl)
+                    cache.delete(f"unsupported_miss_{provider}_{s}")
+                else:
+                    cache.set(f"unsupported_miss_{provider}_{s}", misses, ttl_seconds=ttl)
+
+    @staticmethod
+    def _has_price(data):
+        return bool(data) and (data.get("price") or 0) > 0
+
+    def _get_detail_from_yahoo(self, symbol):
+        """
+        yfinance detayı iki katmanlı cache'ten birleştirilir:
+        - asset_quote_{SYM}: fast_info'dan canlı alanlar (fiyat, değişim, gün/52h aralığı, hacim), kısa TTL
+        - asset_profile_{SYM}: tk.info'dan statik alanlar (isim, açıklama, logo, borsa, para birimi), günlük TTL
+        Böylece detay isteği çoğunlukla yalnızca ucuz fiyat çağrısına mal olur; tk.info günde bir kez çalışır.
+        """
+        import yfinance as yf
+        symbol_key = symbol.upper()
+        tk = yf.Ticker(self._get_yahoo_symbol(symbol), session=_yahoo_session)
+
+        quote_ttl = int(settings_service.get_value("CACHE_TTL_ASSET_QUOTE", "15"))
+        quote = cache.get_or_load(f"asset_quote_{symbol_key}", lambda: self._yahoo_call(lambda: self._load_yahoo_quote(tk)),
+                                  ttl_seconds=quote_ttl)
+        if not quote:
+            return None
+        return dict(self._get_yahoo_profile(symbol, tk), **quote, symbol=symbol)
+
+    def _load_yahoo_quote(self, tk):
+        fi = tk.fast_info
+        price = float(fi.last_price or 0) if hasattr(fi, 'last_price') else 0.0
+        if price <= 0:
+            return None
+        prev_close = float(getattr(fi, 'previous_close', 0) or 0)
+        return {
+            "price": price,
+            "change_percent": round((price - prev_close) / prev_close * 100, 2) if prev_close else 0.0,
+            "volume": getattr(fi, 'last_volume', 0) or 0,
+            "market_cap": getattr(fi, 'market_cap', 0) or 0,
+            "high_24h": getattr(fi, 'day_high', 0) or 0, "low_24h": getattr(fi, 'day_low', 0) or 0,
+            "high_52w": getattr(fi, 'year_high', 0) or 0, "low_52w": getattr(fi, 'year_low', 0) or 0
+        }
+
+    def _get_yahoo_profile(self, symbol, tk):
+        key = f"asset_profile_{symbol.upper()}"
+        profile = cache.get(key)
+        if profile:
+            return profile
         try:
-            import yfinance as yf
-            y_sym = self._get_yahoo_symbol(symbol)
-            tk = yf.Ticker(y_sym)
-            fi = tk.fast_info
-            price = float(fi.last_price) if hasattr(fi, 'last_price') else 0.0
-            if price > 0:
-                info = tk.info
-                return {
-                    "symbol": symbol, "name": info.get('longName') or symbol, "price": price,
-                    "change_percent": 0.0, "volume": info.get('volume', 0),
-                    "market_cap": info.get('marketCap', 0), "high_24h": info.get('dayHigh', 0),
-                    "low_24h": info.get('dayLow', 0), "high_52w": info.get('fiftyTwoWeekHigh', 0),
-                    "low_52w": info.get('fiftyTwoWeekLow', 0), "description": info.get('longBusinessSummary', ""),
-                    "logo_url": "", "currency": "USD"
-                }
-        except Exception: pass
+            info = tk.info
+            profile = {
+                "name": info.get('longName') or info.get('shortName') or symbol,
+                "description": info.get('longBusinessSummary', ""),
+                "logo_url": info.get('logo_url', ""),
+                "exchange": info.get('exchange', ""),
+                "currency": info.get('currency') or "USD"
+            }
+            ttl = int(settings_service.get_value("CACHE_TTL_ASSET_PROFILE", "86400"))
+        except Exception as e:
+            print(f"Yahoo profile error ({symbol}): {e}")
+            # Profil alınamadı: fiyat yine döner, profil kısa süre sonra tekrar denenir
+            profile = {"name": symbol, "description": "", "logo_url": "", "exchange": "", "currency": "USD"}
+            ttl = 600
+        cache.set(key, profile, ttl_seconds=ttl)
+        return profile
 
-        ta_data = ta_service.get_analysis(symbol)
+    def _get_detail_from_ta(self, symbol):
+        from services.ta_service import ta_service
+        ta_data = ta_service.get_analysis(symbol, raise_errors=True)
         if ta_data:
             return {
                 "symbol": symbol, "name": symbol, "price": ta_data.get("price", 0.0),
@@ -489,7 +768,163 @@ class MarketDataProvider:
                 "high_24h": ta_data.get("high", 0), "low_24h": ta_data.get("low", 0),
                 "open_24h": ta_data.get("open", 0), "source": "TradingView TA"
             }
-        return {"price": 0.0}
+        return None
+
+    def get_prices(self, symbols):
+        """
+        Çoklu sembol için yalnızca son fiyatı çözer (alarm monitörü vb. için).
+        get_asset_detail zincirini sembol başına seri yürütmek yerine sağlayıcıların batch API'lerini kullanır
+        (bkz. _resolve_batch); kripto için hafif Binance ticker/price kullanılır.
+        Dönüş: {sembol: fiyat}; fiyatı bulunamayan semboller dönüşte yer almaz.
+        """
+        from services.crypto_service import crypto_service
+        resolved = self._resolve_batch(symbols, crypto_service.get_prices)
+        return {s: self._price_of(data) for s, (data, _) in resolved.items()}
+
+    def get_quotes(self, symbols):
+        """
+        İzleme listeleri için çoklu kotasyon: N adet /market/detail isteği yerine tek çağrı.
+        Sembol başına cache (quote_v1_{SYM}) önce kontrol edilir; kalanlar sağlayıcılara bölünüp
+        her sağlayıcıya tek batch istek atılır. Dönüş istenen sırada, tek tip kotasyon listesidir;
+        çözülemeyen semboller price=0 ve source=None ile döner (cache'lenmez).
+        """
+        from services.crypto_service import crypto_service
+
+        symbols = list(dict.fromkeys(s.upper().strip() for s in symbols if s and s.strip()))
+        quotes, missing = {}, []
+        for s in symbols:
+            cached = cache.get(f"quote_v1_{s}")
+            if cached:
+                quotes[s] = cached
+            else:
+                missing.append(s)
+
+        if missing:
+            ttl = int(settings_service.get_value("CACHE_TTL_QUOTE", "30"))
+            for s, (data, source) in self._resolve_batch(missing, crypto_service.get_quotes).items():
+                quotes[s] = self._to_quote(s, data, source)
+                cache.set(f"quote_v1_{s}", quotes[s], ttl_seconds=ttl)
+
+        return [quotes.get(s) or self._to_quote(s, None, None) for s in symbols]
+
+    def _resolve_batch(self, symbols, crypto_loader):
+        """
+        Sembolleri sağlayıcılara böler, her sağlayıcıya tek batch çağrı yapar:
+        - TEFAS fonları: fon başına TEFAS/investpy (batch API yok), paralel
+        - Kripto: crypto_loader (Binance, tek istek)
+        - Diğerleri: FMP virgüllü quote ve TradingView get_multiple_analysis paralel; öncelik FMP
+        - Kalanlar: TwelveData çoklu quote, en son sembol başına get_asset_detail
+        Dönüş: {sembol: (sağlayıcı verisi, kaynak)}; yalnızca fiyatı > 0 olanlar.
+        """
+        from services.fmp_service import fmp_service
+        from services.ta_service import ta_service
+
+        symbols = list(dict.fromkeys(s for s in symbols if s))
+        funds = [s for s in symbols if self._is_tefas_fund(s)]
+        crypto = [s for s in symbols if s not in funds and symbol_registry.is_crypto(s)]
+        others = [s for s in symbols if s not in funds and s not in crypto]
+        # Sembolü tanımadığı bilinen sağlayıcıya o sembol sorulmaz
+        fmp_symbols = [s for s in others if not self._is_unsupported("fmp", s.upper())]
+        ta_symbols = [s for s in others if not self._is_unsupported("tradingview", s.upper())]
+
+        resolved = {}
+        with ThreadPoolExecutor(max_workers=PRICE_BATCH_WORKERS) as executor:
+            # bind: thread'ler isteğin deadline'ını görsün; devresi açık sağlayıcı atlanır (call None döner)
+            fund_futures = {executor.submit(deadline.bind(self._get_tefas_data), s): s for s in funds}
+            crypto_future = executor.submit(deadline.bind(crypto_loader), crypto)
+            fmp_future = executor.submit(deadline.bind(provider_breakers.call), "fmp", fmp_service.get_quotes, fmp_symbols) if fmp_symbols else None
+            ta_future = executor.submit(deadline.bind(provider_breakers.call), "tradingview", ta_service.get_multiple_analysis, ta_symbols) if ta_symbols else None
+
+            for future, s in fund_futures.items():
+                self._put_price(resolved, s, self._safe_result(future, "TEFAS"), "TEFAS")
+            for s, data in (self._safe_result(crypto_future, "Binance") or {}).items():
+                self._put_price(resolved, s, data, "Binance")
+            fmp_quotes = self._safe_result(fmp_future, "FMP")
+            for s, quote in (fmp_quotes or {}).items():
+                self._put_price(resolved, s, quote, "FMP")
+            ta_items = self._safe_result(ta_future, "TradingView")
+            for item in ta_items or []:
+                self._put_price(resolved, item.get("symbol"), item, "TradingView")
+
+        # Süre dolduysa yedek sağlayıcılara geçilmez; o ana kadar çözülenler döner
+        missing = [] if deadline.expired() else [s for s in symbols if s not in resolved]
+        for i in range(0, len(missing), TWELVE_DATA_BATCH):
+            try:
+                for s, quote in twelve_data_service.get_quotes(missing[i:i + TWELVE_DATA_BATCH]).items():
+                    self._put_price(resolved, s, quote, "TwelveData")
+            except Exception as e:
+                print(f"Batch Price Error (TwelveData): {e}")
+
+        # Son çare: tam detay zinciri (yfinance dahil), yine paralel
+        missing = [] if deadline.expired() else [s for s in symbols if s not in resolved]
+        if missing:
+            with ThreadPoolExecutor(max_workers=PRICE_BATCH_WORKERS) as executor:
+                futures = [executor.submit(deadline.bind(self._safe_detail), s) for s in missing]
+                for s, detail in zip(missing, (f.result() for f in futures)):
+                    self._put_price(resolved, s, detail, (detail or {}).get("source") or "Detail")
+
+        # Yanıt veren ama sembolü fiyatlayamayan sağlayıcı, başka kaynaktan çözülen sembolleri tanımıyor demektir
+        if fmp_quotes is not None:
+            self._mark_unsupported(["fmp"], [s.upper() for s in fmp_symbols
+                                             if s in resolved and self._price_of(fmp_quotes.get(s)) <= 0])
+        if ta_items is not None:
+            # Grubu hata veren semboller sonuçta hiç yer almaz; yalnızca "bulunamadı" (fiyat 0) kayıtları kesindir
+            ta_unpriced = {item.get("symbol") for item in ta_items if self._price_of(item) <= 0}
+            self._mark_unsupported(["tradingview"], [s.upper() for s in ta_symbols
+                                                     if s in resolved and s in ta_unpriced], definitive=True)
+        # Batch yanıtlarında istenmemiş semboller olabilir (ör. TradingView grup sonuçları)
+        return {s: resolved[s] for s in symbols if s in resolved}
+
+    @classmethod
+    def _put_price(cls, resolved, symbol, data, source):
+        # Önce gelen (daha öncelikli) sağlayıcının verisi korunur
+        if not symbol or symbol in resolved or data is None:
+            return
+        if cls._price_of(data) > 0:
+            resolved[symbol] = (data, source)
+
+    @staticmethod
+    def _price_of(data):
+        try:
+            return float(data.get("price", 0) if isinstance(data, dict) else data)
+        except (TypeError, ValueError):
+            return 0.0
+
+    def _to_quote(self, symbol, data, source):
+        """Sağlayıcıdan bağımsız tek tip kotasyon."""
+        from datetime import datetime
+        entry = symbol_registry.lookup(symbol)
+        data = data if isinstance(data, dict) else {"price": data or 0.0}
+        # Kayıttaki isim (fonlar vb.) sağlayıcının döndürdüğü isimden önceliklidir
+        has_name = entry["name"] != entry["symbol"]
+        return {
+            "symbol": symbol,
+            "name": entry["name"] if has_name else (data.get("name") or symbol),
+            "price": self._price_of(data),
+            "change_percent": float(data.get("change_percent") or 0.0),
+            "volume": float(data.get("volume") or 0.0),
+            "currency": data.get("currency") or entry["currency"],
+            "asset_class": entry["asset_class"],
+            "source": source,
+            "updated_at": datetime.now().isoformat()
+        }
+
+    @staticmethod
+    def _safe_result(future, source):
+        if future is None:
+            return None
+        try:
+            return future.result()
+        except Exception as e:
+            print(f"Batch Price Error ({source}): {e}")
+            return None
+
+    def _safe_detail(self, symbol):
+        try:
+            return self.get_asset_detail(symbol)
+        except Exception as e:
+            print(f"Batch Price Error (detail {symbol}): {e}")
+            return None
 
     def _fetch_tefas_direct(self, symbol, start_date=None):
         """
@@ -517,7 +952,7 @@ class MarketDataProvider:
                 "User-Agent": DEFAULT_USER_AGENT,
                 "X-Requested-With": "XMLHttpRequest"
             }
-            resp = requests.post(url, data=payload, headers=headers, timeout=10)
+            resp = SafeRequest.post(url, data=payload, headers=headers, timeout=10)
             if resp.status_code == 200:
                 data = resp.json()
                 if "data" in data and len(data["data"]) > 0:
@@ -583,31 +1018,7 @@ class MarketDataProvider:
         start_date_limit = (datetime.now() - timedelta(days=7)).strftime(DATE_FMT_TR)
         df = self._fetch_fund_from_investpy(symbol, start_date=start_date_limit)
         
-        # Fon isimleri için manuel mapping (Premium görünüm için)
-        FUND_NAME_MAP = {
-            "TCD": "Tacirler Portföy Değişken Fon",
-            "AFT": "Ak Portföy Yeni Teknolojiler Yabancı Hisse",
-            "YAY": "Yapı Kredi Por. Yeni Teknolojiler Yab. Hisse",
-            "TTE": "İş Portföy BIST Teknoloji Ağırlıklı Hisse",
-            "IPB": "İstanbul Portföy Birinci Değişken Fon",
-            "AES": "Ak Portföy Petrol Yabancı BYF Fon Sepeti",
-            "IDH": "İş Portföy İhracatçı Şirketler Hisse Senedi",
-            "KZL": "Kuveyt Türk Portföy Altın Katılım Fonu",
-            "MAC": "Marmara Capital Portföy Hisse Senedi Fonu",
-            "GMR": "Global MD Portföy Birinci Hisse Senedi Fonu",
-            "TCA": "Ziraat Portföy Altın Katılım Fonu",
-            "ZJ1": "Ziraat Portföy Birinci Kira Sertifikası Katılım",
-            "HMB": "HSBC Portföy Çoklu Varlık Değişken Fon",
-            "MPK": "Mükafaat Portföy Katılım Katılım Fonu",
-            "IIH": "İstanbul Portföy Üçüncü Hisse Senedi Fonu",
-            "KUB": "Kuveyt Türk Sürdürülebilirlik Katılım Fonu",
-            "GSP": "Azimut Portföy Sky Hisse Senedi Fonu",
-            "HKH": "Hedef Portföy Katılım Hisse Senedi Fonu",
-            "TI3": "İş Portföy İşte Kadın Hisse Senedi Fonu",
-            "DBH": "Deniz Portföy Eurobond (USD) Borçlanma Araçları"
-        }
-        
-        full_name = FUND_NAME_MAP.get(symbol.upper(), f"{symbol} Yatırım Fonu")
+        full_name = symbol_registry.lookup(symbol)["name"]
 
         if df is not None and not df.empty:
             last_row = df.iloc[-1]
@@ -631,40 +1042,18 @@ class MarketDataProvider:
         return None
 
     def _is_tefas_fund(self, symbol):
-        cache_key = "tefas_fund_list"
-        cached_list = cache.get(cache_key)
-        if not cached_list:
-            try:
-                import investpy
-                df_funds = investpy.get_funds(country='turkey')
-                if df_funds is not None and not df_funds.empty:
-                    cached_list = set(df_funds['symbol'].str.upper().tolist())
-                    cache.set(cache_key, cached_list, ttl_seconds=86400)
-            except Exception:
-                cached_list = {"TCD", "AFT", "YAY", "TTE", "IPB", "AES", "IDH", "KZL", "IPJ", 
-                              "KUB", "TI3", "KRS", "PPF", "HKH", "AYA", "MAC", "GMR", "TCA", "ZJ1", "IIH"}
-        return symbol in cached_list
+        return symbol_registry.is_fund(symbol)
 
     def _get_yahoo_symbol(self, symbol):
-        s = symbol.upper().strip()
-        if s == "BIST100" or s == "XU100": return "XU100.IS"
-        if s == "USD": return "TRY=X"
-        if s == "EUR": return "EURTRY=X"
-        if s == "GBP": return "GBPTRY=X"
-        if s == "GAU" or s == "GRAM_ALTIN": return "GC=F"
-        if s == "ONS" or s == "ONS_ALTIN": return "GC=F"
-        if s == "BRENT": return "BZ=F"
-        tr_stocks = ["THYAO", "GARAN", "AKBNK", "EREGL", "ASELS", "SISE", "BIMAS"]
-        if s in tr_stocks: return f"{s}.IS"
-        
-        # Crypto handling (Yahoo needs -USD suffix)
-        crypto_common = ["BTC", "ETH", "SOL", "ADA", "XRP", "DOT", "DOGE", "AVAX"]
-        if s in crypto_common: return f"{s}-USD"
-        if s == "BTCUSD": return "BTC-USD"
-        
-        return s
+        return symbol_registry.lookup(symbol)["yahoo"]
+
+    def get_tcmb_currencies(self, force_refresh=False):
+        ttl = int(settings_service.get_value("CACHE_TTL_TCMB", 300))
+        data = cache.get_or_load("tcmb_currencies_v1", self._fetch_tcmb_currencies,
+                                 ttl_seconds=ttl, stale_ttl_seconds=STALE_TTL_MARKET, force_refresh=force_refresh)
+        return data if data else []
 
-    def get_tcmb_currencies(self):
+    def _fetch_tcmb_currencies(self):
         symbols = ["USD", "EUR", "GBP", "CHF", "JPY", "CAD", "AUD", "DKK", "SEK", "NOK", "SAR"]
         from services.ta_service import ta_service
         ta_results = ta_service.get_multiple_analysis(symbols)
@@ -725,10 +1114,13 @@ class MarketDataProvider:
         
         return ta_data if ta_data else []
 
-    def get_commodity_markets(self):
-        cache_key = "commodity_markets_ultimate_v7"
-        cached = cache.get(cache_key)
-        if cached: return cached
+    def get_commodity_markets(self, force_refresh=False):
+        ttl = int(settings_service.get_value("CACHE_TTL_COMMODITIES", 300))
+        data = cache.get_or_load("commodity_markets_ultimate_v7", self._fetch_commodity_markets,
+                                 ttl_seconds=ttl, stale_ttl_seconds=STALE_TTL_MARKET, force_refresh=force_refresh)
+        return data if data else []
+
+    def _fetch_commodity_markets(self):
         from services.ta_service import ta_service
         symbols = [
             "XAU/USD", "XAG/USD", "LCO/USD", "WTI/USD", "PLATINUM", "PALLADIUM", 
@@ -750,8 +1142,7 @@ class MarketDataProvider:
                         if sym in td_data and item.get("price", 0) <= 0:
                             ta_data[i] = td_data[sym]
         
-        cache.set(cache_key, ta_data, ttl_seconds=300)
-        return ta_data if ta_data else []
+        return ta_data
 
     def get_etf_markets(self):
         from services.ta_service import ta_service
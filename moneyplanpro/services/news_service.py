@@ -1,9 +1,11 @@
 import xml.etree.ElementTree as ET
 from datetime import datetime
 import re
+import asyncio
 import concurrent.futures
 from utils.cache import cache
-from utils.network import SafeRequest
+from utils.network import SafeRequest, AsyncSafeRequest
+from services.settings_service import settings_service
 from bs4 import BeautifulSoup
 
 class NewsService:
@@ -15,12 +17,34 @@ class NewsService:
             {"name": "Dünya Gazetesi", "url": "https://www.dunya.com/rss", "base_url": "https://www.dunya.com", "type": "rss"}
         ]
 
-    def get_latest_news(self, limit=20):
+    def get_latest_news(self, limit=20, force_refresh=False):
         """Birden fazla kaynaktan haberleri paralel olarak derler ve cache'ler."""
-        cached = cache.get("latest_news")
-        if cached:
-            return cached[:limit]
+        # Varsayılan 15 dk taze; sonraki 1 saat bayat liste anında dönüp arka planda yenilenir
+        ttl = int(settings_service.get_value("CACHE_TTL_NEWS", 900))
+        all_news = cache.get_or_load("latest_news", self._fetch_all_news, ttl_seconds=ttl,
+                                     stale_ttl_seconds=3600, force_refresh=force_refresh)
+        return (all_news or [])[:limit]
 
+    async def aget_latest_news(self, limit=20, force_refresh=False):
+        """get_latest_news'in async versiyonu; kaynaklar asyncio.gather ile paralel çekilir."""
+        ttl = int(settings_service.get_value("CACHE_TTL_NEWS", 900))
+        all_news = await cache.aget_or_load("latest_news", self._afetch_all_news, ttl_seconds=ttl,
+                                            stale_ttl_seconds=3600, force_refresh=force_refresh)
+        return (all_news or [])[:limit]
+
+    async def _afetch_all_news(self):
+        all_news = []
+        sources = [s for s in self.sources if s["type"] == "rss"]
+        results = await asyncio.gather(*[self._afetch_rss(s["url"], s["name"], s.get("base_url", ""))
+                                         for s in sources], return_exceptions=True)
+        for source, news_items in zip(sources, results):
+            if isinstance(news_items, Exception):
+                print(f"Error fetching news from {source['name']}: {news_items}")
+            elif news_items:
+                all_news.extend(news_items)
+        return self._sort_by_date(all_news)
+
+    def _fetch_all_news(self):
         all_news = []
         # Kaynakları paralel olarak çek (Hız optimizasyonu)
         with concurrent.futures.ThreadPoolExecutor(max_workers=len(self.sources)) as executor:
@@ -38,6 +62,9 @@ class NewsService:
                     source = future_to_source[future]
                     print(f"Error fetching news from {source['name']}: {e}")
 
+        return self._sort_by_date(all_news)
+
+    def _sort_by_date(self, all_news):
         # Tarihe göre sırala
         import email.utils
         def parse_date(date_str):
@@ -48,12 +75,7 @@ class NewsService:
                 return 0
 
         all_news.sort(key=lambda x: parse_date(x.get('pub_date', '')), reverse=True)
-
-        if all_news:
-            # Önbelleğe al (15 dakika)
-            cache.set("latest_news", all_news, ttl_seconds=900)
-        
-        return all_news[:limit]
+        return all_news
 
     def _fetch_source(self, source):
         """Tek bir kaynağı çeker (Parallel helper)"""
@@ -62,70 +84,83 @@ class NewsService:
         return []
 
     def _fetch_rss(self, url, source_name, base_url):
-        items = []
         try:
             # SafeRequest kullanarak anti-bot önlemlerini aş ve timeout'u düşür
             resp = SafeRequest.get(url, timeout=7)
             if resp.status_code == 200:
-                soup = BeautifulSoup(resp.content, 'xml')
-                for item in soup.find_all('item'):
-                    try:
-                        title = item.title.text.strip() if item.title else ""
-                        link = item.link.text.strip() if item.link else ""
-                        
-                        if not title or not link: continue
-
-                        if link and link.startswith('/') and base_url:
-                            link = base_url + link
-
-                        # Görsel yakalama
-                        image_url = None
-                        # enclosure kontrolü
-                        enclosure = item.find('enclosure')
-                        if enclosure and enclosure.get('url'):
-                            image_url = enclosure['url']
-                        
-                        # Diğer medya tagları
-                        if not image_url:
-                            media_content = item.find('media:content') or item.find('content')
-                            if media_content and media_content.get('url'):
-                                image_url = media_content['url']
-                        
-                        # Description içinden görsel çıkarma (BS4 ile)
-                        desc_raw = item.description.text if item.description else ""
-                        desc_soup = BeautifulSoup(desc_raw, 'html.parser')
-                        
-                        if not image_url:
-                            img_tag = desc_soup.find('img')
-                            if img_tag and img_tag.get('src'):
-                                image_url = img_tag['src']
-                        
-                        if image_url and image_url.startswith('/') and base_url:
-                            image_url = base_url + image_url
-
-                        # HTML taglarını temizle
-                        clean_desc = desc_soup.get_text(separator=' ').strip()
-                        if not clean_desc and desc_raw:
-                            clean_desc = re.sub('<[^<]+?>', '', desc_raw).strip()
-                            
-                        if len(clean_desc) > 300:
-                            clean_desc = clean_desc[:300] + "..."
-
-                        pub_date = item.pubDate.text if item.pubDate else ""
-
-                        items.append({
-                            "title": title,
-                            "link": link,
-                            "description": clean_desc.replace('\n', ' ').replace('\r', '').strip(),
-                            "pub_date": pub_date,
-                            "source": source_name,
-                            "image_url": image_url
-                        })
-                    except Exception as item_err:
-                        # Tekil haber hatası tüm listeyi bozmasın
-                        continue
+                return self._parse_rss(resp.content, source_name, base_url)
         except Exception as e:
             print(f"RSS Fetch Error for {source_name} ({url}): {e}")
+        return []
+
+    async def _afetch_rss(self, url, source_name, base_url):
+        try:
+            resp = await AsyncSafeRequest.get(url, browser=True, timeout=7)
+            if resp.status_code == 200:
+                return self._parse_rss(resp.content, source_name, base_url)
+        except Exception as e:
+            print(f"RSS Fetch Error for {source_name} ({url}): {e}")
+        return []
+
+    def _parse_rss(self, content, source_name, base_url):
+        items = []
+        soup = BeautifulSoup(content, 'xml')
+        for item in soup.find_all('item'):
+            try:
+                title = item.title.text.strip() if item.title else ""
+                link = item.link.text.strip() if item.link else ""
+                
+                if not title or not link: continue
+
+                if link and link.startswith('/') and base_url:
+                    link = base_url + link
+
+                # Görsel yakalama
+                image_url = None
+                # enclosure kontrolü
+                enclosure = item.find('enclosure')
+                if enclosure and enclosure.get('url'):
+                    image_url = enclosure['url']
+                
+                # Diğer medya tagları
+                if not image_url:
+                    media_content = item.find('media:content') or item.find('content')
+                    if media_content and media_content.get('url'):
+                        image_url = media_content['url']
+                
+                # Description içinden görsel çıkarma (BS4 ile)
+                desc_raw = item.description.text if item.description else ""
+                desc_soup = BeautifulSoup(desc_raw, 'html.parser')
+                
+                if not image_url:
+                    img_tag = desc_soup.find('img')
+                    if img_tag and img_tag.get('src'):
+                        image_url = img_tag['src']
+                
+                if image_url and image_url.startswith('/') and base_url:
+                    image_url = base_url + image_url
+
+                # HTML taglarını temizle
+                clean_desc = desc_soup.get_text(separator=' ').strip()
+                if not clean_desc and desc_raw:
+                    clean_desc = re.sub('<[^<]+?>', '', desc_raw).strip()
+                    
+                if len(clean_desc) > 300:
+                    clean_desc = clean_desc[:300] + "..."
+
+                pub_date = item.pubDate.text if item.pubDate else ""
+
+                items.append({
+                    "title": title,
+                    "link": link,
+                    "description": clean_desc.replace('\n', ' ').replace('\r', '').strip(),
+                    "pub_date": pub_date,
+                    "source": source_name,
+                    "image_url": image_url
+                })
+            except Exception as item_err:
+                # Tekil haber hatası tüm listeyi bozmasın
+                continue
         return items
 
 news_service = NewsService()
@@ -6,7 +6,7 @@ from models.notification_config import (
     MaintenanceConfig,
     ForceUpdateConfig
 )
-from database import get_db_connection
+from database import db_connection
 import json
 
 
@@ -52,8 +52,7 @@ class NotificationConfigService:
     @staticmethod
     async def get_config() -> NotificationConfig:
         """Get current notification configuration"""
-        db = get_db_connection()
-        try:
+        with db_connection() as db:
             result = db.execute(NotificationConfigService._GET_CONFIG_QUERY).fetchone()
             
             if result:
@@ -72,8 +71,6 @@ class NotificationConfigService:
             config_data["updated_at"] = datetime.fromisoformat(config_data["updated_at"])
             
             return NotificationConfig(**config_data)
-        finally:
-            db.close()
     
     @staticmethod
     async def _initialize_defaults(db):
@@ -89,8 +86,7 @@ class NotificationConfigService:
     @staticmethod
     async def update_config(updates: dict) -> NotificationConfig:
         """Update notification configuration"""
-        db = get_db_connection()
-        try:
+        with db_connection() as db:
             # Get current config
             result = db.execute(NotificationConfigService._GET_CONFIG_QUERY).fetchone()
             
@@ -159,8 +155,6 @@ class NotificationConfigService:
             
             # Return updated config
             return await NotificationConfigService.get_config()
-        finally:
-            db.close()
     
     @staticmethod
     async def check_version_requirement(current_version: str) -> dict:
@@ -1,42 +1,56 @@
-from database import get_db_connection
+from database import db_connection
 from services.settings_service import settings_service
-import requests
 import json
 from datetime import datetime
+from utils.network import SafeRequest
 
 class NotificationService:
     def get_history(self, limit=50):
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM notifications ORDER BY created_at DESC LIMIT ?", (limit,))
-        rows = cursor.fetchall()
-        history = [dict(row) for row in rows]
-        conn.close()
+        with db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT * FROM notifications ORDER BY created_at DESC LIMIT ?", (limit,))
+            rows = cursor.fetchall()
+            history = [dict(row) for row in rows]
         return history
 
-    def send_push(self, title, message, image_url=None, action_url=None, segment="all"):
+    # OneSignal include_external_user_ids başına en fazla 2000 kullanıcı kabul eder
+    MAX_EXTERNAL_IDS = 2000
+
+    def send_push_batch(self, title, message, user_ids, image_url=None, action_url=None):
+        """
+        Sends the same notification to many users with as few OneSignal calls as possible
+        (include_external_user_ids, chunks of MAX_EXTERNAL_IDS).
+        Returns a list of (success, message) per chunk.
+        """
+        user_ids = list(dict.fromkeys(u for u in user_ids if u))
+        return [self.send_push(title, message, image_url, action_url,
+                               external_user_ids=user_ids[i:i + self.MAX_EXTERNAL_IDS])
+                for i in range(0, len(user_ids), self.MAX_EXTERNAL_IDS)]
+
+    def send_push(self, title, message, image_url=None, action_url=None, segment="all", external_user_ids=None):
         """
         Sends push notification via OneSignal.
         Logs the attempt to the database.
+        external_user_ids targets a list of users (Supabase UIDs) in one call instead of a segment.
         """
+        if external_user_ids:
+            segment = f"users_{len(external_user_ids)}"
         app_id = settings_service.get_value("ONESIGNAL_APP_ID")
         api_key = settings_service.get_value("ONESIGNAL_REST_API_KEY")
 
         # Log to DB first as pending
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute("""
-            INSERT INTO notifications (title, message, image_url, action_url, target_segment, status)
-            VALUES (?, ?, ?, ?, ?, 'sending')
-        """, (title, message, image_url, action_url, segment))
-        notification_id = cursor.lastrowid
-        conn.commit()
+        with db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                INSERT INTO notifications (title, message, image_url, action_url, target_segment, status)
+                VALUES (?, ?, ?, ?, ?, 'sending')
+            """, (title, message, image_url, action_url, segment))
+            notification_id = cursor.lastrowid
 
         # If keys are missing, we just log as missed/failed but don't crash
         if not app_id or not api_key:
-            cursor.execute("UPDATE notifications SET status = 'failed', message = message || ' (API Keys missing)' WHERE id = ?", (notification_id,))
-            conn.commit()
-            conn.close()
+            with db_connection() as conn:
+                conn.execute("UPDATE notifications SET status = 'failed', message = message || ' (API Keys missing)' WHERE id = ?", (notification_id,))
             return False, "OneSignal API keys are not configured."
 
         # OneSignal Payload
@@ -49,7 +63,9 @@ class NotificationService:
             "headings": {"en": title, "tr": title},
         }
 
-        if segment == "all":
+        if external_user_ids:
+            payload["include_external_user_ids"] = list(external_user_ids)
+        elif segment == "all":
             payload["included_segments"] = ["Subscribed Users"]
         elif segment.startswith("user_"):
             # Target specific user by external ID (Supabase UID)
@@ -66,7 +82,7 @@ class NotificationService:
             payload["url"] = action_url
 
         try:
-            response = requests.post("https://onesignal.com/api/v1/notifications", 
+            response = SafeRequest.post("https://onesignal.com/api/v1/notifications", 
                                    headers=header, 
                                    data=json.dumps(payload),
                                    timeout=10)
@@ -74,20 +90,21 @@ class NotificationService:
             res_data = response.json()
             if response.status_code == 200 and "id" in res_data:
                 delivered = res_data.get("recipients", 0)
-                cursor.execute("UPDATE notifications SET status = 'sent', delivered_count = ? WHERE id = ?", (delivered, notification_id))
-                conn.commit()
+                with db_connection() as conn:
+                    conn.execute("UPDATE notifications SET status = 'sent', delivered_count = ? WHERE id = ?", (delivered, notification_id))
                 return True, f"Successfully sent to {delivered} users"
             else:
                 error_msg = res_data.get("errors", ["Unknown error"])[0]
-                cursor.execute("UPDATE notifications SET status = 'failed' WHERE id = ?", (notification_id,))
-                conn.commit()
+                self._set_status(notification_id, "failed")
                 return False, f"OneSignal Error: {error_msg}"
 
         except Exception as e:
-            cursor.execute("UPDATE notifications SET status = 'failed' WHERE id = ?", (notification_id,))
-            conn.commit()
+            self._set_status(notification_id, "failed")
             return False, f"Exception: {str(e)}"
-        finally:
-            conn.close()
+
+    def _set_status(self, notification_id, status):
+        # Bağlantı OneSignal isteği boyunca tutulmaz; durum güncellemesi kısa bir işlemde yapılır
+        with db_connection() as conn:
+            conn.execute("UPDATE notifications SET status = ? WHERE id = ?", (status, notification_id))
 
 notification_service = NotificationService()
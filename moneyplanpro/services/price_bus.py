@@ -0,0 +1,195 @@
+import os
+import json
+import time
+import socket
+import logging
+import tempfile
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Tek datagram'a sığacak sembol sayısı (JSON ~40 bayt/sembol, Linux unix dgram sınırı ~200KB)
+DATAGRAM_SYMBOLS = 500
+
+
+class PriceBus:
+    """
+    Uygulama içi fiyat "tick" yolu.
+
+    Sağlayıcılar (piyasa özeti yenilemesi, TradingView batch sonuçları, Binance fiyatları...) aldıkları
+    fiyatları publish() ile yayınlar; aboneler (alarm motoru) yalnızca tick alan sembolleri değerlendirir.
+    - Yayın bloklamaz: tick'ler bekleyen bir sözlükte birleştirilir (sembol başına son fiyat),
+      ayrı bir dağıtıcı thread bunları toplu olarak abonelere iletir.
+    - uvicorn worker'ları ayrı süreçlerdir: listen() çağıran süreç (alarm lideri) bir unix datagram
+      soketi açar; diğer worker'ların publish() çağrıları bu sokete de iletilir. Soket yoksa tick sessizce düşer.
+    - replay() kayıtlı bir tick dosyasını (JSON lines) yeniden oynatır; test ve yerel deneme için.
+    """
+
+    def __init__(self, name="price_bus", directory=None):
+        self.socket_path = os.path.join(directory or tempfile.gettempdir(), f"moneyplan_{name}.sock")
+        self._subscribers = []
+        self._pending = {}
+        self._cond = threading.Condition()
+        self._dispatcher = None
+        self._in_flight = False
+        self._listener = None
+        self._sender = None
+        self._stats = {"published": 0, "forwarded": 0, "received": 0, "batches": 0, "errors": 0}
+
+    # --- Yayın ---
+
+    def publish(self, symbol, price):
+        self.publish_many({symbol: price})
+
+    def publish_many(self, prices, forward=True):
+        """{sembol: fiyat} yayınlar; fiyatı 0/geçersiz olanlar atlanır."""
+        ticks = {}
+        for symbol, price in prices.items():
+            try:
+                price = float(price)
+            except (TypeError, ValueError):
+                continue
+            if symbol and price > 0:
+                ticks[str(symbol).upper()] = price
+        if not ticks:
+            return 0
+
+        with self._cond:
+            self._stats["published"] += len(ticks)
+            if self._subscribers:
+                self._pending.update(ticks)
+                self._cond.notify_all()
+        # Dinleyen süreç biz değilsek tick'leri ona ilet
+        if forward and self._listener is None:
+            self._forward(ticks)
+        return len(ticks)
+
+    def _forward(self, ticks):
+        if not os.path.exists(self.socket_path):
+            return
+        try:
+            if self._sender is None:
+                self._sender = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+                self._sender.setblocking(False)
+            items = list(ticks.items())
+            for i in range(0, len(items), DATAGRAM_SYMBOLS):
+                self._sender.sendto(json.dumps(dict(items[i:i + DATAGRAM_SYMBOLS])).encode(), self.socket_path)
+            self._stats["forwarded"] += len(items)
+        except OSError:
+            # Dinleyici yok / kuyruk dolu: tick'ler kaybolur, polling yedeği devam eder
+            self._stats["errors"] += 1
+
+    # --- Abonelik ---
+
+    def subscribe(self, callback):
+        """callback({sembol: fiyat}) dağıtıcı thread'den, birleştirilmiş tick'lerle çağrılır."""
+        with self._cond:
+            if callback not in self._subscribers:
+                self._subscribers.append(callback)
+            if self._dispatcher is None or not self._dispatcher.is_alive():
+                self._dispatcher = threading.Thread(target=self._dispatch_loop, daemon=True)
+                self._dispatcher.start()
+
+    def unsubscribe(self, callback):
+        with self._cond:
+            if callback in self._subscribers:
+                self._subscribers.remove(callback)
+
+    def _dispatch_loop(self):
+        while True:
+            with self._cond:
+                while not self._pending:
+                    self._cond.wait()
+                batch, self._pending = self._pending, {}
+                subscribers = list(self._subscribers)
+                self._stats["batches"] += 1
+                self._in_flight = True
+            for callback in subscribers:
+                try:
+                    callback(batch)
+                except Exception as e:
+                    self._stats["errors"] += 1
+                    logger.error(f"Price bus subscriber error: {e}")
+            with self._cond:
+                self._in_flight = False
+                self._cond.notify_all()
+
+    def flush(self, timeout=5):
+        """Bekleyen tick'ler abonelere dağıtılana kadar bekler (testler ve replay için)."""
+        with self._cond:
+            return self._cond.wait_for(lambda: not self._pending and not self._in_flight, timeout)
+
+    # --- Süreçler arası dinleme ---
+
+    def listen(self):
+        """Diğer worker'ların tick'lerini almak için soketi açar (yalnızca lider süreç çağırmalı)."""
+        if self._listener is not None:
+            return
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)  # Ölü liderden kalan soket dosyası
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        sock.bind(self.socket_path)
+        # Yalnızca aynı kullanıcının süreçleri (worker'lar) tick gönderebilsin
+        os.chmod(self.socket_path, 0o600)
+        sock.settimeout(1.0)
+        self._listener = sock
+        threading.Thread(target=self._receive_loop, args=(sock,), daemon=True).start()
+        logger.info(f"Price bus listening on {self.socket_path} (pid {os.getpid()}).")
+
+    def close(self):
+        sock, self._listener = self._listener, None
+        if sock is None:
+            return
+        try:
+            os.unlink(self.socket_path)
+        except OSError:
+            pass
+        sock.close()
+
+    def _receive_loop(self, sock):
+        while self._listener is sock:
+            try:
+                data = sock.recv(1 << 20)
+                ticks = json.loads(data)
+            except socket.timeout:
+                continue
+            except (OSError, ValueError):
+                if self._listener is not sock:
+                    return
+                self._stats["errors"] += 1
+                continue
+            self._stats["received"] += len(ticks)
+            self.publish_many(ticks, forward=False)
+
+    # --- Replay ---
+
+    def replay(self, path, speed=0.0):
+        """
+        JSON lines tick dosyasını yayınlar: her satır {"ts": epoch, "symbol": "BTC", "price": 65000.0}.
+        speed=0 en hızlı oynatır; speed=1 gerçek zamanlı, 10 on kat hızlı.
+        Dönüş: yayınlanan tick sayısı.
+        """
+        count = 0
+        first_ts = started = None
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                tick = json.loads(line)
+                ts = float(tick.get("ts", 0))
+                if speed > 0:
+                    if first_ts is None:
+                        first_ts, started = ts, time.time()
+                    delay = (ts - first_ts) / speed - (time.time() - started)
+                    if delay > 0:
+                        time.sleep(delay)
+                count += self.publish_many({tick["symbol"]: tick["price"]})
+        return count
+
+    def stats(self):
+        with self._cond:
+            return dict(self._stats, subscribers=len(self._subscribers), listening=self._listener is not None)
+
+
+price_bus = PriceBus()
@@ -1,7 +1,7 @@
 from typing import Optional
 from datetime import datetime
 from models.pricing_config import PricingConfig, PricingTier, PromotionConfig, TrialConfig
-from database import get_db_connection
+from database import db_connection
 import json
 
 
@@ -42,8 +42,7 @@ class PricingService:
     @staticmethod
     async def get_pricing() -> PricingConfig:
         """Get current pricing configuration"""
-        db = get_db_connection()
-        try:
+        with db_connection() as db:
             result = db.execute(PricingService._GET_PRICING_QUERY).fetchone()
             
             if result:
@@ -66,8 +65,6 @@ class PricingService:
             config_data["updated_at"] = datetime.fromisoformat(config_data["updated_at"])
             
             return PricingConfig(**config_data)
-        finally:
-            db.close()
     
     @staticmethod
     async def _initialize_defaults(db):
@@ -81,8 +78,7 @@ class PricingService:
     @staticmethod
     async def update_pricing(updates: dict) -> PricingConfig:
         """Update pricing configuration"""
-        db = get_db_connection()
-        try:
+        with db_connection() as db:
             # Get current config
             result = db.execute(PricingService._GET_PRICING_QUERY).fetchone()
             
@@ -133,8 +129,6 @@ class PricingService:
             
             # Return updated config
             return await PricingService.get_pricing()
-        finally:
-            db.close()
     
     @staticmethod
     async def validate_promo_code(code: str) -> dict:
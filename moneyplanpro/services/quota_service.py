@@ -0,0 +1,245 @@
+import time
+import sqlite3
+import logging
+import threading
+import contextvars
+from contextlib import contextmanager
+from urllib.parse import urlsplit, parse_qs
+import anyio
+import requests
+from database import db_connection
+from services.settings_service import settings_service
+
+logger = logging.getLogger(__name__)
+
+# Sağlayıcı limitleri: "kapasite/periyot_saniye" (QUOTA_<PROVIDER> ayarıyla değiştirilebilir)
+DEFAULT_QUOTAS = {
+    "coingecko": "30/60",       # Demo plan ~30 çağrı/dk
+    "fmp": "250/86400",         # Ücretsiz plan 250 çağrı/gün
+    "twelvedata": "8/60",       # Ücretsiz plan 8 kredi/dk (sembol başına 1 kredi)
+    "binance": "6000/60",       # İstek ağırlığı/dk
+}
+# Upstream host -> sağlayıcı
+PROVIDER_HOSTS = {
+    "api.coingecko.com": "coingecko",
+    "financialmodelingprep.com": "fmp",
+    "api.twelvedata.com": "twelvedata",
+    "api.binance.com": "binance",
+}
+# Öncelik sınıfları: her sınıf kovanın bu oranı kalana kadar harcayabilir.
+# Kritik (alarm) son token'a kadar, arka plan (prefetch) %10'a, kullanıcı istekleri %30'a kadar.
+PRIORITY_FLOORS = {"critical": 0.0, "background": 0.1, "interactive": 0.3}
+# Parametresiz Binance çağrıları tüm çiftleri döner ve ağırlığı yüksektir
+BINANCE_WEIGHTS = {"/api/v3/ticker/24hr": (2, 80), "/api/v3/ticker/price": (2, 4), "/api/v3/klines": (2, 2)}
+
+_priority = contextvars.ContextVar("quota_priority", default="interactive")
+
+
+class QuotaExceeded(requests.exceptions.RequestException):
+    """Sağlayıcı bütçesi bu öncelik için tükendi; RequestException olduğu için servisler cache'e düşer."""
+
+
+class QuotaService:
+    """
+    Sağlayıcı başına token-bucket bütçesi.
+
+    Kovalar invest_guide.db -> provider_quotas tablosunda tutulur: tüm uvicorn worker'ları aynı bütçeyi
+    paylaşır ve yeniden başlatmada bütçe sıfırlanmaz. Her upstream isteği (SafeRequest / AsyncSafeRequest)
+    host'tan sağlayıcıyı bulur ve maliyeti kadar token düşer; kova, kapasite/periyot hızıyla dolar.
+    Öncelik sınıfı contextvar ile taşınır; düşük öncelikli çağrılar kovanın ayrılmış kısmına dokunamaz,
+    böylece bütçe azaldığında önce kullanıcı istekleri cache'e düşer, alarm ve prefetch çağrıları sürer.
+
+    Her istekte bir SQLite yazma işlemi açmamak için worker'lar kovadan kapasitenin QUOTA_LEASE_FRACTION'ı
+    kadar token'ı toplu olarak kiralar ve (sağlayıcı, öncelik) başına yerel kovada harcar; veritabanına
+    yalnızca kira bitince gidilir. Kiranın isteğin maliyetini aşan kısmı yalnızca en yüksek tabanın
+    (kullanıcı istekleri) üstündeki token'lardan alınır: ayrılmış pay hiçbir worker'da kira olarak bekletilmez,
+    alarm ve prefetch çağrıları o payı yalnızca kendi maliyetleri kadar harcar. Kullanılmayan kiralar worker
+    kapanırken (release_leases) kovaya geri verilir.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._denied = {}
+        self._leases = {}  # (sağlayıcı, öncelik) -> yerelde kalan token
+
+    @contextmanager
+    def priority(self, name):
+        """Bu blokta yapılan upstream çağrılarının öncelik sınıfı ("critical", "background", "interactive")."""
+        token = _priority.set(name)
+        try:
+            yield
+        finally:
+            _priority.reset(token)
+
+    def limits(self, provider):
+        """(kapasite, periyot_saniye) veya limit tanımlı değilse None."""
+        raw = settings_service.get_value(f"QUOTA_{provider.upper()}", DEFAULT_QUOTAS.get(provider))
+        try:
+            capacity, period = raw.split("/")
+            return float(capacity), float(period)
+        except (AttributeError, ValueError):
+            return None
+
+    def lease_fraction(self):
+        try:
+            return float(settings_service.get_value("QUOTA_LEASE_FRACTION", "0.02"))
+        except ValueError:
+            return 0.0
+
+    def check(self, url, params=None):
+        """Upstream isteğinden önce çağrılır; bütçe yoksa QuotaExceeded fırlatır."""
+        request = self._request_cost(url, params)
+        if request and not self.try_acquire(*request):
+            raise QuotaExceeded(f"{request[0]} budget exhausted for {_priority.get()} requests")
+
+    async def acheck(self, url, params=None):
+        """check'in async karşılığı: yerel kira yetmezse SQLite işlemi event loop'u bloklamasın diye thread'de yapılır."""
+        request = self._request_cost(url, params)
+        if request is None:
+            return
+        provider, cost = request
+        priority = _priority.get()
+        if self._take_lease(provider, priority, cost):
+            return
+        if not await anyio.to_thread.run_sync(self._acquire, provider, cost, priority):
+            raise QuotaExceeded(f"{provider} budget exhausted for {priority} requests")
+
+    def try_acquire(self, provider, cost=1.0):
+        priority = _priority.get()
+        return self._take_lease(provider, priority, cost) or self._acquire(provider, cost, priority)
+
+    def _request_cost(self, url, params):
+        """(sağlayıcı, maliyet) veya istek bütçeye tabi değilse None."""
+        if settings_service.get_value("QUOTA_ENABLED", "1") != "1":
+            return None
+        parts = urlsplit(url)
+        provider = PROVIDER_HOSTS.get(parts.hostname or "")
+        if provider is None:
+            return None
+        return provider, self._cost(provider, parts, params)
+
+    def _take_lease(self, provider, priority, cost):
+        with self._lock:
+            left = self._leases.get((provider, priority), 0.0)
+            if left < cost:
+                return False
+            self._leases[(provider, priority)] = left - cost
+            return True
+
+    def _acquire(self, provider, cost, priority):
+        """Paylaşımlı kovadan maliyet + kira kadar token alır; fazlası yerel kiraya eklenir."""
+        limits = self.limits(provider)
+        if limits is None:
+            return True
+        capacity, period = limits
+        floor = capacity * PRIORITY_FLOORS.get(priority, PRIORITY_FLOORS["interactive"])
+        lease_floor = capacity * max(PRIORITY_FLOORS.values())
+        wanted = max(cost, capacity * self.lease_fraction())
+        try:
+            with db_connection() as conn:
+                # Okuma-yazma tek yazma kilidi altında: worker'lar aynı token'ı iki kez harcayamaz
+                conn.execute("BEGIN IMMEDIATE")
+                tokens = self._refill(conn.execute(
+                    "SELECT tokens, updated_at FROM provider_quotas WHERE provider = ?", (provider,)
+                ).fetchone(), capacity, period)
+                if tokens - cost < floor:
+                    conn.rollback()
+                    with self._lock:
+                        self._denied[provider] = self._denied.get(provider, 0) + 1
+                    return False
+                # Taban yaklaştıkça kira küçülür, ayrılmış payda yalnızca maliyet alınır;
+                # son token'lar worker'lar arasında paylaşılmaya devam eder
+                granted = cost + min(wanted - cost, max(0.0, tokens - cost - lease_floor))
+                self._save(conn, provider, tokens - granted)
+        except sqlite3.Error as e:
+            # Bütçe deposuna ulaşılamıyorsa istekleri engelleme
+            logger.error(f"Quota store error ({provider}): {e}")
+            return True
+        with self._lock:
+            key = (provider, priority)
+            self._leases[key] = self._leases.get(key, 0.0) + granted - cost
+        return True
+
+    def release_leases(self):
+        """Yerel kiralarda kalan token'ları paylaşımlı kovaya geri verir; worker kapanırken çağrılır."""
+        with self._lock:
+            leases, self._leases = self._leases, {}
+        returned = {}
+        for (provider, _), left in leases.items():
+            if left > 0:
+                returned[provider] = returned.get(provider, 0.0) + left
+        for provider, amount in returned.items():
+            limits = self.limits(provider)
+            if limits is None:
+                continue
+            try:
+                with db_connection() as conn:
+                    conn.execute("BEGIN IMMEDIATE")
+                    tokens = self._refill(conn.execute(
+                        "SELECT tokens, updated_at FROM provider_quotas WHERE provider = ?", (provider,)
+                    ).fetchone(), *limits)
+                    self._save(conn, provider, min(limits[0], tokens + amount))
+            except sqlite3.Error as e:
+                logger.error(f"Quota lease release failed ({provider}): {e}")
+
+    @staticmethod
+    def _save(conn, provider, tokens):
+        conn.execute("""
+            INSERT INTO provider_quotas (provider, tokens, updated_at) VALUES (?, ?, ?)
+            ON CONFLICT(provider) DO UPDATE SET tokens = excluded.tokens, updated_at = excluded.updated_at
+        """, (provider, tokens, time.time()))
+
+    def remaining(self, provider):
+        limits = self.limits(provider)
+        if limits is None:
+            return None
+        with db_connection() as conn:
+            row = conn.execute("SELECT tokens, updated_at FROM provider_quotas WHERE provider = ?",
+                               (provider,)).fetchone()
+        return self._refill(row, *limits)
+
+    def stats(self):
+        result = {}
+        for provider in DEFAULT_QUOTAS:
+            limits = self.limits(provider)
+            if limits is None:
+                continue
+            try:
+                remaining = self.remaining(provider)
+            except sqlite3.Error:
+                remaining = None
+            with self._lock:
+                denied = self._denied.get(provider, 0)
+                leased = sum(left for (name, _), left in self._leases.items() if name == provider)
+            result[provider] = {
+                "capacity": limits[0], "period_sec": limits[1],
+                "remaining": round(remaining, 1) if remaining is not None else None,
+                "leased": round(leased, 1),
+                "denied": denied
+            }
+        return result
+
+    @staticmethod
+    def _refill(row, capacity, period):
+        if row is None:
+            return capacity
+        elapsed = max(0.0, time.time() - row["updated_at"])
+        return min(capacity, row["tokens"] + elapsed * capacity / period)
+
+    @staticmethod
+    def _cost(provider, parts, params):
+        query = parse_qs(parts.query)
+        if isinstance(params, dict):
+            for k, v in params.items():
+                query.setdefault(k, [v])
+        if provider == "twelvedata":
+            # Her sembol bir kredi
+            symbols = (query.get("symbol") or [""])[0]
+            return float(max(1, len(str(symbols).split(","))))
+        if provider == "binance":
+            with_symbol, without_symbol = BINANCE_WEIGHTS.get(parts.path, (1, 1))
+            return float(with_symbol if "symbol" in query or "symbols" in query else without_symbol)
+        return 1.0
+
+
+quota_service = QuotaService()
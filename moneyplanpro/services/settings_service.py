@@ -1,7 +1,7 @@
 import json
 import logging
 import os
-from database import get_db_connection
+from database import db_connection
 
 logger = logging.getLogger(__name__)
 
@@ -13,57 +13,92 @@ class SettingsService:
 
     def _init_table(self):
         try:
-            conn = get_db_connection()
-            conn.execute("""
-                CREATE TABLE IF NOT EXISTS app_settings (
-                    key TEXT PRIMARY KEY,
-                    value TEXT,
-                    description TEXT,
-                    category TEXT,
-                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            """)
-            # Seed default settings if empty
-            defaults = [
-                ("BINANCE_API_KEY", "", "Binance API Key for Crypto Data", "api_keys"),
-                ("TWELVEAPI_TOKEN", "", "Twelve Data API Key for Global Stocks", "api_keys"),
-                ("FMP_API_KEY", "7c217dd8a15590c1920935cb48e8c7f9", "FMP API Key for Detailed Stock Data", "api_keys"),
-                ("NEWS_SOURCES", json.dumps([
-                    {"name": "Bloomberg HT", "url": "https://www.bloomberght.com/rss"},
-                    {"name": "Habertürk", "url": "https://www.haberturk.com/rss/ekonomi.xml"},
-                    {"name": "Investing", "url": "https://tr.investing.com/rss/news.rss"}
-                ]), "Active RSS News Sources", "content"),
-                ("ENABLE_FEAR_GREED", "true", "Toggle Crypto Fear & Greed Index", "features"),
-                ("ONESIGNAL_APP_ID", "", "OneSignal Application ID", "api_keys"),
-                ("ONESIGNAL_REST_API_KEY", "", "OneSignal Rest API Key", "api_keys"),
-                ("SUPABASE_URL", "https://gbncnwinlmniohafhnqf.supabase.co", "Supabase API URL", "api_keys"),
-                ("SUPABASE_SERVICE_ROLE_KEY", "", "Supabase Service Role Key (CRITICAL: Private)", "api_keys"),
-                ("ALERT_MONITOR_ENABLED", "1", "Enable/Disable Price Alert Monitoring", "features"),
-                ("ALERT_MONITOR_INTERVAL_SEC", "60", "Monitoring check interval in seconds", "performance")
-            ]
+            with db_connection() as conn:
+                conn.execute("""
+                    CREATE TABLE IF NOT EXISTS app_settings (
+                        key TEXT PRIMARY KEY,
+                        value TEXT,
+                        description TEXT,
+                        category TEXT,
+                        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                    )
+                """)
+                # Seed default settings if empty
+                defaults = [
+                    ("BINANCE_API_KEY", "", "Binance API Key for Crypto Data", "api_keys"),
+                    ("TWELVEAPI_TOKEN", "", "Twelve Data API Key for Global Stocks", "api_keys"),
+                    ("FMP_API_KEY", "7c217dd8a15590c1920935cb48e8c7f9", "FMP API Key for Detailed Stock Data", "api_keys"),
+                    ("NEWS_SOURCES", json.dumps([
+                        {"name": "Bloomberg HT", "url": "https://www.bloomberght.com/rss"},
+                        {"name": "Habertürk", "url": "https://www.haberturk.com/rss/ekonomi.xml"},
+                        {"name": "Investing", "url": "https://tr.investing.com/rss/news.rss"}
+                    ]), "Active RSS News Sources", "content"),
+                    ("ENABLE_FEAR_GREED", "true", "Toggle Crypto Fear & Greed Index", "features"),
+                    ("ONESIGNAL_APP_ID", "", "OneSignal Application ID", "api_keys"),
+                    ("ONESIGNAL_REST_API_KEY", "", "OneSignal Rest API Key", "api_keys"),
+                    ("SUPABASE_URL", "https://gbncnwinlmniohafhnqf.supabase.co", "Supabase API URL", "api_keys"),
+                    ("SUPABASE_SERVICE_ROLE_KEY", "", "Supabase Service Role Key (CRITICAL: Private)", "api_keys"),
+                    ("ALERT_MONITOR_ENABLED", "1", "Enable/Disable Price Alert Monitoring", "features"),
+                    ("ALERT_MONITOR_INTERVAL_SEC", "60", "Monitoring check interval in seconds", "performance"),
+                    ("ALERT_SYNC_PAGE_SIZE", "1000", "Rows per PostgREST page when loading price alerts", "performance"),
+                    ("ALERT_SYNC_OVERLAP_SEC", "120", "Overlap window re-read on each updated_at delta sync", "performance"),
+                    ("ALERT_FULL_SYNC_SEC", "3600", "Seconds between full alert reloads (catches hard deletes)", "performance"),
+                    ("CACHE_BACKEND", "", "Cache backend: memory (per worker), file (shared /dev/shm) or redis (restart required)", "performance"),
+                    ("REDIS_URL", "", "Redis connection URL for the redis cache backend", "performance"),
+                    ("CACHE_MAX_ENTRIES", "5000", "Max cache entries per worker before LRU eviction", "performance"),
+                    ("CACHE_MAX_MB", "64", "Max memory (MB) for the in-process cache before LRU eviction", "performance"),
+                    ("CACHE_TTL_MARKET_SUMMARY", "60", "Market summary cache TTL in seconds", "performance"),
+                    ("CACHE_TTL_CRYPTO", "600", "Top crypto list cache TTL in seconds", "performance"),
+                    ("CACHE_TTL_COMMODITIES", "300", "Commodity list cache TTL in seconds", "performance"),
+                    ("CACHE_TTL_TCMB", "300", "TRY currency list cache TTL in seconds", "performance"),
+                    ("CACHE_TTL_NEWS", "900", "News feed cache TTL in seconds", "performance"),
+                    ("CACHE_TTL_QUOTE", "30", "Per-symbol quote cache TTL for /market/quotes in seconds", "performance"),
+                    ("CACHE_TTL_ASSET_QUOTE", "15", "Live quote fields (price, change, ranges) cache TTL for asset detail", "performance"),
+                    ("CACHE_TTL_ASSET_PROFILE", "86400", "Static profile fields (name, description, logo) cache TTL for asset detail", "performance"),
+                    ("QUOTES_MAX_SYMBOLS", "200", "Maximum symbols per /market/quotes request", "performance"),
+                    ("CIRCUIT_FAILURE_THRESHOLD", "5", "Consecutive provider failures before its circuit opens", "performance"),
+                    ("CIRCUIT_RESET_SEC", "60", "Seconds an open provider circuit waits before a half-open probe", "performance"),
+                    ("HEDGE_ENABLED", "0", "Fire a parallel request to the next provider when the first is slower than its p95 (1=on)", "performance"),
+                    ("HEDGE_BUDGET_PER_MIN", "30", "Maximum hedge requests per provider per minute in each worker", "performance"),
+                    ("HEDGE_BUDGET_FMP", "0", "Maximum hedge requests to FMP per minute in each worker (daily quota)", "performance"),
+                    ("HEDGE_BUDGET_TWELVEDATA", "2", "Maximum hedge requests to TwelveData per minute in each worker", "performance"),
+                    ("DEADLINE_DETAIL_SEC", "8", "Total time budget for /market/detail across all providers", "performance"),
+                    ("DEADLINE_HISTORY_SEC", "15", "Total time budget for /market/history across all providers", "performance"),
+                    ("DEADLINE_QUOTES_SEC", "10", "Total time budget for /market/quotes across all providers", "performance"),
+                    ("NEG_CACHE_BASE_SEC", "60", "First negative-cache period for symbols no provider could resolve", "performance"),
+                    ("NEG_CACHE_MAX_SEC", "3600", "Upper bound for the doubling negative-cache period", "performance"),
+                    ("UNSUPPORTED_TTL_SEC", "21600", "How long a provider is skipped for a symbol it does not know", "performance"),
+                    ("UNSUPPORTED_MIN_MISSES", "3", "Consecutive empty answers before a provider is skipped for a symbol", "performance"),
+                    ("QUOTA_ENABLED", "1", "Enforce per-provider token-bucket budgets (1=on)", "performance"),
+                    ("QUOTA_FMP", "250/86400", "FMP budget as calls/period_sec", "performance"),
+                    ("QUOTA_COINGECKO", "30/60", "CoinGecko budget as calls/period_sec", "performance"),
+                    ("QUOTA_TWELVEDATA", "8/60", "TwelveData budget as credits/period_sec (one credit per symbol)", "performance"),
+                    ("QUOTA_BINANCE", "6000/60", "Binance budget as request weight/period_sec", "performance"),
+                    ("QUOTA_LEASE_FRACTION", "0.02", "Share of a provider budget each worker leases per DB transaction", "performance"),
+                    ("HTTP_POOL_MAXSIZE", "20", "Keep-alive connections kept per upstream host", "performance"),
+                    ("HTTP_RETRY_TOTAL", "2", "Retries for idempotent upstream requests (429/5xx/connection errors)", "performance"),
+                    ("HTTP_RETRY_BACKOFF", "0.5", "Exponential backoff factor between upstream retries", "performance"),
+                    ("HISTORY_DELTA_MAX_AGE", "900", "Max seconds between upstream delta checks for stored chart candles", "performance"),
+                    ("PREFETCH_ENABLED", "1", "Enable/Disable background prefetch of hot market endpoints", "features")
+                ]
             
-            cursor = conn.cursor()
-            for key, val, desc, cat in defaults:
-                cursor.execute("INSERT OR IGNORE INTO app_settings (key, value, description, category) VALUES (?, ?, ?, ?)", (key, val, desc, cat))
-            
-            conn.commit()
-            conn.close()
+                cursor = conn.cursor()
+                for key, val, desc, cat in defaults:
+                    cursor.execute("INSERT OR IGNORE INTO app_settings (key, value, description, category) VALUES (?, ?, ?, ?)", (key, val, desc, cat))
         except Exception as e:
             logger.error(f"Error initializing settings table: {e}")
 
     def _load_cache(self):
         try:
-            conn = get_db_connection()
-            rows = conn.execute("SELECT key, value FROM app_settings").fetchall()
-            conn.close()
+            with db_connection() as conn:
+                rows = conn.execute("SELECT key, value FROM app_settings").fetchall()
             self._cache = {row["key"]: row["value"] for row in rows}
         except Exception as e:
             logger.error(f"Error loading settings cache: {e}")
 
     def get_all(self):
-        conn = get_db_connection()
-        rows = conn.execute("SELECT * FROM app_settings").fetchall()
-        conn.close()
+        with db_connection() as conn:
+            rows = conn.execute("SELECT * FROM app_settings").fetchall()
         settings = [dict(r) for r in rows]
         
         # Fallback to os.getenv if value is empty in DB
@@ -76,10 +111,8 @@ class SettingsService:
 
     def update(self, key, value):
         try:
-            conn = get_db_connection()
-            conn.execute("UPDATE app_settings SET value = ?, updated_at = CURRENT_TIMESTAMP WHERE key = ?", (value, key))
-            conn.commit()
-            conn.close()
+            with db_connection() as conn:
+                conn.execute("UPDATE app_settings SET value = ?, updated_at = CURRENT_TIMESTAMP WHERE key = ?", (value, key))
             self._cache[key] = value # Update cache
             return True
         except Exception as e:
@@ -99,9 +132,8 @@ class SettingsService:
         
         # 3. Last fallback to DB just in case cache missed (shouldn't happen)
         try:
-            conn = get_db_connection()
-            row = conn.execute("SELECT value FROM app_settings WHERE key = ?", (key,)).fetchone()
-            conn.close()
+            with db_connection() as conn:
+                row = conn.execute("SELECT value FROM app_settings WHERE key = ?", (key,)).fetchone()
             if row and row["value"]:
                 self._cache[key] = row["value"]
                 return row["value"]
@@ -0,0 +1,263 @@
+import time
+import threading
+import logging
+from utils.cache import cache
+
+logger = logging.getLogger(__name__)
+
+# --- Statik sembol tabloları (servislerde dağınık duran listelerin tek kaynağı) ---
+
+CRYPTO = ["BTC", "ETH", "SOL", "BNB", "XRP", "ADA", "DOGE", "DOT", "LINK", "MATIC",
+          "AVAX", "ZEC", "POL", "FDUSD", "USDT"]
+
+BIST_STOCKS = ["THYAO", "GARAN", "AKBNK", "EREGL", "ASELS", "SISE", "BIMAS", "TUPRS",
+               "KCHOL", "SAHOL", "PETKM", "FROTO", "TOASO", "TCELL"]
+# Endeksler: uygulama sembolü -> BIST kodu
+BIST_INDICES = {"XU100": "XU100", "BIST100": "XU100", "XU030": "XU030"}
+
+# TRY karşısındaki dövizler (TCMB listesi)
+FX_TRY = ["USD", "EUR", "GBP", "CHF", "JPY", "CAD", "AUD", "DKK", "SEK", "NOK", "SAR"]
+
+# Emtialar: sembol -> (TradingView sembolü, screener, borsa)
+COMMODITIES = {
+    "XAU/USD": ("XAUUSD", "forex", "FX_IDC"),
+    "XAG/USD": ("XAGUSD", "forex", "FX_IDC"),
+    "LCO/USD": ("UKOIL", "cfd", "TVC"),
+    "WTI/USD": ("USOIL", "cfd", "TVC"),
+    "PLATINUM": ("PLATINUM", "cfd", "TVC"),
+    "PALLADIUM": ("PALLADIUM", "cfd", "TVC"),
+    "COPPER": ("COPPER", "cfd", "TVC"),
+    "NATURAL_GAS": ("NATGAS", "cfd", "TVC"),
+    "CORN": ("CORN", "cfd", "TVC"),
+    "WHEAT": ("WHEAT", "cfd", "TVC"),
+    "SOYBEAN": ("SOYBEAN", "cfd", "TVC"),
+    "COFFEE": ("COFFEE", "cfd", "TVC"),
+    "SUGAR": ("SUGAR", "cfd", "TVC"),
+    "COTTON": ("COTTON", "cfd", "TVC"),
+    "GOLD": ("GOLD", "cfd", "TVC"),
+    "SILVER": ("SILVER", "cfd", "TVC")
+}
+# Altın/petrol için Yahoo vadeli kontrat karşılıkları
+YAHOO_COMMODITIES = {"GAU": "GC=F", "GRAM_ALTIN": "GC=F", "ONS": "GC=F", "ONS_ALTIN": "GC=F", "BRENT": "BZ=F"}
+
+DE_STOCKS = ["SAP", "SIE", "ALV", "DTE", "BMW", "VOW3", "BAS", "AIR", "DDAIF"]
+UK_STOCKS = ["SHEL", "HSBA", "AZN", "ULVR", "BP.", "BARC", "VOD", "LLOY", "NG."]
+US_NYSE = ["KO", "PEP", "MCD", "V", "MA", "JPM", "DIS", "BRK.B", "SPY", "VOO",
+           "GLD", "SLV", "VTI", "IVV", "AGG", "LQD", "HYG"]
+US_ETFS = ["SPY", "QQQ", "VOO", "GLD", "SLV", "VTI", "IVV", "ARKK", "TLT", "BND", "AGG", "SHY", "IEF", "LQD", "HYG"]
+
+# investpy fon listesi alınamazsa kullanılan TEFAS fonları
+TEFAS_FALLBACK = ["TCD", "AFT", "YAY", "TTE", "IPB", "AES", "IDH", "KZL", "IPJ", "KUB", "TI3", "KRS",
+                  "PPF", "HKH", "AYA", "MAC", "GMR", "TCA", "ZJ1", "IIH"]
+# Fon isimleri için manuel mapping (Premium görünüm için)
+FUND_NAMES = {
+    "TCD": "Tacirler Portföy Değişken Fon",
+    "AFT": "Ak Portföy Yeni Teknolojiler Yabancı Hisse",
+    "YAY": "Yapı Kredi Por. Yeni Teknolojiler Yab. Hisse",
+    "TTE": "İş Portföy BIST Teknoloji Ağırlıklı Hisse",
+    "IPB": "İstanbul Portföy Birinci Değişken Fon",
+    "AES": "Ak Portföy Petrol Yabancı BYF Fon Sepeti",
+    "IDH": "İş Portföy İhracatçı Şirketler Hisse Senedi",
+    "KZL": "Kuveyt Türk Portföy Altın Katılım Fonu",
+    "MAC": "Marmara Capital Portföy Hisse Senedi Fonu",
+    "GMR": "Global MD Portföy Birinci Hisse Senedi Fonu",
+    "TCA": "Ziraat Portföy Altın Katılım Fonu",
+    "ZJ1": "Ziraat Portföy Birinci Kira Sertifikası Katılım",
+    "HMB": "HSBC Portföy Çoklu Varlık Değişken Fon",
+    "MPK": "Mükafaat Portföy Katılım Katılım Fonu",
+    "IIH": "İstanbul Portföy Üçüncü Hisse Senedi Fonu",
+    "KUB": "Kuveyt Türk Sürdürülebilirlik Katılım Fonu",
+    "GSP": "Azimut Portföy Sky Hisse Senedi Fonu",
+    "HKH": "Hedef Portföy Katılım Hisse Senedi Fonu",
+    "TI3": "İş Portföy İşte Kadın Hisse Senedi Fonu",
+    "DBH": "Deniz Portföy Eurobond (USD) Borçlanma Araçları"
+}
+
+# Kurallarla çözülen (tabloda olmayan) semboller için memo sınırı
+MEMO_MAX = 10000
+# Diğer worker'ların yaptığı refresh'i fark etmek için paylaşımlı cache'teki sürüm damgasının kontrol sıklığı (saniye)
+VERSION_CHECK_SEC = 60
+VERSION_KEY = "symbol_registry_version"
+
+
+class SymbolRegistry:
+    """
+    Tüm servislerin kullandığı tek sembol kaydı.
+
+    Her bilinen sembol için varlık sınıfı, sağlayıcı sembolleri (TradingView sembol/screener/borsa,
+    Yahoo, FMP, TwelveData, Binance çifti) ve görüntü bilgileri (isim, ülke, para birimi) bir kez
+    hesaplanıp sözlükte tutulur; lookup() O(1)'dir. Tabloda olmayan semboller eski kurallarla
+    çözülür ve memo'lanır. refresh() indeksi (fon listesi dahil) yeniden kurup atomik olarak değiştirir
+    ve paylaşımlı cache'e bir sürüm damgası yazar; diğer worker'lar damgayı görünce kendi indekslerini
+    arka plan thread'inde yeniler (fon listesi ağdan gelir), yenisi hazır olana kadar eski indeks kullanılır.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._index = None
+        self._memo = {}
+        self._version = None
+        self._version_checked = 0
+        self._reloading = False
+
+    def lookup(self, symbol):
+        """Sembolün kayıt girdisi: {"symbol", "asset_class", "country", "name", "currency", "tv", "yahoo", "fmp", "twelve", "binance"}"""
+        s = (symbol or "").upper().strip()
+        entry = self._ensure_index().get(s) or self._memo.get(s)
+        if entry is None:
+            entry = self._from_rules(s)
+            if len(self._memo) >= MEMO_MAX:
+                self._memo = {}
+            self._memo[s] = entry
+        return entry
+
+    def asset_class(self, symbol):
+        return self.lookup(symbol)["asset_class"]
+
+    def is_crypto(self, symbol):
+        return self.lookup(symbol)["asset_class"] == "crypto"
+
+    def is_fund(self, symbol):
+        return self.lookup(symbol)["asset_class"] == "fund"
+
+    def refresh(self, publish=True):
+        """
+        İndeksi yeniden kurar (job ile periyodik çağrılır). Dönüş: kayıtlı sembol sayısı.
+        publish=False (worker açılışı): paylaşımlı sürüm damgası benimsenir, böylece açılıştan hemen sonra
+        damga farkı yüzünden indeks ikinci kez kurulmaz.
+        """
+        version = time.time() if publish else cache.get(VERSION_KEY)
+        index = self._build()
+        self._install(index, version)
+        if publish:
+            cache.set(VERSION_KEY, version, ttl_seconds=30 * 86400)
+        return len(index)
+
+    def _install(self, index, version):
+        with self._lock:
+            self._index = index
+            self._memo = {}
+            self._version = version
+            self._version_checked = time.time()
+        logger.info(f"Symbol registry loaded: {len(index)} symbols.")
+
+    def stats(self):
+        index = self._index or {}
+        classes = {}
+        for entry in index.values():
+            classes[entry["asset_class"]] = classes.get(entry["asset_class"], 0) + 1
+        return {"symbols": len(index), "memo": len(self._memo), "classes": classes, "version": self._version}
+
+    def _ensure_index(self):
+        index = self._index
+        if index is None:
+            with self._lock:
+                if self._index is None:
+                    self._index = self._build()
+                    self._version = cache.get(VERSION_KEY)
+                    self._version_checked = time.time()
+                index = self._index
+        elif time.time() - self._version_checked >= VERSION_CHECK_SEC:
+            self._version_checked = time.time()
+            version = cache.get(VERSION_KEY)
+            if version and version != self._version:
+                self._reload_in_background(version)
+        return index
+
+    def _reload_in_background(self, version):
+        """Başka worker'ın refresh'ini izler; istek yolunu (event loop dahil) fon listesi çekimiyle bloklamaz."""
+        with self._lock:
+            if self._reloading:
+                return
+            self._reloading = True
+
+        def reload():
+            try:
+                self._install(self._build(), version)
+            except Exception as e:
+                logger.error(f"Symbol registry reload failed: {e}")
+            finally:
+                self._reloading = False
+
+        threading.Thread(target=reload, name="symbol-registry-reload", daemon=True).start()
+
+    # --- İndeks kurulumu ---
+
+    def _build(self):
+        index = {}
+
+        def add(symbol, asset_class, country, **routes):
+            entry = self._from_rules(symbol)
+            entry.update(asset_class=asset_class, country=country)
+            entry.update({k: v for k, v in routes.items() if v is not None})
+            index[symbol] = entry
+
+        for s in US_NYSE + US_ETFS:
+            add(s, "etf" if s in US_ETFS else "stock", "USA")
+        for s in DE_STOCKS:
+            add(s, "stock", "Germany", tv=(s, "germany", "XETR"))
+        for s in UK_STOCKS:
+            add(s, "stock", "UK", tv=(s, "uk", "LSE"))
+        for s, tv in COMMODITIES.items():
+            add(s, "commodity", "Global", tv=tv)
+        for s, y in YAHOO_COMMODITIES.items():
+            add(s, "commodity", "Global", yahoo=y)
+        for s in FX_TRY:
+            pair = "TRY=X" if s == "USD" else f"{s}TRY=X"
+            add(s, "forex", "Turkey", tv=(f"{s}TRY", "forex", "FX_IDC"), yahoo=pair,
+                fmp=f"{s}TRY", twelve=f"{s}/TRY", currency="TRY")
+        for s in BIST_STOCKS:
+            add(s, "stock", "Turkey", tv=(s, "turkey", "BIST"), yahoo=f"{s}.IS", fmp=f"{s}.IS", currency="TRY")
+        for s, code in BIST_INDICES.items():
+            add(s, "index", "Turkey", tv=(code, "turkey", "BIST"), yahoo=f"{code}.IS", currency="TRY")
+        for s in CRYPTO:
+            add(s, "crypto", "Global", yahoo=f"{s}-USD", currency="USD")
+        for s in self._load_funds():
+            add(s, "fund", "Turkey", name=FUND_NAMES.get(s, f"{s} Yatırım Fonu"), currency="TRY")
+        return index
+
+    def _load_funds(self):
+        funds = set(TEFAS_FALLBACK) | set(FUND_NAMES)
+        try:
+            import investpy
+            df_funds = investpy.get_funds(country='turkey')
+            if df_funds is not None and not df_funds.empty:
+                funds |= set(df_funds['symbol'].str.upper().tolist())
+        except Exception as e:
+            logger.info(f"investpy fund list unavailable, using built-in TEFAS list: {e}")
+        return sorted(funds)
+
+    # --- Kural tabanlı çözümleme (tabloda olmayan semboller) ---
+
+    def _from_rules(self, s):
+        # Temiz sembol (Mapping için)
+        c = s.replace(".IS", "").replace("USDT", "").replace("/TRY", "").replace("TRY", "")
+
+        if c in CRYPTO or "USDT" in s:
+            asset_class, country = "crypto", "Global"
+            tv = ((s if s.endswith("USDT") else f"{c}USDT"), "crypto", "BINANCE")
+        elif s.endswith(".IS"):
+            asset_class, country = "stock", "Turkey"
+            tv = (c, "turkey", "BIST")
+        elif c in FX_TRY or "TRY" in s:
+            asset_class, country = "forex", "Turkey"
+            tv = ((f"{c}TRY" if "TRY" not in s else s), "forex", "FX_IDC")
+        else:
+            asset_class, country = "stock", "USA"
+            tv = (s, "america", "NYSE" if s in US_NYSE else "NASDAQ")
+
+        return {
+            "symbol": s,
+            "asset_class": asset_class,
+            "country": country,
+            "name": s,
+            "currency": "USD",
+            "tv": tv,
+            "yahoo": "BTC-USD" if s == "BTCUSD" else s,
+            "fmp": s,
+            "twelve": s,
+            "binance": s if s.endswith("USDT") or s == "USDT" else f"{s}USDT",
+        }
+
+
+symbol_registry = SymbolRegistry()
@@ -1,5 +1,9 @@
+import re
 from tradingview_ta import TA_Handler, Interval, Exchange
 from utils.cache import cache
+from utils.network import UpstreamError
+from services.price_bus import price_bus
+from services.symbol_registry import symbol_registry
 
 class TradingViewService:
     def __init__(self):
@@ -11,6 +15,11 @@ class TradingViewService:
         Optimize Edilmiş Çoklu Analiz (Batch Request)
         Sembolleri screener'larına göre gruplayıp kütüphanenin 'get_multiple_analysis' fonksiyonunu kullanır.
         """
+        # Aynı sembol listesi için eşzamanlı istekler tek bir TradingView taramasını paylaşır
+        flight_key = "ta_batch_" + ",".join(sorted(symbols))
+        return cache.flights.do(flight_key, lambda: self._fetch_multiple_analysis(symbols))
+
+    def _fetch_multiple_analysis(self, symbols):
         from tradingview_ta import get_multiple_analysis as tv_batch_get
         
         # 1. Sembolleri Grupla
@@ -68,68 +77,12 @@ class TradingViewService:
                 print(f"TA Batch Error ({screener}): {e}")
 
         results.sort(key=lambda x: x.get("volume", 0) or 0, reverse=True)
+        price_bus.publish_many({item["symbol"]: item.get("price") for item in results})
         return results
 
     def _classify_symbol(self, symbol):
-        """Sembolü analiz eder: (CleanSymbol, Screener, Exchange)"""
-        s = symbol.upper().strip()
-        # Temiz sembol (Mapping için)
-        c = s.replace(".IS", "").replace("USDT", "").replace("/TRY", "").replace("TRY", "")
-        
-        # 1. CRYPTO
-        crypto_list = ["BTC", "ETH", "SOL", "BNB", "XRP", "ADA", "DOGE", "DOT", "LINK", "MATIC"]
-        if c in crypto_list or "USDT" in s:
-            return (s if s.endswith("USDT") else f"{c}USDT"), "crypto", "BINANCE"
-            
-        # 2. BIST (Turkey)
-        if s.endswith(".IS") or s in ["XU100", "XU030", "GARAN", "THYAO", "ASELS", "EREGL", "SISE"]:
-            return c, "turkey", "BIST"
-            
-        # 3. FOREX (Pairs like USD/TRY or USD)
-        fx_list = ["USD", "EUR", "GBP", "CHF", "JPY", "CAD", "AUD", "DKK", "SEK", "NOK", "SAR"]
-        if c in fx_list or "TRY" in s:
-            return (f"{c}TRY" if "TRY" not in s else s), "forex", "FX_IDC"
-
-        # 4. COMMODITIES / CFD (Special handling for metals and energy)
-        # We use FX_IDC for XAU/XAG and common CFD names for others.
-        commodities = {
-            "XAU/USD": ("XAUUSD", "forex", "FX_IDC"),
-            "XAG/USD": ("XAGUSD", "forex", "FX_IDC"),
-            "LCO/USD": ("UKOIL", "cfd", "TVC"),
-            "WTI/USD": ("USOIL", "cfd", "TVC"),
-            "PLATINUM": ("PLATINUM", "cfd", "TVC"),
-            "PALLADIUM": ("PALLADIUM", "cfd", "TVC"),
-            "COPPER": ("COPPER", "cfd", "TVC"),
-            "NATURAL_GAS": ("NATGAS", "cfd", "TVC"),
-            "CORN": ("CORN", "cfd", "TVC"),
-            "WHEAT": ("WHEAT", "cfd", "TVC"),
-            "SOYBEAN": ("SOYBEAN", "cfd", "TVC"),
-            "COFFEE": ("COFFEE", "cfd", "TVC"),
-            "SUGAR": ("SUGAR", "cfd", "TVC"),
-            "COTTON": ("COTTON", "cfd", "TVC"),
-            "GOLD": ("GOLD", "cfd", "TVC"),
-            "SILVER": ("SILVER", "cfd", "TVC")
-        }
-        
-        if s in commodities:
-            return commodities[s]
-        if c in commodities:
-            return commodities[c]
-            
-        # 5. GERMANY
-        if s in ["SAP", "SIE", "ALV", "DTE", "BMW", "VOW3", "BAS", "AIR", "DDAIF"]:
-            return s, "germany", "XETR"
-            
-        # 6. UK
-        if s in ["SHEL", "HSBA", "AZN", "ULVR", "BP.", "BARC", "VOD", "LLOY", "NG."]:
-            return s, "uk", "LSE"
-            
-        # 7. AMERICA (Stocks, ETFs, Bonds)
-        nyse_list = ["KO", "PEP", "MCD", "V", "MA", "JPM", "DIS", "BRK.B", "SPY", "VOO", 
-                     "GLD", "SLV", "VTI", "IVV", "AGG", "LQD", "HYG"]
-        
-        exchange = "NYSE" if s in nyse_list else "NASDAQ"
-        return s, "america", exchange
+        """Sembolü analiz eder: (CleanSymbol, Screener, Exchange) - sembol kaydından O(1)"""
+        return symbol_registry.lookup(symbol)["tv"]
 
     def _format_analysis(self, symbol, analysis):
         """Analysis objesini dict'e çevirir"""
@@ -152,12 +105,24 @@ class TradingViewService:
         except Exception:
             return None
 
-    def get_analysis(self, symbol):
-        """Tekli Analiz (Eski Yöntem - Detay Sayfası İçin)"""
-        cache_key = f"ta_analysis_v5_{symbol}"
-        cached = cache.get(cache_key)
-        if cached: return cached
+    def get_analysis(self, symbol, raise_errors=False):
+        """
+        Tekli Analiz (Eski Yöntem - Detay Sayfası İçin)
+        raise_errors=True: erişim hataları fırlatılır (fallback zinciri için); aksi halde None döner.
+        """
+        try:
+            return cache.get_or_load(f"ta_analysis_v5_{symbol}", lambda: self._fetch_analysis(symbol), ttl_seconds=self.TTL)
+        except Exception as e:
+            if raise_errors:
+                raise
+            print(f"TA Analysis Error ({symbol}): {e}")
+            return None
 
+    def _fetch_analysis(self, symbol):
+        """
+        Sembol TradingView'da yoksa None döner; erişim hataları (bağlantı, 200 dışı yanıt) fırlatılır ki
+        fallback zinciri kesintiyi "sembol yok"tan ayırabilsin.
+        """
         try:
             clean, screener, final_exchange = self._classify_symbol(symbol)
             
@@ -191,11 +156,16 @@ class TradingViewService:
                 },
                 "timestamp": analysis.time.isoformat()
             }
-            
-            cache.set(cache_key, result, ttl_seconds=self.TTL)
             return result
 
-        except Exception:
-            return None
+        except Exception as e:
+            message = str(e)
+            # "Exchange or symbol not found." / "Symbol is empty or not valid.": kesin "sembol yok" yanıtı
+            if "not found" in message or "not valid" in message:
+                return None
+            status = re.search(r"HTTP status code: (\d+)", message)
+            if status:
+                raise UpstreamError(f"TradingView HTTP {status.group(1)}", int(status.group(1))) from e
+            raise
 
 ta_service = TradingViewService()
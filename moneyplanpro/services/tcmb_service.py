@@ -1,7 +1,8 @@
-import requests
 import xml.etree.ElementTree as ET
 from datetime import datetime
 from bs4 import BeautifulSoup
+from utils.network import SafeRequest, AsyncSafeRequest
+from services.macro_service import macro_service
 
 class TcmbService:
     def __init__(self):
@@ -13,28 +14,41 @@ class TcmbService:
         Fetches official exchange rates (USD, EUR) from TCMB XML service.
         """
         try:
-            response = requests.get(self.kurlar_url, timeout=10)
+            response = SafeRequest.request("GET", self.kurlar_url, timeout=10)
             if response.status_code == 200:
-                root = ET.fromstring(response.content)
-                rates = {}
-                
-                for currency in root.findall('Currency'):
-                    code = currency.get('Kod')
-                    if code in ['USD', 'EUR']:
-                        buying = currency.find('ForexBuying').text
-                        selling = currency.find('ForexSelling').text
-                        # Banknote rates might be more relevant for cash? Usually Forex is standard.
-                        rates[code] = {
-                            "buying": float(buying) if buying else None,
-                            "selling": float(selling) if selling else None,
-                            "change": 0.0 # TCMB XML doesn't provide change % directly without history
-                        }
-                return rates
+                return self._parse_rates(response.content)
             return None
         except Exception as e:
             print(f"TCMB Rates Error: {e}")
             return None
 
+    async def aget_exchange_rates(self):
+        try:
+            response = await AsyncSafeRequest.get(self.kurlar_url, timeout=10)
+            if response.status_code == 200:
+                return self._parse_rates(response.content)
+            return None
+        except Exception as e:
+            print(f"TCMB Rates Error: {e}")
+            return None
+
+    def _parse_rates(self, content):
+        root = ET.fromstring(content)
+        rates = {}
+        
+        for currency in root.findall('Currency'):
+            code = currency.get('Kod')
+            if code in ['USD', 'EUR']:
+                buying = currency.find('ForexBuying').text
+                selling = currency.find('ForexSelling').text
+                # Banknote rates might be more relevant for cash? Usually Forex is standard.
+                rates[code] = {
+                    "buying": float(buying) if buying else None,
+                    "selling": float(selling) if selling else None,
+                    "change": 0.0 # TCMB XML doesn't provide change % directly without history
+                }
+        return rates
+
     def get_macro_indicators(self):
         """
         Scrapes key indicators (Inflation, Interest Rate) from TCMB main page HTML using BeautifulSoup.
@@ -45,67 +59,41 @@ class TcmbService:
             # 1. World Bank API'den gerçek veriyi çekmeye çalış (Dinamik)
             # 2. Eğer API hata verirse veya boş dönerse "Güvenli Liman" (Safe Harbor) verilerini kullan (Ocak 2026/Güncel)
             
-            dynamic_data = self._fetch_world_bank_data()
-            
-            # Güvenli Liman Verileri (Fallback)
-            fallback_data = {
-                "inflation": {"value": 30.89, "date": "Ocak 2026"}, 
-                "interest_rate": {"value": 50.0, "date": "Ocak 2026"}, 
-                "gdp_growth": {"value": 3.2, "date": "4. Çeyrek 2025"},
-                "unemployment": {"value": 8.5, "date": "Kasım-Aralık 2025"}
-            }
+            return self.apply_fallback(macro_service.fetch_world_bank(["TR"])["TR"])
 
-            if dynamic_data:
-                # API'den gelen verileri al, eksik varsa fallback'ten tamamla
-                for key in fallback_data:
-                    # Sadece 0 veya hatali gelenleri fallback ile ez, gelen doluysa kullan
-                    if key in dynamic_data and dynamic_data[key]["value"] != 0:
-                        pass # Dinamik veri kaliteli
-                    else:
-                        dynamic_data[key] = fallback_data[key]
-                return dynamic_data
-            
-            return fallback_data
+        except Exception as e:
+            print(f"TCMB Macro Error: {e}")
+            return None
 
+    async def aget_macro_indicators(self):
+        """get_macro_indicators'ın async versiyonu."""
+        try:
+            data = await macro_service.afetch_world_bank(["TR"])
+            return self.apply_fallback(data["TR"])
         except Exception as e:
             print(f"TCMB Macro Error: {e}")
             return None
 
-    def _fetch_world_bank_data(self):
-        """World Bank API'den Türkiye verilerini çeker (Paralel)"""
-        import concurrent.futures
-        
-        res = {}
-        indicators = {
-            "gdp_growth": "NY.GDP.MKTP.KD.ZG", 
-            "inflation": "FP.CPI.TOTL.ZG", 
-            "interest_rate": "FR.INR.RINR", 
-            "unemployment": "SL.UEM.TOTL.ZS"
+    def apply_fallback(self, dynamic_data):
+        """World Bank'ten boş/hatalı gelen göstergeleri güncel TCMB/TÜİK değerleriyle tamamlar."""
+        # Güvenli Liman Verileri (Fallback)
+        fallback_data = {
+            "inflation": {"value": 30.89, "date": "Ocak 2026"}, 
+            "interest_rate": {"value": 50.0, "date": "Ocak 2026"}, 
+            "gdp_growth": {"value": 3.2, "date": "4. Çeyrek 2025"},
+            "unemployment": {"value": 8.5, "date": "Kasım-Aralık 2025"}
         }
-        
-        def fetch_single(key, code):
-            try:
-                url = f"https://api.worldbank.org/v2/country/TUR/indicator/{code}?format=json&per_page=1&mrnev=1"
-                r = requests.get(url, timeout=10)
-                if r.status_code == 200:
-                    d = r.json()
-                    if len(d) > 1 and d[1]:
-                        val = d[1][0]['value']
-                        date = d[1][0]['date']
-                        return key, {
-                            "value": round(float(val), 2) if val is not None else 0,
-                            "date": str(date), 
-                            "is_estimate": False
-                        }
-            except: pass
-            return key, {"value": 0, "date": "N/A"}
 
-        with concurrent.futures.ThreadPoolExecutor(max_workers=4) as executor:
-            futures = [executor.submit(fetch_single, k, c) for k, c in indicators.items()]
-            for future in concurrent.futures.as_completed(futures):
-                k, v = future.result()
-                res[k] = v
-                
-        return res
+        if dynamic_data:
+            # API'den gelen verileri al, eksik varsa fallback'ten tamamla
+            for key in fallback_data:
+                # Sadece 0 veya hatali gelenleri fallback ile ez, gelen doluysa kullan
+                if key in dynamic_data and dynamic_data[key]["value"] != 0:
+                    pass # Dinamik veri kaliteli
+                else:
+                    dynamic_data[key] = fallback_data[key]
+            return dynamic_data
+        
+        return fallback_data
 
 tcmb_service = TcmbService()
@@ -1,9 +1,11 @@
 import os
-import requests
 import json
 import time
+import threading
 from utils.cache import cache
+from utils.network import SafeRequest, AsyncSafeRequest, UpstreamError, raise_for_upstream
 from services.settings_service import settings_service
+from services.symbol_registry import symbol_registry
 
 class TwelveDataService:
     def __init__(self):
@@ -11,6 +13,10 @@ class TwelveDataService:
         self.base_url = "https://api.twelvedata.com"
         self.TTL = 60 # 1 minute cache for individual symbols
         self.master_list_path = "backend/data/twelve_symbols.json"
+        # Master listeden türetilen sembol -> API hedefi indeksi; dosya mtime'ı değişince yeniden kurulur
+        self._master_index = {}
+        self._master_mtime = None
+        self._master_lock = threading.Lock()
         
         # Ensure data directory exists
         os.makedirs("backend/data", exist_ok=True)
@@ -28,7 +34,7 @@ class TwelveDataService:
             for country in countries:
                 print(f"Fetching stocks for {country}...")
                 url = f"{self.base_url}/stocks?country={country}&apikey={self.api_key}"
-                res = requests.get(url, timeout=60).json()
+                res = SafeRequest.request("GET", url, timeout=60).json()
                 if res.get("status") == "ok":
                     for item in res.get("data", []):
                         sym = item["symbol"]
@@ -43,7 +49,7 @@ class TwelveDataService:
 
             print("Fetching Forex pairs...")
             url = f"{self.base_url}/forex_pairs?apikey={self.api_key}"
-            res = requests.get(url, timeout=60).json()
+            res = SafeRequest.request("GET", url, timeout=60).json()
             if res.get("status") == "ok":
                 for item in res.get("data", []):
                     sym = item["symbol"]
@@ -55,7 +61,7 @@ class TwelveDataService:
 
             print("Fetching Commodities...")
             url = f"{self.base_url}/commodities?apikey={self.api_key}"
-            res = requests.get(url, timeout=60).json()
+            res = SafeRequest.request("GET", url, timeout=60).json()
             if res.get("status") == "ok":
                 for item in res.get("data", []):
                     sym = item["symbol"]
@@ -64,23 +70,69 @@ class TwelveDataService:
                         "type": "Commodity"
                     }
 
-            # Save to disk
-            with open(self.master_list_path, "w", encoding="utf-8") as f:
+            # Save to disk (atomik: okuyan worker'lar yarım dosya görmesin)
+            tmp_path = f"{self.master_list_path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
                 json.dump(symbols_data, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, self.master_list_path)
+
+            # Bu süreçteki indeksi hemen yenile; diğer worker'lar mtime değişiminden fark eder
+            with self._master_lock:
+                self._master_index = self._build_master_index(symbols_data)
+                self._master_mtime = os.path.getmtime(self.master_list_path)
             
             return True
         except Exception as e:
             print(f"Twelve Data Sync Error: {e}")
             return False
 
-    def get_quotes(self, symbols: list):
+    def get_quotes(self, symbols: list, raise_errors=False):
+        """
+        raise_errors=True: bağlantı hataları, 200 dışı yanıtlar ve 429/5xx API hataları fırlatılır
+        (fallback zincirleri için); "sembol bulunamadı" yanıtı yine boş sonuç döner.
+        """
         if not self.api_key: return {}
 
-        results = {}
-        to_fetch = []
-        sym_map = {}
+        results, to_fetch = self._cached_quotes(symbols)
+        if not to_fetch:
+            return results
+
+        formatted_symbols, sym_map = self._prepare_targets(to_fetch)
 
+        try:
+            sym_str = ",".join(formatted_symbols)
+            url = f"{self.base_url}/quote?symbol={sym_str}&apikey={self.api_key}"
+            response = raise_for_upstream(SafeRequest.request("GET", url, timeout=10), "TwelveData")
+            return self._merge_response(response.json(), results, symbols, formatted_symbols, sym_map,
+                                        raise_errors=raise_errors)
+        except Exception as e:
+            print(f"Twelve Data API Exception: {e}")
+            if raise_errors:
+                raise
+            return results
+
+    async def aget_quotes(self, symbols: list):
+        """get_quotes'un async versiyonu; cache ve sembol eşleme mantığı ortaktır."""
+        if not self.api_key: return {}
+
+        results, to_fetch = self._cached_quotes(symbols)
+        if not to_fetch:
+            return results
+
+        formatted_symbols, sym_map = self._prepare_targets(to_fetch)
+
+        try:
+            params = {"symbol": ",".join(formatted_symbols), "apikey": self.api_key}
+            response = await AsyncSafeRequest.get(f"{self.base_url}/quote", params=params, timeout=10)
+            return self._merge_response(response.json(), results, symbols, formatted_symbols, sym_map)
+        except Exception as e:
+            print(f"Twelve Data API Exception: {e}")
+            return results
+
+    def _cached_quotes(self, symbols):
         # 1. Check Cache first
+        results = {}
+        to_fetch = []
         for s in symbols:
             cache_key = f"td_quote_{s.upper()}"
             cached_val = cache.get(cache_key)
@@ -88,64 +140,81 @@ class TwelveDataService:
                 results[s] = cached_val
             else:
                 to_fetch.append(s)
+        return results, to_fetch
 
-        if not to_fetch:
-            return results
-
+    def _prepare_targets(self, to_fetch):
         # 2. Prepare symbols for API
         formatted_symbols = []
-        master = {}
-        if os.path.exists(self.master_list_path):
-            try:
-                with open(self.master_list_path, "r", encoding="utf-8") as f:
-                    master = json.load(f)
-            except: pass
+        sym_map = {}
+        master = self._master_targets()
 
         for s in to_fetch:
             orig = s.upper().strip()
-            target = orig
-            
-            if orig in master:
-                m = master[orig]
-                if m.get("mic_code"):
-                    target = f"{orig}:{m['mic_code']}"
-                elif m.get("type") == "Forex" and "/" not in orig:
-                    target = f"{orig}/TRY"
-            elif orig in ["USD", "EUR", "GBP", "CHF", "JPY", "CAD", "AUD", "DKK", "SEK", "NOK", "SAR"]:
-                target = f"{orig}/TRY"
-            
+            target = master.get(orig) or symbol_registry.lookup(orig)["twelve"]
             formatted_symbols.append(target)
             sym_map[target] = s
+        return formatted_symbols, sym_map
 
+    def _master_targets(self):
+        """
+        Master listenin bellek içi indeksi (sembol -> API hedefi).
+        Dosya her çağrıda parse edilmez; yalnızca mtime değiştiğinde (başka bir süreçte biten sync_symbols
+        dahil) yeniden yüklenir. Dosya yoksa veya okunamıyorsa son geçerli indeks kullanılır.
+        """
         try:
-            sym_str = ",".join(formatted_symbols)
-            url = f"{self.base_url}/quote?symbol={sym_str}&apikey={self.api_key}"
-            response = requests.get(url, timeout=10)
-            data = response.json()
-            
-            if "status" in data and data["status"] == "error":
-                print(f"Twelve Data API Error: {data}")
-                return results # Return whatever we have from cache
-
-            if isinstance(data, dict):
-                if "symbol" in data:
-                    item_data = self._parse_quote(data)
-                    if item_data:
-                        orig_sym = sym_map.get(formatted_symbols[0], symbols[0])
-                        results[orig_sym] = item_data
-                        cache.set(f"td_quote_{orig_sym.upper()}", item_data, ttl_seconds=self.TTL)
-                else:
-                    for s_target, quote_data in data.items():
-                        if isinstance(quote_data, dict) and quote_data.get("status") != "error":
-                            item_data = self._parse_quote(quote_data)
-                            if item_data:
-                                orig_sym = sym_map.get(s_target, s_target)
-                                results[orig_sym] = item_data
-                                cache.set(f"td_quote_{orig_sym.upper()}", item_data, ttl_seconds=self.TTL)
-            return results
-        except Exception as e:
-            print(f"Twelve Data API Exception: {e}")
-            return results
+            mtime = os.path.getmtime(self.master_list_path)
+        except OSError:
+            return self._master_index
+        if mtime == self._master_mtime:
+            return self._master_index
+
+        with self._master_lock:
+            if mtime != self._master_mtime:
+                try:
+                    with open(self.master_list_path, "r", encoding="utf-8") as f:
+                        self._master_index = self._build_master_index(json.load(f))
+                except (OSError, ValueError) as e:
+                    print(f"Twelve Data master list load error: {e}")
+                self._master_mtime = mtime
+            return self._master_index
+
+    @staticmethod
+    def _build_master_index(master):
+        index = {}
+        for sym, m in master.items():
+            target = sym
+            if m.get("mic_code"):
+                target = f"{sym}:{m['mic_code']}"
+            elif m.get("type") == "Forex" and "/" not in sym:
+                target = f"{sym}/TRY"
+            index[sym] = target
+        return index
+
+    def _merge_response(self, data, results, symbols, formatted_symbols, sym_map, raise_errors=False):
+        if "status" in data and data["status"] == "error":
+            print(f"Twelve Data API Error: {data}")
+            code = data.get("code")
+            # 400/404: sembol bulunamadı (kesin boş yanıt); kredi bitti (429) ve sunucu hataları kesintidir
+            if raise_errors and code not in (400, 404):
+                raise UpstreamError(f"TwelveData error: {data.get('message')}", code)
+            return results # Return whatever we have from cache
+
+        if isinstance(data, dict):
+            if "symbol" in data:
+                item_data = self._parse_quote(data)
+                if item_data:
+                    orig_sym = sym_map.get(formatted_symbols[0], symbols[0])
+                    results[orig_sym] = item_data
+                    cache.set(f"td_quote_{orig_sym.upper()}", item_data, ttl_seconds=self.TTL)
+            else:
+                for s_target, quote_data in data.items():
+                    if isinstance(quote_data, dict) and quote_data.get("status") != "error":
+                        item_data = self._parse_quote(quote_data)
+                        if item_data:
+                            orig_sym = sym_map.get(s_target, s_target)
+                            results[orig_sym] = item_data
+                            cache.set(f"td_quote_{orig_sym.upper()}", item_data, ttl_seconds=self.TTL)
+        return results
 
     def _parse_quote(self, q):
         try:
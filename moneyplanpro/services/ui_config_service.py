@@ -1,7 +1,7 @@
 from typing import Optional
 from datetime import datetime
 from models.ui_config import UIConfig, ThemeConfig, LayoutConfig
-from database import get_db_connection
+from database import db_connection
 import json
 
 
@@ -40,8 +40,7 @@ class UIConfigService:
     @staticmethod
     async def get_config() -> UIConfig:
         """Get current UI/UX configuration"""
-        db = get_db_connection()
-        try:
+        with db_connection() as db:
             result = db.execute(UIConfigService._GET_CONFIG_QUERY).fetchone()
             
             if result:
@@ -56,8 +55,6 @@ class UIConfigService:
                 config_data["updated_at"] = datetime.fromisoformat(config_data["updated_at"])
             
             return UIConfig(**config_data)
-        finally:
-            db.close()
     
     @staticmethod
     async def _initialize_defaults(db):
@@ -73,8 +70,7 @@ class UIConfigService:
     @staticmethod
     async def update_config(updates: dict) -> UIConfig:
         """Update UI configuration"""
-        db = get_db_connection()
-        try:
+        with db_connection() as db:
             # Get current config
             result = db.execute(UIConfigService._GET_CONFIG_QUERY).fetchone()
             
@@ -113,5 +109,3 @@ class UIConfigService:
             db.commit()
             
             return await UIConfigService.get_config()
-        finally:
-            db.close()
@@ -5,6 +5,9 @@ if [ -d "venv" ]; then
     source venv/bin/activate
 fi
 
+# 4 worker aynı cache'i paylaşsın (upstream kotası worker başına harcanmasın)
+export CACHE_BACKEND="${CACHE_BACKEND:-file}"
+
 # API'yi başlat
 if [ "$1" = "--background" ]; then
     echo "🚀 InvestGuide API arka planda başlatılıyor... (Loglar api.log dosyasına yazılıyor)"
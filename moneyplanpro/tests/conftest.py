@@ -0,0 +1,13 @@
+import pytest
+from utils.cache import cache, MemoryBackend
+from utils.circuit_breaker import provider_breakers
+
+
+@pytest.fixture(autouse=True)
+def isolated_provider_state(monkeypatch):
+    """Her test boş bir cache ve kapalı devre kesicilerle başlar.
+    Modül düzeyindeki tekil nesnelerdeki neg_detail_*, unsupported_* ve breaker durumu testler arasında taşınmasın."""
+    monkeypatch.setattr(cache, "_backend", MemoryBackend())
+    provider_breakers._breakers.clear()
+    yield
+    provider_breakers._breakers.clear()
@@ -0,0 +1,40 @@
+from services.alert_index import AlertIndex
+
+
+def _alert(alert_id, target, is_above=True, symbol="AAPL"):
+    return {"id": alert_id, "symbol": symbol, "target_price": target, "is_above": is_above}
+
+
+def test_pop_triggered_returns_only_crossed_thresholds():
+    """Yalnızca eşiği aşılan alarmlar dönmeli ve indeksten çıkmalı"""
+    index = AlertIndex()
+    index.sync([_alert(1, 100), _alert(2, 150), _alert(3, 90, is_above=False),
+                _alert(4, 120, is_above=False), _alert(5, 100, symbol="MSFT")])
+
+    fired = {a["id"] for a in index.pop_triggered("AAPL", 120)}
+    assert fired == {1, 4}  # 100 <= 120 (above), 120 >= 120 (below)
+    assert index.pop_triggered("AAPL", 120) == []
+    assert {a["id"] for a in index.pop_triggered("AAPL", 80)} == {3}
+    assert len(index) == 2
+
+
+def test_sync_applies_only_differences():
+    """sync yeni alarmları ekler, eşiği değişeni taşır, listede olmayanı çıkarır"""
+    index = AlertIndex()
+    assert index.sync([_alert(1, 100), _alert(2, 200)]) == (2, 0)
+    assert index.sync([_alert(1, 100), _alert(2, 200)]) == (0, 0)
+    assert index.sync([_alert(2, 300), _alert(3, 50)]) == (2, 1)
+
+    assert [a["id"] for a in index.pop_triggered("AAPL", 250)] == [3]
+    assert [a["id"] for a in index.pop_triggered("AAPL", 300)] == [2]
+    assert len(index) == 0
+
+
+def test_remove_and_duplicate_targets():
+    """Aynı hedef fiyattaki alarmlar id ile ayrı ayrı çıkarılabilmeli"""
+    index = AlertIndex()
+    for i in range(5):
+        index.add(_alert(i, 100))
+    assert index.remove(2)
+    assert not index.remove(2)
+    assert [a["id"] for a in index.pop_triggered("AAPL", 100)] == [0, 1, 3, 4]
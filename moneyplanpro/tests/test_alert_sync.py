@@ -0,0 +1,175 @@
+import json
+import threading
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qsl
+import pytest
+import services.alert_monitor_service as monitor_module
+from services.alert_monitor_service import AlertMonitorService
+
+T0 = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+
+class _PostgREST(BaseHTTPRequestHandler):
+    """price_alerts için kullanılan PostgREST filtrelerinin küçük bir alt kümesi (eq, gt, gte, order, limit)."""
+    rows = {}
+    queries = []
+    patches = []
+
+    def _match(self, row, params):
+        for col, expr in params.items():
+            if col in ("select", "order", "limit"):
+                continue
+            op, value = expr.split(".", 1)
+            current = row.get(col)
+            if col == "updated_at":
+                current, value = datetime.fromisoformat(current), datetime.fromisoformat(value)
+            elif isinstance(current, bool):
+                value = value == "true"
+            elif isinstance(current, int) and op != "in":
+                value = int(value)
+            if op == "in":
+                if str(current) not in value.strip("()").split(","):
+                    return False
+                continue
+            if (op == "eq" and current != value) or (op == "gt" and not current > value) \
+                    or (op == "gte" and not current >= value):
+                return False
+        return True
+
+    def _reply(self, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        params = dict(parse_qsl(urlsplit(self.path).query))
+        _PostgREST.queries.append(params)
+        matched = sorted((r for r in self.rows.values() if self._match(r, params)), key=lambda r: r["id"])
+        self._reply(matched[:int(params.get("limit", len(matched)))])
+
+    def do_PATCH(self):
+        params = dict(parse_qsl(urlsplit(self.path).query))
+        _PostgREST.patches.append(params)
+        update = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        changed = []
+        for row in self.rows.values():
+            if self._match(row, params):
+                row.update(update, updated_at=_ts(999))
+                changed.append({"id": row["id"]})
+        self._reply(changed)
+
+    def log_message(self, *args):
+        pass
+
+
+def _ts(seconds):
+    return (T0 + timedelta(seconds=seconds)).isoformat()
+
+
+def _row(alert_id, target, seconds=0, active=True):
+    return {"id": alert_id, "user_id": f"u{alert_id}", "symbol": "AAPL", "target_price": target,
+            "is_above": True, "is_active": active, "updated_at": _ts(seconds)}
+
+
+@pytest.fixture
+def stub(monkeypatch):
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), _PostgREST)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    _PostgREST.rows = {i: _row(i, 100 + i) for i in range(1, 6)}
+    _PostgREST.queries = []
+    _PostgREST.patches = []
+    overrides = {"ALERT_SYNC_PAGE_SIZE": "2", "ALERT_SYNC_OVERLAP_SEC": "0", "ALERT_FULL_SYNC_SEC": "3600"}
+    get_value = monitor_module.settings_service.get_value
+    monkeypatch.setattr(monitor_module.settings_service, "get_value",
+                        lambda key, default=None: overrides.get(key) or get_value(key, default))
+    yield f"http://127.0.0.1:{httpd.server_address[1]}", {}
+    httpd.shutdown()
+
+
+def test_initial_load_is_paged_then_only_deltas(stub):
+    """İlk yükleme sayfalı olmalı; sonraki turlar yalnızca updated_at imlecinden sonrasını çekmeli"""
+    url, headers = stub
+    monitor = AlertMonitorService()
+
+    assert monitor._sync_alerts(url, headers)
+    assert len(monitor._index) == 5
+    assert len(_PostgREST.queries) == 3  # 2 + 2 + 1 satır
+    assert [q.get("id") for q in _PostgREST.queries] == [None, "gt.2", "gt.4"]
+
+    _PostgREST.queries = []
+    _PostgREST.rows[2].update(target_price=500, updated_at=_ts(10))
+    _PostgREST.rows[3].update(is_active=False, updated_at=_ts(11))
+    _PostgREST.rows[6] = _row(6, 50, seconds=12)
+
+    assert monitor._sync_alerts(url, headers)
+    assert all(q["updated_at"] == "gte." + _ts(0) for q in _PostgREST.queries)
+    assert "is_active" not in _PostgREST.queries[0]  # Pasifleşen satırlar da gelmeli
+    assert len(monitor._index) == 5
+    assert {a["id"] for a in monitor._index.pop_triggered("AAPL", 110)} == {1, 4, 5, 6}
+
+
+def test_full_reload_drops_hard_deleted_rows(stub):
+    """Silinen satırlar delta'da görünmez; periyodik tam yükleme bunları indeksten çıkarmalı"""
+    url, headers = stub
+    monitor = AlertMonitorService()
+    monitor._sync_alerts(url, headers)
+
+    del _PostgREST.rows[5]
+    monitor._sync_alerts(url, headers)
+    assert len(monitor._index) == 5
+
+    monitor._last_full_sync = 0
+    monitor._sync_alerts(url, headers)
+    assert len(monitor._index) == 4
+
+
+def test_trigger_claims_row_before_push(stub, monkeypatch):
+    """Push yalnızca Supabase'de hâlâ aktif olan satır pasifleştirilebildiyse gönderilmeli"""
+    url, headers = stub
+    pushes = []
+    monkeypatch.setattr(monitor_module.notification_service, "send_push_batch",
+                        lambda title, message, user_ids: pushes.extend(user_ids) or [(True, "ok")])
+    monitor = AlertMonitorService()
+    monitor._sync_alerts(url, headers)
+
+    _PostgREST.rows[1]["is_active"] = False  # Replika bir tur geride
+    monitor._trigger_alerts([(a, 102) for a in monitor._index.pop_triggered("AAPL", 102)], url, headers)
+
+    assert pushes == ["u2"]
+    assert _PostgREST.rows[2]["is_active"] is False
+
+
+def test_fired_alerts_use_one_patch_and_grouped_pushes(stub, monkeypatch):
+    """Bir turda tetiklenen alarmlar tek id=in.() PATCH ile kapanmalı, aynı mesajlar tek push'ta toplanmalı"""
+    url, headers = stub
+    _PostgREST.rows = {i: _row(i, 100 if i <= 8 else 90) for i in range(1, 11)}
+    groups = []
+    monkeypatch.setattr(monitor_module.notification_service, "send_push_batch",
+                        lambda title, message, user_ids: groups.append(sorted(user_ids)) or [(True, "ok")])
+    monitor = AlertMonitorService()
+    monitor._sync_alerts(url, headers)
+
+    monitor._trigger_alerts([(a, 120) for a in monitor._index.pop_triggered("AAPL", 120)], url, headers)
+
+    assert len(_PostgREST.patches) == 1
+    assert _PostgREST.patches[0]["id"].startswith("in.(")
+    assert sorted(groups) == [[f"u{i}" for i in range(1, 9)], ["u10", "u9"]]
+    assert not any(r["is_active"] for r in _PostgREST.rows.values())
+
+
+def test_send_push_batch_chunks_external_ids(monkeypatch):
+    """Kullanıcı listesi OneSignal limitine göre parçalanmalı, tekrar eden id'ler atılmalı"""
+    from services.notification_service import notification_service
+    calls = []
+    monkeypatch.setattr(notification_service, "send_push",
+                        lambda *a, external_user_ids=None, **kw: calls.append(len(external_user_ids)) or (True, "ok"))
+
+    users = [f"u{i}" for i in range(4500)] + ["u1", None]
+    results = notification_service.send_push_batch("t", "m", users)
+
+    assert calls == [2000, 2000, 500]
+    assert results == [(True, "ok")] * 3
@@ -0,0 +1,75 @@
+import pytest
+import yfinance
+from types import SimpleNamespace
+from utils.cache import cache
+from services.market_service import market_provider
+
+
+class _FakeTicker:
+    info_calls = 0
+    price = 100.0
+
+    def __init__(self, symbol, session=None):
+        self.symbol = symbol
+
+    @property
+    def fast_info(self):
+        return SimpleNamespace(last_price=_FakeTicker.price, previous_close=80.0, last_volume=5,
+                               market_cap=1e9, day_high=101.0, day_low=99.0, year_high=120.0, year_low=60.0)
+
+    @property
+    def info(self):
+        _FakeTicker.info_calls += 1
+        return {"longName": "Tiered Corp", "longBusinessSummary": "Açıklama", "exchange": "NMS", "currency": "USD"}
+
+
+def _clear(symbol):
+    cache.delete(f"asset_quote_{symbol}")
+    cache.delete(f"asset_profile_{symbol}")
+
+
+def test_profile_is_fetched_once_and_merged_with_live_quote(monkeypatch):
+    """tk.info yalnızca profil cache'i boşken çağrılmalı; fiyat alanları ayrı katmandan gelmeli"""
+    monkeypatch.setattr(yfinance, "Ticker", _FakeTicker)
+    _FakeTicker.info_calls = 0
+    _clear("TIER")
+
+    detail = market_provider._get_detail_from_yahoo("TIER")
+    assert detail["name"] == "Tiered Corp" and detail["price"] == 100.0
+    assert detail["change_percent"] == 25.0 and detail["high_52w"] == 120.0
+
+    # Canlı katman süresi dolunca yalnızca fiyat yenilenir, profil cache'ten gelir
+    cache.delete("asset_quote_TIER")
+    _FakeTicker.price = 110.0
+    detail = market_provider._get_detail_from_yahoo("TIER")
+    assert detail["price"] == 110.0 and detail["description"] == "Açıklama"
+    assert _FakeTicker.info_calls == 1
+    _FakeTicker.price = 100.0
+    _clear("TIER")
+
+
+def test_missing_price_skips_profile(monkeypatch):
+    """Fiyat yoksa profil için tk.info çağrılmamalı"""
+    monkeypatch.setattr(yfinance, "Ticker", _FakeTicker)
+    monkeypatch.setattr(_FakeTicker, "price", 0.0)
+    _FakeTicker.info_calls = 0
+    _clear("NOPX")
+
+    assert market_provider._get_detail_from_yahoo("NOPX") is None
+    assert _FakeTicker.info_calls == 0
+
+
+def test_yahoo_outage_is_raised_but_unknown_symbol_is_empty():
+    """yfinance'in yuttuğu ağ hatası zincire istisna olarak çıkmalı; bilinmeyen sembol boş sonuç olmalı"""
+    from services.market_service import _yahoo_session
+    from utils.network import UpstreamError
+
+    def unknown():
+        raise KeyError("currentTradingPeriod")
+    assert market_provider._yahoo_call(unknown) is None
+
+    def outage():
+        _yahoo_session._local.failed = True
+        raise KeyError("currentTradingPeriod")
+    with pytest.raises(UpstreamError):
+        market_provider._yahoo_call(outage)
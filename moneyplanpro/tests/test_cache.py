@@ -0,0 +1,238 @@
+import time
+import threading
+import pytest
+from utils.cache import SimpleCache, MemoryBackend, FileBackend, RedisBackend, SingleFlight
+
+
+def _backends(tmp_path):
+    backends = [MemoryBackend(), FileBackend(str(tmp_path / "cache"))]
+    fakeredis = pytest.importorskip("fakeredis")
+    backends.append(RedisBackend(client=fakeredis.FakeRedis()))
+    return backends
+
+
+def test_get_set_roundtrip(tmp_path):
+    """Tüm backend'ler aynı get/set davranışını vermeli"""
+    for backend in _backends(tmp_path):
+        c = SimpleCache(backend)
+        assert c.get("missing") is None
+
+        c.set("market_summary", {"dolar": {"price": 43.04}}, ttl_seconds=60)
+        assert c.get("market_summary") == {"dolar": {"price": 43.04}}
+
+        c.delete("market_summary")
+        assert c.get("market_summary") is None
+
+
+def test_expiry(tmp_path):
+    """Süresi dolan veri None dönmeli"""
+    for backend in [MemoryBackend(), FileBackend(str(tmp_path / "cache"))]:
+        c = SimpleCache(backend)
+        c.set("short", [1, 2, 3], ttl_seconds=0.05)
+        assert c.get("short") == [1, 2, 3]
+        time.sleep(0.1)
+        assert c.get("short") is None
+
+
+def test_file_backend_is_shared_between_instances(tmp_path):
+    """Dosya backend'i farklı worker'lar (instance'lar) arasında paylaşılmalı"""
+    directory = str(tmp_path / "shared")
+    worker_a = SimpleCache(FileBackend(directory))
+    worker_b = SimpleCache(FileBackend(directory))
+
+    worker_a.set("tefas_fund_list", {"TCD", "AFT"}, ttl_seconds=60)
+    assert worker_b.get("tefas_fund_list") == {"TCD", "AFT"}
+
+
+def test_lru_max_entries():
+    """Limit aşılınca en uzun süredir okunmayan kayıt atılmalı"""
+    c = SimpleCache(MemoryBackend(max_entries=3, namespace_limits={}))
+    for k in ["a", "b", "c"]:
+        c.set(k, k, ttl_seconds=60)
+    c.get("a")  # a artık en yeni kullanılan
+    c.set("d", "d", ttl_seconds=60)
+
+    assert c.get("b") is None
+    assert c.get("a") == "a"
+    assert c.get("d") == "d"
+    assert c.stats()["evictions"] == 1
+
+
+def test_lru_max_bytes():
+    """Toplam boyut sınırı aşılınca eski kayıtlar atılmalı"""
+    backend = MemoryBackend(max_entries=1000, max_bytes=3000, namespace_limits={})
+    c = SimpleCache(backend)
+    for i in range(10):
+        c.set(f"blob_{i}", "x" * 1000, ttl_seconds=60)
+
+    assert backend.stats()["bytes"] <= 3000
+    assert c.get("blob_9") is not None
+    assert c.get("blob_0") is None
+
+
+def test_namespace_limits():
+    """Sembol bazlı namespace'ler kendi limitleriyle sınırlanmalı, diğer anahtarlar etkilenmemeli"""
+    c = SimpleCache(MemoryBackend(namespace_limits={"td_quote_": 2}))
+    c.set("market_summary_ultimate_v3", {"ok": True}, ttl_seconds=60)
+    for sym in ["AAPL", "MSFT", "TSLA"]:
+        c.set(f"td_quote_{sym}", {"price": 1.0}, ttl_seconds=60)
+
+    assert c.get("td_quote_AAPL") is None
+    assert c.get("td_quote_TSLA") is not None
+    assert c.get("market_summary_ultimate_v3") == {"ok": True}
+    assert c.stats()["namespaces"]["td_quote_"] == 2
+
+
+def test_purge_expired(tmp_path):
+    """Sweeper okunmayan ama süresi dolmuş kayıtları da temizlemeli"""
+    for backend in [MemoryBackend(), FileBackend(str(tmp_path / "cache"))]:
+        c = SimpleCache(backend)
+        c.set("old", 1, ttl_seconds=0.01)
+        c.set("new", 2, ttl_seconds=60)
+        time.sleep(0.05)
+
+        assert c.purge_expired() == 1
+        assert c.stats()["entries"] == 1
+
+
+def test_get_or_load_coalesces_concurrent_misses():
+    """Eşzamanlı cache miss'lerde upstream yalnızca bir kez çağrılmalı"""
+    c = SimpleCache(MemoryBackend())
+    calls = []
+
+    def loader():
+        calls.append(1)
+        time.sleep(0.2)
+        return {"dolar": {"price": 43.04}}
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(c.get_or_load("market_summary", loader, 60)))
+               for _ in range(10)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len(calls) == 1
+    assert len(results) == 10
+    assert all(r == {"dolar": {"price": 43.04}} for r in results)
+
+
+def test_single_flight_propagates_errors():
+    """Yükleme hata verirse bekleyen tüm çağıranlar aynı hatayı almalı, sonraki çağrı tekrar denemeli"""
+    flights = SingleFlight()
+    errors = []
+
+    def failing():
+        time.sleep(0.1)
+        raise RuntimeError("upstream down")
+
+    def call():
+        try:
+            flights.do("key", failing)
+        except RuntimeError as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=call) for _ in range(5)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len(errors) == 5
+    assert not flights.in_flight("key")
+    assert flights.do("key", lambda: 42) == 42
+
+
+def test_stale_while_revalidate():
+    """Soft TTL dolunca bayat veri hemen dönmeli, yenileme arka planda tek sefer yapılmalı"""
+    c = SimpleCache(MemoryBackend())
+    versions = iter(["v1", "v2", "v3"])
+    calls = []
+
+    def loader():
+        calls.append(1)
+        time.sleep(0.05)
+        return next(versions)
+
+    assert c.get_or_load("news", loader, ttl_seconds=0.1, stale_ttl_seconds=60) == "v1"
+    time.sleep(0.15)
+
+    # Soft TTL doldu: bayat değer beklemeden döner, düz get() ise taze veri yok der
+    assert c.get("news") is None
+    started = time.time()
+    assert c.get_or_load("news", loader, ttl_seconds=0.1, stale_ttl_seconds=60) == "v1"
+    assert c.get_or_load("news", loader, ttl_seconds=0.1, stale_ttl_seconds=60) == "v1"
+    assert time.time() - started < 0.05
+
+    time.sleep(0.1)
+    assert c.get_or_load("news", loader, ttl_seconds=0.1, stale_ttl_seconds=60) == "v2"
+    assert len(calls) == 2
+
+
+def test_stale_entries_survive_file_backend(tmp_path):
+    """SWR kayıtları paylaşımlı backend'de de pickle ile taşınabilmeli"""
+    directory = str(tmp_path / "shared")
+    SimpleCache(FileBackend(directory)).set("k", [1], ttl_seconds=60, stale_ttl_seconds=60)
+    assert SimpleCache(FileBackend(directory)).get("k") == [1]
+
+
+def test_aget_or_load_coalesces_concurrent_misses():
+    """Async yolda da eşzamanlı miss'ler tek upstream çağrısına indirgenmeli, sonuç sync get ile okunabilmeli"""
+    import asyncio
+    c = SimpleCache(MemoryBackend())
+    calls = []
+
+    async def aloader():
+        calls.append(1)
+        await asyncio.sleep(0.1)
+        return [{"symbol": "BTC", "price": 97000.0}]
+
+    async def main():
+        return await asyncio.gather(*[c.aget_or_load("crypto_top", aloader, 60) for _ in range(20)])
+
+    results = asyncio.run(main())
+    assert len(calls) == 1
+    assert all(r == [{"symbol": "BTC", "price": 97000.0}] for r in results)
+    assert c.get("crypto_top") == [{"symbol": "BTC", "price": 97000.0}]
+
+
+def test_aget_or_load_keeps_shared_backend_io_off_the_event_loop(tmp_path):
+    """File/Redis backend'e async yoldaki okuma/yazmalar event loop thread'inde yapılmamalı"""
+    import asyncio
+    threads = []
+
+    class RecordingBackend(FileBackend):
+        def get(self, key):
+            threads.append(threading.get_ident())
+            return super().get(key)
+
+        def set(self, key, value, ttl_seconds):
+            threads.append(threading.get_ident())
+            return super().set(key, value, ttl_seconds)
+
+    c = SimpleCache(RecordingBackend(str(tmp_path / "cache")))
+
+    async def aloader():
+        return {"price": 1.0}
+
+    async def main():
+        first = await c.aget_or_load("k", aloader, 60, stale_ttl_seconds=60)
+        second = await c.aget_or_load("k", aloader, 60, stale_ttl_seconds=60)
+        return first, second, threading.get_ident()
+
+    first, second, loop_thread = asyncio.run(main())
+    assert first == second == {"price": 1.0}
+    assert threads and loop_thread not in threads
+
+
+def test_file_backend_failed_write_leaves_no_temp_file(tmp_path):
+    """Yazma yarıda hata verirse .tmp dosyası dizinde kalmamalı, eski kayıt korunmalı"""
+    directory = tmp_path / "cache"
+    backend = FileBackend(str(directory))
+    backend.set("k", [1], 60)
+
+    backend.set("k", lambda: None, 60)  # pickle edilemez
+
+    assert backend.get("k") == [1]
+    assert not list(directory.glob("*.tmp"))
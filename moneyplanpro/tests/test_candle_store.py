@@ -0,0 +1,153 @@
+import time
+import threading
+from datetime import datetime, timedelta
+import pytest
+import database
+from services.candle_store import CandleStore, period_start
+
+DAY = 86400
+
+
+def _bar(day_offset, close):
+    d = (datetime.now() - timedelta(days=day_offset)).replace(hour=0, minute=0, second=0, microsecond=0)
+    return {"date": d.isoformat(), "open": close, "high": close, "low": close, "close": close, "volume": 1.0}
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    monkeypatch.setattr(database, "DB_PATH", str(tmp_path / "candles.db"))
+    database.init_db()
+    return CandleStore()
+
+
+def test_first_request_downloads_then_serves_locally(store):
+    """İlk istek tam seriyi indirmeli, sonraki istekler upstream'e gitmeden yerelden dönmeli"""
+    calls = []
+
+    def fetch(since):
+        calls.append(since)
+        return [_bar(i, 100 + i) for i in range(20, -1, -1)]
+
+    first = store.get_series("binance", "BTCUSDT", "1d", period_start("1mo"), fetch)
+    second = store.get_series("binance", "BTCUSDT", "1d", period_start("1mo"), fetch)
+
+    assert calls == [None]
+    assert len(first) == 21
+    assert second == first
+    assert [b["close"] for b in first][-1] == 100
+
+
+def test_delta_fetches_only_bars_after_last_stored(store, monkeypatch):
+    """Yenileme süresi dolunca yalnızca son mumdan sonrası istenmeli, son mum güncellenmeli"""
+    store.get_series("market", "THYAO", "1d", period_start("1mo"),
+                     lambda since: [_bar(i, 10) for i in range(30, 2, -1)] + [_bar(2, 10), _bar(1, 11), _bar(0, 12)])
+    monkeypatch.setattr(store, "refresh_after", lambda interval: 0)
+
+    seen = []
+
+    def delta(since):
+        seen.append(since)
+        return [_bar(0, 12.5)]  # bugünkü mum kapanmadı, fiyat değişti
+
+    series = store.get_series("market", "THYAO", "1d", period_start("1mo"), delta)
+
+    assert seen == [store._to_ts(_bar(0, 0)["date"])]
+    assert [b["close"] for b in series][-3:] == [10, 11, 12.5]
+
+
+def test_longer_period_triggers_backfill(store):
+    """Kapsanandan daha uzun bir periyot istenirse bir kez tam indirme yapılmalı"""
+    calls = []
+
+    def fetch(since):
+        calls.append(since)
+        return [_bar(i, i) for i in range(300, -1, -1)]
+
+    assert len(store.get_series("market", "AAPL", "1d", period_start("1mo"), fetch)) == 31
+    assert len(store.get_series("market", "AAPL", "1d", period_start("1y"), fetch)) == 301
+    store.get_series("market", "AAPL", "1d", period_start("3mo"), fetch)
+
+    assert calls == [None, None]
+
+
+def test_intraday_intervals_bypass_store(store):
+    """Gün içi aralıklar depolanmadan doğrudan upstream'den gelmeli"""
+    calls = []
+    store.get_series("market", "AAPL", "5m", period_start("1d"), lambda since: calls.append(since) or [])
+    store.get_series("market", "AAPL", "5m", period_start("1d"), lambda since: calls.append(since) or [])
+    assert calls == [None, None]
+
+
+def test_same_day_from_different_sources_is_one_bar(store):
+    """Kaynak değişince (FMP 'YYYY-MM-DD' ↔ Yahoo tz'li ISO) aynı gün tek mum olarak kalmalı"""
+    store._upsert("market", "AAPL", "1d", [{"date": "2024-03-05", "close": 1.0}])
+    store._upsert("market", "AAPL", "1d", [{"date": "2024-03-05T00:00:00-05:00", "close": 2.0}])
+    store._upsert("market", "AAPL", "1d", [{"date": "2024-03-05T00:00:00+03:00", "close": 3.0}])
+
+    with database.db_connection() as conn:
+        rows = conn.execute("SELECT ts, close FROM ohlcv_candles WHERE symbol = 'AAPL'").fetchall()
+    assert [tuple(r) for r in rows] == [(1709596800, 3.0)]
+
+
+def test_init_db_merges_legacy_duplicate_days(store):
+    """Ham zaman damgasıyla yazılmış eski kopya günler init_db'de tek muma indirilmeli"""
+    with database.db_connection() as conn:
+        conn.executemany(
+            "INSERT INTO ohlcv_candles (feed, symbol, interval, ts, date, close) VALUES ('market', 'AAPL', '1d', ?, ?, ?)",
+            [(1709586000, "2024-03-05T00:00:00-05:00", 1.0), (1709586000 + 7200, "2024-03-05", 2.0),
+             (1709672400, "2024-03-06T00:00:00-05:00", 3.0)])
+    database.init_db()
+
+    with database.db_connection() as conn:
+        rows = conn.execute("SELECT ts, close FROM ohlcv_candles ORDER BY ts").fetchall()
+    assert [tuple(r) for r in rows] == [(1709596800, 2.0), (1709683200, 3.0)]
+
+
+def test_concurrent_periods_do_not_share_a_flight(store):
+    """Eşzamanlı 1mo yüklemesi sürerken gelen 5y isteği kısa seriye bağlanmamalı"""
+    started, release = threading.Event(), threading.Event()
+
+    def short_fetch(since):
+        started.set()
+        release.wait(5)
+        return [_bar(i, i) for i in range(30, -1, -1)]
+
+    result = {}
+    t = threading.Thread(target=lambda: result.setdefault(
+        "1mo", store.get_series("market", "AAPL", "1d", period_start("1mo"), short_fetch)))
+    t.start()
+    assert started.wait(5)
+    try:
+        long_series = store.get_series("market", "AAPL", "1d", period_start("5y"),
+                                       lambda since: [_bar(i, i) for i in range(1000, -1, -1)])
+    finally:
+        release.set()
+        t.join(5)
+
+    assert len(long_series) == 1001
+    assert len(result["1mo"]) == 31
+    assert store._state("market", "AAPL", "1d")["covered_from"] == store._to_ts(_bar(1000, 0)["date"])
+
+
+def test_short_answer_is_partial_coverage(store, monkeypatch):
+    """Kaynak pencereden kısa seri dönerse kapsam ilk mum olmalı; pencere her istekte değil, süre dolunca yeniden indirilmeli"""
+    calls = []
+    available = {"days": 30}
+
+    def fetch(since):
+        calls.append(since)
+        return [_bar(i, i) for i in range(available["days"], -1, -1)]
+
+    assert len(store.get_series("market", "THYAO.IS", "1d", None, fetch)) == 31
+    assert store._state("market", "THYAO.IS", "1d")["covered_from"] == store._to_ts(_bar(30, 0)["date"])
+
+    # Aynı ya da daha kısa ama kapsanmayan pencere: süre dolmadan upstream'e tekrar gidilmez
+    store.get_series("market", "THYAO.IS", "1d", period_start("5y"), fetch)
+    store.get_series("market", "THYAO.IS", "1d", period_start("1y"), fetch)
+    assert calls == [None]
+
+    # Süre dolunca kısa kalan pencere yeniden tam indirilir ve artık uzun seri döner
+    available["days"] = 400
+    monkeypatch.setattr(store, "refresh_after", lambda interval: 0)
+    assert len(store.get_series("market", "THYAO.IS", "1d", period_start("1y"), fetch)) >= 365
+    assert calls == [None, None]
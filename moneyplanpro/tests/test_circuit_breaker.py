@@ -0,0 +1,150 @@
+import time
+from utils.circuit_breaker import CircuitBreaker, ProviderBreakers, provider_breakers, CLOSED, OPEN, HALF_OPEN
+from utils.network import UpstreamError
+from services.quota_service import QuotaExceeded
+from services.market_service import market_provider
+from services.fmp_service import fmp_service
+from services.twelve_data_service import twelve_data_service
+
+
+def _breakers(monkeypatch, threshold="2", reset="60"):
+    breakers = ProviderBreakers()
+    settings = {"CIRCUIT_FAILURE_THRESHOLD": threshold, "CIRCUIT_RESET_SEC": reset}
+    monkeypatch.setattr(breakers, "_setting", lambda key, default: settings.get(key, default))
+    return breakers
+
+
+def test_breaker_opens_and_recovers_through_half_open():
+    """Ardışık hatalar devreyi açmalı; süre dolunca tek deneme ile kapanabilmeli"""
+    breaker = CircuitBreaker("fmp", failure_threshold=2, reset_sec=0.05)
+    breaker.record(False, 1.0)
+    assert breaker.state == CLOSED
+    breaker.record(False, 1.0)
+    assert breaker.state == OPEN and not breaker.allow()
+
+    time.sleep(0.06)
+    assert breaker.state == HALF_OPEN
+    assert breaker.allow()
+    # Deneme sürerken ikinci çağrı geçmemeli
+    assert not breaker.allow()
+    breaker.record(True, 0.1)
+    assert breaker.state == CLOSED and breaker.allow()
+
+
+def test_failed_probe_reopens():
+    """half_open denemesi başarısızsa devre hemen yeniden açılmalı"""
+    breaker = CircuitBreaker("fmp", failure_threshold=3, reset_sec=0.05)
+    for _ in range(3):
+        breaker.record(False, 1.0)
+    time.sleep(0.06)
+    assert breaker.allow()
+    breaker.record(False, 1.0)
+    assert breaker.state == OPEN
+
+
+def test_chain_skips_dead_provider_and_prefers_fast_one(monkeypatch):
+    """Ölü sağlayıcı atlanmalı, sıralama sağlık ve gecikmeye göre değişmeli"""
+    breakers = _breakers(monkeypatch)
+    calls = []
+
+    def dead():
+        calls.append("fmp")
+        raise TimeoutError("timeout")
+
+    def slow():
+        calls.append("yfinance")
+        time.sleep(0.02)
+        return {"price": 1.0}
+
+    def fast():
+        calls.append("tradingview")
+        return {"price": 2.0}
+
+    providers = [("fmp", dead), ("yfinance", slow), ("tradingview", fast)]
+    result, name = breakers.run_chain(providers)
+    assert name == "yfinance" and calls == ["fmp", "yfinance"]
+
+    # Başarı oranı düşen fmp geriye alınır
+    calls.clear()
+    result, name = breakers.run_chain(providers)
+    assert name == "yfinance" and calls == ["yfinance"]
+
+    breakers.call("fmp", dead)
+    assert breakers.get("fmp").state == OPEN
+
+    # tradingview'un gecikme örneği olsun; artık en hızlı o
+    breakers.call("tradingview", fast)
+    calls.clear()
+    result, name = breakers.run_chain(providers)
+    assert name == "tradingview" and result == {"price": 2.0}
+    assert calls == ["tradingview"]
+    assert breakers.stats()["fmp"]["state"] == OPEN
+
+
+def test_empty_result_and_quota_are_neutral(monkeypatch):
+    """Veri yok yanıtı ve bütçe tükenmesi devre kesicide hata sayılmamalı; kesinti sayılmalı"""
+    breakers = _breakers(monkeypatch, threshold="1")
+    assert breakers.call("tefas", lambda: {"price": 0}, is_valid=lambda d: d["price"] > 0) is None
+
+    def exhausted():
+        raise QuotaExceeded("fmp budget exhausted")
+    assert breakers.call("fmp", exhausted) is None
+
+    def forbidden():
+        raise UpstreamError("FMP HTTP 403", 403)
+    assert breakers.call("fmp", forbidden) is None
+    assert breakers.get("tefas").state == CLOSED and breakers.get("fmp").state == CLOSED
+
+    def rate_limited():
+        raise UpstreamError("FMP HTTP 429", 429)
+    breakers.call("fmp", rate_limited)
+    assert breakers.get("fmp").state == OPEN
+
+
+def test_unknown_symbols_do_not_open_circuits(monkeypatch):
+    """Hiçbir sağlayıcının tanımadığı semboller devreleri açmamalı; geçerli sembol sonra çözülebilmeli"""
+    monkeypatch.setattr(provider_breakers, "_setting", lambda key, default: default)
+    monkeypatch.setattr(market_provider, "_is_tefas_fund", lambda s: False)
+    monkeypatch.setattr(fmp_service, "get_quote", lambda s: None)
+    monkeypatch.setattr(market_provider, "_get_detail_from_ta", lambda s: None)
+    monkeypatch.setattr(twelve_data_service, "get_quotes", lambda symbols, **kwargs: {})
+    monkeypatch.setattr(market_provider, "_get_detail_from_yahoo",
+                        lambda s: {"symbol": s, "price": 190.0} if s == "AAPL" else None)
+
+    for i in range(5):
+        assert market_provider.get_asset_detail(f"ZZBAD{i}") == {"price": 0.0}
+    for name in ("fmp", "yfinance", "tradingview", "twelvedata"):
+        assert provider_breakers.get(name).state == CLOSED
+
+    assert market_provider.get_asset_detail("AAPL")["price"] == 190.0
+
+
+def test_library_errors_for_bad_symbols_are_neutral(monkeypatch):
+    """Kütüphanenin bilinmeyen sembolde fırlattığı ValueError/KeyError devreyi açmamalı; bağlantı hatası açmalı"""
+    breakers = _breakers(monkeypatch, threshold="1")
+
+    def unknown_stock():
+        raise ValueError("ERR#0018: stock zzbad not found, check if it is correct.")
+
+    def code_bug():
+        raise KeyError("Close")
+
+    for _ in range(5):
+        assert breakers.call("investpy", unknown_stock) is None
+        assert breakers.call("investpy", code_bug) is None
+    assert breakers.get("investpy").state == CLOSED
+
+    def unreachable():
+        raise ConnectionError("ERR#0015: error 503, try again later.")
+    breakers.call("investpy", unreachable)
+    assert breakers.get("investpy").state == OPEN
+
+
+def test_unknown_investpy_stock_is_empty_history(monkeypatch):
+    """investpy bilinmeyen hisse için hata fırlatırsa geçmiş zinciri 'veri yok' görmeli"""
+    import investpy
+
+    def not_found(**kwargs):
+        raise ValueError("ERR#0018: stock zzbad not found, check if it is correct.")
+    monkeypatch.setattr(investpy, "get_stock_historical_data", not_found)
+    assert market_provider._get_history_from_investpy("ZZBAD.IS", "1mo") is None
@@ -0,0 +1,71 @@
+import threading
+import pytest
+import database
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    monkeypatch.setattr(database, "DB_PATH", str(tmp_path / "pool.db"))
+    database.init_db()
+    return database
+
+
+def test_connections_are_pooled_with_wal(db):
+    """Bağlantılar havuzdan tekrar kullanılmalı ve WAL + NORMAL ile açılmalı"""
+    with db.db_connection() as conn:
+        first = id(conn)
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+        assert conn.execute("PRAGMA synchronous").fetchone()[0] == 1  # NORMAL
+    with db.db_connection() as conn:
+        assert id(conn) == first
+
+
+def test_context_manager_commits_and_rolls_back(db):
+    """Blok hatasız biterse commit, hata olursa rollback yapılmalı"""
+    with db.db_connection() as conn:
+        conn.execute("INSERT INTO settings (key, value) VALUES ('a', '1')")
+
+    with pytest.raises(RuntimeError):
+        with db.db_connection() as conn:
+            conn.execute("INSERT INTO settings (key, value) VALUES ('b', '2')")
+            raise RuntimeError("boom")
+
+    with db.db_connection() as conn:
+        keys = [r["key"] for r in conn.execute("SELECT key FROM settings")]
+    assert keys == ["a"]
+
+
+def test_legacy_close_returns_connection_and_discards_uncommitted(db):
+    """Eski get_db_connection()/close() kullanımı havuza iade etmeli, commit edilmeyen iş geri alınmalı"""
+    conn = db.get_db_connection()
+    conn.execute("INSERT INTO settings (key, value) VALUES ('x', '1')")
+    conn.close()
+
+    again = db.get_db_connection()
+    assert again is conn
+    assert again.execute("SELECT COUNT(*) FROM settings").fetchone()[0] == 0
+    again.close()
+
+
+def test_pool_is_thread_safe(db):
+    """Farklı threadler havuzu eşzamanlı kullanabilmeli"""
+    errors = []
+
+    def worker(i):
+        try:
+            for j in range(20):
+                with db.db_connection() as conn:
+                    conn.execute("INSERT INTO settings (key, value) VALUES (?, ?)", (f"k{i}_{j}", "v"))
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert not errors
+    with db.db_connection() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM settings").fetchone()[0] == 160
+    assert db.db_pool.stats()["idle"] <= db.DB_POOL_SIZE
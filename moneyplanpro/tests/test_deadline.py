@@ -0,0 +1,62 @@
+import time
+import threading
+import pytest
+from utils import deadline
+from utils.cache import cache
+from services.market_service import market_provider
+from services.fmp_service import fmp_service
+from services.twelve_data_service import twelve_data_service
+
+
+def test_timeouts_are_clamped_to_the_remaining_budget():
+    """Upstream timeout'u kalan süreyi aşmamalı; iç içe deadline'larda kısa olan geçerli olmalı"""
+    assert deadline.clamp_timeout(10) == 10
+    with deadline.deadline(2, "outer"):
+        assert deadline.clamp_timeout(10) <= 2
+        assert deadline.clamp_timeout(0.5) == 0.5
+        with deadline.deadline(30, "inner"):
+            assert deadline.remaining() <= 2
+        connect, read = deadline.clamp_timeout((5, 30))
+        assert connect <= 2 and read <= 2
+
+
+def test_expired_deadline_raises_and_counts_miss():
+    """Süre dolunca yeni istek başlatılmamalı ve miss sayılmalı"""
+    before = deadline.stats()["misses"].get("unit_test", 0)
+    with deadline.deadline(0.05, "unit_test"):
+        time.sleep(0.06)
+        assert deadline.expired()
+        with pytest.raises(deadline.DeadlineExceeded):
+            deadline.clamp_timeout(10)
+    assert deadline.stats()["misses"]["unit_test"] == before + 1
+
+
+def test_bind_carries_deadline_into_threads():
+    """bind() ile başlatılan thread isteğin deadline'ını görmeli"""
+    seen = []
+    with deadline.deadline(5, "bind"):
+        thread = threading.Thread(target=deadline.bind(lambda: seen.append(deadline.remaining())))
+        thread.start()
+        thread.join()
+    assert seen[0] is not None and seen[0] <= 5
+
+
+def test_detail_returns_stale_result_when_deadline_hits(monkeypatch):
+    """Zincir deadline'a takılırsa son başarılı detay stale=True ile dönmeli"""
+    def slow(symbol):
+        time.sleep(0.5)
+        return {"price": 10.0}
+
+    monkeypatch.setattr(market_provider, "_is_tefas_fund", lambda s: False)
+    monkeypatch.setattr(fmp_service, "get_quote", slow)
+    monkeypatch.setattr(market_provider, "_get_detail_from_yahoo", slow)
+    monkeypatch.setattr(market_provider, "_get_detail_from_ta", slow)
+    monkeypatch.setattr(twelve_data_service, "get_quotes", lambda symbols, **kwargs: {})
+    cache.set("detail_last_ZZZT", {"symbol": "ZZZT", "price": 7.0}, ttl_seconds=60)
+
+    started = time.monotonic()
+    with deadline.deadline(0.2, "detail_test"):
+        detail = market_provider.get_asset_detail("ZZZT")
+    assert time.monotonic() - started < 0.45
+    assert detail["price"] == 7.0 and detail["stale"] is True
+    cache.delete("detail_last_ZZZT")
@@ -0,0 +1,78 @@
+import time
+import utils.hedge as hedge_module
+from utils.hedge import Hedger
+
+
+def _hedger(monkeypatch, enabled="1", budget="30"):
+    hedger = Hedger()
+    settings = {"HEDGE_ENABLED": enabled, "HEDGE_BUDGET_PER_MIN": budget}
+    monkeypatch.setattr(hedger, "_setting", lambda key, default: settings.get(key, default))
+    monkeypatch.setattr(hedge_module, "DEFAULT_DELAY_SEC", 0.05)
+    return hedger
+
+
+def _providers(prefix, slow_sec=0.5):
+    def slow():
+        time.sleep(slow_sec)
+        return {"price": 1.0}
+
+    def fast():
+        return {"price": 2.0}
+    return [(f"{prefix}_slow", slow), (f"{prefix}_fast", fast)]
+
+
+def test_slow_primary_is_hedged(monkeypatch):
+    """Birincil gecikirse ikinci sağlayıcı paralel sorulmalı ve ilk geçerli yanıt kazanmalı"""
+    hedger = _hedger(monkeypatch)
+    started = time.monotonic()
+    result, name = hedger.run_chain(_providers("h1"))
+    assert name == "h1_fast" and result == {"price": 2.0}
+    assert time.monotonic() - started < 0.4
+    stats = hedger.stats()
+    assert stats["hedged"] == 1 and stats["hedge_wins"] == 1
+
+
+def test_budget_limits_hedges(monkeypatch):
+    """Bütçe dolunca hedge atılmamalı, birincilin yanıtı beklenmeli"""
+    hedger = _hedger(monkeypatch, budget="1")
+    assert hedger._take_budget("h2_fast")
+    result, name = hedger.run_chain(_providers("h2", slow_sec=0.2))
+    assert name == "h2_slow"
+    assert hedger.stats()["budget_denied"] == 1
+
+
+def test_disabled_runs_sequential_chain(monkeypatch):
+    """HEDGE_ENABLED=0 iken zincir sıralı çalışmalı"""
+    hedger = _hedger(monkeypatch, enabled="0")
+    result, name = hedger.run_chain(_providers("h3", slow_sec=0.1))
+    assert name == "h3_slow"
+    assert hedger.stats()["chains"] == 0
+
+
+def test_failed_primary_falls_through(monkeypatch):
+    """Birincil hızlıca başarısız olursa sıradaki sağlayıcı denenmeli"""
+    hedger = _hedger(monkeypatch)
+    result, name = hedger.run_chain([("h4_dead", lambda: None), ("h4_ok", lambda: {"price": 3.0})])
+    assert name == "h4_ok" and hedger.stats()["hedged"] == 0
+
+
+def test_queued_primary_is_not_hedged(monkeypatch):
+    """Havuz doluyken sırada bekleyen birincil yavaş sayılmamalı; hedge süresi çalışmaya başlayınca işlemeli"""
+    hedger = _hedger(monkeypatch)
+    monkeypatch.setattr(hedge_module, "HEDGE_WORKERS", 1)
+    hedger._pool().submit(time.sleep, 0.3)  # havuzun tek thread'i meşgul
+
+    result, name = hedger.run_chain(_providers("h5", slow_sec=0.01))
+    assert name == "h5_slow" and result == {"price": 1.0}
+    assert hedger.stats()["hedged"] == 0
+
+
+def test_fmp_has_its_own_low_budget(monkeypatch):
+    """FMP varsayılan olarak hedge almamalı; diğer sağlayıcılar genel bütçeyi kullanmalı"""
+    hedger = _hedger(monkeypatch)
+    assert not hedger._take_budget("fmp")
+    assert hedger._take_budget("yfinance")
+
+    result, name = hedger.run_chain([("h6_slow", lambda: time.sleep(0.2) or {"price": 1.0}),
+                                     ("fmp", lambda: {"price": 2.0})])
+    assert name == "h6_slow" and hedger.stats()["budget_denied"] == 2
@@ -0,0 +1,68 @@
+import os
+import time
+import multiprocessing
+
+from utils.leader import LeaderLock
+
+
+def test_only_one_leader(tmp_path):
+    """Aynı kilit için yalnızca bir worker lider olabilmeli"""
+    worker_a = LeaderLock("test", directory=str(tmp_path))
+    worker_b = LeaderLock("test", directory=str(tmp_path))
+
+    assert worker_a.try_acquire()
+    assert worker_a.try_acquire()  # Zaten lider
+    assert not worker_b.try_acquire()
+
+
+def test_failover_after_release(tmp_path):
+    """Lider kilidi bırakınca (veya süreç ölünce) diğer worker devralmalı"""
+    worker_a = LeaderLock("test", directory=str(tmp_path))
+    worker_b = LeaderLock("test", directory=str(tmp_path))
+
+    assert worker_a.try_acquire()
+    worker_a.release()
+    assert not worker_a.is_leader
+    assert worker_b.try_acquire()
+
+
+def test_heartbeat_visible_to_followers(tmp_path):
+    """Liderin heartbeat'i (pid + yaş) diğer worker'lardan okunabilmeli"""
+    worker_a = LeaderLock("test", directory=str(tmp_path))
+    worker_b = LeaderLock("test", directory=str(tmp_path))
+
+    assert not worker_b.heartbeat()  # Lider olmayan yazamaz
+    assert worker_a.try_acquire()
+    assert worker_a.heartbeat()
+
+    status = worker_b.status()
+    assert not status["is_leader"]
+    assert status["leader_pid"] == os.getpid()
+    assert 0 <= status["heartbeat_age"] < 5
+
+    worker_a.release()
+    assert worker_b.status()["leader_pid"] is None
+
+
+def test_failover_when_leader_process_dies(tmp_path):
+    """Lider süreç ölünce işletim sistemi kilidi bırakmalı ve takipçi devralmalı"""
+    ready = multiprocessing.Event()
+    proc = multiprocessing.get_context("fork").Process(target=_hold_lock, args=(str(tmp_path), ready))
+    proc.start()
+    assert ready.wait(5)
+
+    follower = LeaderLock("test", directory=str(tmp_path))
+    assert not follower.try_acquire()
+    assert follower.status()["leader_pid"] == proc.pid
+
+    proc.kill()
+    proc.join()
+    assert follower.try_acquire()
+
+
+def _hold_lock(directory, ready):
+    lock = LeaderLock("test", directory=directory)
+    lock.try_acquire()
+    lock.heartbeat()
+    ready.set()
+    time.sleep(30)
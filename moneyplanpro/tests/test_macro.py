@@ -0,0 +1,64 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+import pytest
+import services.macro_service as macro_module
+from services.macro_service import MacroService
+from utils.cache import SimpleCache, MemoryBackend
+
+VALUES = {"TR": 44.38, "US": 2.95, "DE": 2.26}
+
+
+class _WorldBank(BaseHTTPRequestHandler):
+    paths = []
+
+    def do_GET(self):
+        path = urlsplit(self.path).path  # /country/TR;US/indicator/FP.CPI.TOTL.ZG
+        _WorldBank.paths.append(path)
+        countries = path.split("/")[2].split(";")
+        rows = [{"country": {"id": c, "value": c}, "countryiso3code": "", "date": "2024",
+                 "value": VALUES.get(c)} for c in countries if c in VALUES]
+        body = json.dumps([{"page": 1, "total": len(rows)}, rows]).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def service(monkeypatch):
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), _WorldBank)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    _WorldBank.paths = []
+    monkeypatch.setattr(macro_module, "cache", SimpleCache(MemoryBackend()))
+    svc = MacroService()
+    svc.wb_url = f"http://127.0.0.1:{httpd.server_address[1]}"
+    yield svc
+    httpd.shutdown()
+
+
+def test_batch_uses_one_request_per_indicator(service):
+    """Çoklu ülke isteği gösterge başına tek World Bank çağrısı yapmalı"""
+    result = service.get_countries_indicators(["tr", "US", "DE"])
+
+    assert len(_WorldBank.paths) == len(MacroService.INDICATORS)
+    assert all("/country/TR;US;DE/" in p for p in _WorldBank.paths)
+    assert result["TR"]["data"]["inflation"] == {"value": 44.38, "date": "2024", "is_estimate": False}
+    assert result["DE"]["data"]["gdp_growth"]["value"] == 2.26
+
+
+def test_batch_fetches_only_uncached_countries(service):
+    """Cache'te olan ülkeler tekrar istenmemeli, bilinmeyen ülke N/A dönmeli"""
+    service.get_country_indicators("TR")
+    _WorldBank.paths = []
+
+    result = service.get_countries_indicators(["TR", "US", "XX"])
+
+    assert all("/country/US;XX/" in p for p in _WorldBank.paths)
+    assert result["XX"]["data"]["inflation"] == {"value": 0, "date": "N/A"}
+    assert result["US"]["data"]["unemployment"]["value"] == 2.95
@@ -0,0 +1,125 @@
+import requests
+from utils.cache import cache
+from utils.circuit_breaker import provider_breakers
+from utils.network import SafeRequest
+from services.market_service import market_provider
+from services.fmp_service import fmp_service
+from services.twelve_data_service import twelve_data_service
+
+
+def _patch_chain(monkeypatch, calls, prices):
+    def provider(name):
+        def fn(symbol):
+            calls.append(name)
+            price = prices.get(name, 0.0)
+            return {"symbol": symbol, "price": price} if price else None
+        return fn
+
+    monkeypatch.setattr(market_provider, "_is_tefas_fund", lambda s: False)
+    monkeypatch.setattr(fmp_service, "get_quote", provider("fmp"))
+    monkeypatch.setattr(market_provider, "_get_detail_from_yahoo", provider("yfinance"))
+    monkeypatch.setattr(market_provider, "_get_detail_from_ta", provider("tradingview"))
+    monkeypatch.setattr(twelve_data_service, "get_quotes",
+                        lambda symbols, **kwargs: {s: provider("twelvedata")(s) for s in symbols})
+
+
+def _clear(symbol):
+    cache.delete(f"neg_detail_{symbol}")
+    cache.delete(f"detail_last_{symbol}")
+    for provider in ("fmp", "yfinance", "tradingview", "twelvedata"):
+        cache.delete(f"unsupported_{provider}_{symbol}")
+
+
+def test_unresolvable_symbol_is_negatively_cached(monkeypatch):
+    """Hiçbir sağlayıcının çözemediği sembol tekrar zincire sokulmamalı, süre ikiye katlanmalı"""
+    calls = []
+    _patch_chain(monkeypatch, calls, {})
+    _clear("NOPE1")
+
+    assert market_provider.get_asset_detail("NOPE1") == {"price": 0.0}
+    assert len(calls) == 4
+    entry = cache.get("neg_detail_NOPE1")
+    assert entry["failures"] == 1
+
+    calls.clear()
+    assert market_provider.get_asset_detail("NOPE1") == {"price": 0.0}
+    assert calls == []
+
+    # Negatif süre bitince tekrar denenir; yine başarısızsa süre uzar
+    cache.set("neg_detail_NOPE1", dict(entry, until=0), ttl_seconds=60)
+    market_provider.get_asset_detail("NOPE1")
+    assert len(calls) == 4
+    assert cache.get("neg_detail_NOPE1")["failures"] == 2
+    _clear("NOPE1")
+
+
+def test_provider_without_symbol_is_skipped(monkeypatch):
+    """Sembole art arda boş dönen sağlayıcı sonraki isteklerde atlanmalı"""
+    calls = []
+    _patch_chain(monkeypatch, calls, {"yfinance": 42.0})
+    _clear("ONLYY")
+    # Başarılı sağlayıcı öne alınmasın: FMP her istekte sorulsun
+    monkeypatch.setattr(provider_breakers, "order", lambda names: list(names))
+
+    for _ in range(3):
+        assert market_provider.get_asset_detail("ONLYY")["price"] == 42.0
+    assert cache.get("unsupported_fmp_ONLYY")
+
+    calls.clear()
+    assert market_provider.get_asset_detail("ONLYY")["price"] == 42.0
+    assert "fmp" not in calls
+    _clear("ONLYY")
+
+
+def test_outage_does_not_poison_negative_caches(monkeypatch):
+    """Sağlayıcılar erişilemezken boş kalan sembol negatif/desteklenmiyor olarak işaretlenmemeli"""
+    def down(*args, **kwargs):
+        raise requests.exceptions.ConnectionError("network down")
+
+    # FMP ve TwelveData gerçek istemcileriyle, ağ katmanında kesinti
+    _clear("AAPL")
+    monkeypatch.setattr(market_provider, "_is_tefas_fund", lambda s: False)
+    monkeypatch.setattr(SafeRequest, "request", down)
+    monkeypatch.setattr(twelve_data_service, "api_key", "test")
+    for name in ("_get_detail_from_yahoo", "_get_detail_from_ta"):
+        monkeypatch.setattr(market_provider, name, down)
+
+    assert market_provider.get_asset_detail("AAPL") == {"price": 0.0}
+    assert cache.get("neg_detail_AAPL") is None
+    for provider in ("fmp", "yfinance", "tradingview", "twelvedata"):
+        assert cache.get(f"unsupported_{provider}_AAPL") is None
+
+    # yfinance geri gelince sembol hemen çözülür
+    _patch_chain(monkeypatch, [], {"yfinance": 190.0})
+    assert market_provider.get_asset_detail("AAPL")["price"] == 190.0
+    _clear("AAPL")
+
+
+def test_single_soft_miss_does_not_mark_unsupported(monkeypatch):
+    """Tek bir boş yanıt (geçici kaçırma) sağlayıcıyı sembol için susturmamalı; başarı sayacı sıfırlamalı"""
+    calls = []
+    prices = {"yfinance": 42.0}
+    _patch_chain(monkeypatch, calls, prices)
+    monkeypatch.setattr(provider_breakers, "order", lambda names: list(names))
+
+    market_provider.get_asset_detail("SOFT1")
+    market_provider.get_asset_detail("SOFT1")
+    assert cache.get("unsupported_fmp_SOFT1") is None
+
+    # FMP sembolü çözerse kaçırma sayacı sıfırlanır
+    prices["fmp"] = 41.0
+    monkeypatch.setattr(market_provider, "_get_detail_from_yahoo", lambda s: None)
+    assert market_provider.get_asset_detail("SOFT1")["price"] == 41.0
+    assert cache.get("unsupported_miss_fmp_SOFT1") is None
+
+
+def test_no_provider_asked_is_not_negative(monkeypatch):
+    """Tüm sağlayıcılar atlandıysa (desteklenmiyor kaydı) sembol negatif cache'e yazılmamalı"""
+    calls = []
+    _patch_chain(monkeypatch, calls, {})
+    for provider in ("fmp", "yfinance", "tradingview", "twelvedata"):
+        cache.set(f"unsupported_{provider}_SKIP1", True, ttl_seconds=60)
+
+    assert market_provider.get_asset_detail("SKIP1") == {"price": 0.0}
+    assert calls == []
+    assert cache.get("neg_detail_SKIP1") is None
@@ -0,0 +1,52 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+from utils.network import SafeRequest, SessionRegistry, USER_AGENTS
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive
+
+    def do_GET(self):
+        body = (self.headers.get("User-Agent") or "").encode()
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}"
+    httpd.shutdown()
+
+
+def test_connections_are_reused_per_host(server, monkeypatch):
+    """Aynı hosta giden ardışık istekler tek bir bağlantıyı paylaşmalı"""
+    registry = SessionRegistry()
+    monkeypatch.setattr("utils.network.http_sessions", registry)
+
+    for _ in range(5):
+        assert SafeRequest.request("GET", f"{server}/quote").status_code == 200
+
+    stats = registry.stats()
+    assert stats["hosts"][server]["requests"] == 5
+    assert stats["hosts"][server]["connections_opened"] == 1
+    assert stats["hosts"][server]["reused"] == 4
+    assert registry.session_for(f"{server}/other") is registry.session_for(f"{server}/quote")
+    registry.close()
+
+
+def test_browser_headers_rotate_user_agent(server, monkeypatch):
+    """browser=True her istekte listeden bir User-Agent göndermeli"""
+    registry = SessionRegistry()
+    monkeypatch.setattr("utils.network.http_sessions", registry)
+
+    assert SafeRequest.get(server).text in USER_AGENTS
+    assert SafeRequest.get(server, headers={"User-Agent": "custom"}).text == "custom"
+    registry.close()
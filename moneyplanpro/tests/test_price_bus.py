@@ -0,0 +1,98 @@
+import json
+import time
+import pytest
+from services.price_bus import PriceBus
+from services.alert_monitor_service import AlertMonitorService
+
+
+def _write_ticks(path, ticks):
+    with open(path, "w", encoding="utf-8") as f:
+        for ts, symbol, price in ticks:
+            f.write(json.dumps({"ts": ts, "symbol": symbol, "price": price}) + "\n")
+
+
+@pytest.fixture
+def bus(tmp_path):
+    bus = PriceBus("test_bus", directory=str(tmp_path))
+    yield bus
+    bus.close()
+
+
+def test_replay_delivers_ticks_to_subscribers(bus, tmp_path):
+    """Tick dosyası yeniden oynatılınca aboneler son fiyatları almalı, geçersiz fiyatlar atlanmalı"""
+    path = tmp_path / "ticks.jsonl"
+    _write_ticks(path, [(1, "btc", 64000), (2, "ETH", 3000), (3, "BTC", 65000), (4, "XYZ", 0)])
+    seen = {}
+    bus.subscribe(seen.update)
+
+    assert bus.replay(str(path)) == 3
+    assert bus.flush()
+    assert seen == {"BTC": 65000.0, "ETH": 3000.0}
+    assert bus.stats()["published"] == 3
+
+
+def test_ticks_from_other_workers_reach_listener(bus, tmp_path):
+    """Dinlemeyen bir süreçte yayınlanan tick'ler unix soketi üzerinden dinleyiciye ulaşmalı"""
+    seen = {}
+    bus.subscribe(seen.update)
+    bus.listen()
+
+    worker = PriceBus("test_bus", directory=str(tmp_path))
+    worker.publish("AAPL", 190.5)
+
+    for _ in range(100):
+        if seen:
+            break
+        time.sleep(0.02)
+    assert seen == {"AAPL": 190.5}
+    assert worker.stats()["forwarded"] == 1
+    assert bus.stats()["received"] == 1
+
+
+def test_alert_engine_evaluates_only_ticked_symbols(bus, tmp_path, monkeypatch):
+    """Alarm motoru yalnızca tick alan sembolleri değerlendirmeli ve eşiği aşanları tetiklemeli"""
+    monitor = AlertMonitorService()
+    monitor._index.sync([
+        {"id": 1, "user_id": "u1", "symbol": "BTC", "target_price": 65000, "is_above": True},
+        {"id": 2, "user_id": "u2", "symbol": "BTC", "target_price": 60000, "is_above": False},
+        {"id": 3, "user_id": "u3", "symbol": "ETH", "target_price": 4000, "is_above": True},
+    ])
+    fired = []
+    monkeypatch.setattr(monitor, "_get_supabase_config", lambda: ("http://supabase.local", "key"))
+    monkeypatch.setattr(monitor, "_trigger_alerts", lambda alerts, url, headers: fired.extend(
+        (a["id"], price) for a, price in alerts))
+    bus.subscribe(monitor._on_ticks)
+
+    path = tmp_path / "ticks.jsonl"
+    _write_ticks(path, [(1, "BTC", 64000), (2, "BTC", 65100)])
+    bus.replay(str(path))
+    bus.flush()
+
+    assert fired == [(1, 65100.0)]
+    assert set(monitor._last_tick) == {"BTC"}
+    assert len(monitor._index) == 2
+
+
+def test_binance_and_coingecko_ticks_skip_non_crypto_symbols(monkeypatch):
+    """EURUSDT/TUSDT gibi çiftler EUR/T (döviz, hisse) sembolleriyle yayınlanmamalı"""
+    from types import SimpleNamespace
+    from services import crypto_service as crypto_module
+    from services.crypto_service import crypto_service
+
+    published = {}
+    monkeypatch.setattr(crypto_module.price_bus, "publish_many", lambda prices: published.update(prices))
+    tickers = [{"symbol": s, "price": p} for s, p in
+               (("BTCUSDT", "65000"), ("EURUSDT", "1.08"), ("GBPUSDT", "1.27"), ("TUSDT", "0.02"))]
+    monkeypatch.setattr(crypto_module.SafeRequest, "request",
+                        lambda *args, **kwargs: SimpleNamespace(status_code=200, json=lambda: tickers))
+
+    assert crypto_service._fetch_all_prices()["EURUSDT"] == 1.08
+    assert published == {"BTC": 65000.0}
+
+    published.clear()
+    crypto_service._parse_markets([
+        {"id": i, "symbol": s, "name": s, "current_price": p, "price_change_percentage_24h": 0,
+         "market_cap": 0, "total_volume": 0, "image": ""}
+        for i, s, p in (("ethereum", "eth", 3000), ("threshold", "t", 0.02))
+    ])
+    assert published == {"ETH": 3000}
@@ -0,0 +1,80 @@
+from services.market_service import market_provider
+from services.fmp_service import fmp_service
+from services.ta_service import ta_service
+from services.crypto_service import crypto_service
+from services.twelve_data_service import twelve_data_service
+from utils.cache import cache
+
+
+def _patch_providers(monkeypatch, calls):
+    def record(name, result):
+        def fn(symbols, *args, **kwargs):
+            calls.append((name, sorted(symbols)))
+            return result
+        return fn
+
+    monkeypatch.setattr(market_provider, "_is_tefas_fund", lambda s: s == "TCD")
+    monkeypatch.setattr(market_provider, "_get_tefas_data", lambda s: {"symbol": s, "price": 1.5})
+    monkeypatch.setattr(crypto_service, "get_prices", record("binance", {"BTC": 65000.0}))
+    monkeypatch.setattr(crypto_service, "get_quotes", record("binance24h", {"BTC": {"price": 65000.0, "change_percent": 2.5}}))
+    monkeypatch.setattr(fmp_service, "get_quotes", record("fmp", {"AAPL": {"symbol": "AAPL", "price": 190.0}}))
+    monkeypatch.setattr(ta_service, "get_multiple_analysis", record("tv", [
+        {"symbol": "AAPL", "price": 189.0},
+        {"symbol": "THYAO", "price": 300.0},
+        {"symbol": "XYZ", "price": 0.0},
+    ]))
+    monkeypatch.setattr(twelve_data_service, "get_quotes", record("twelve", {}))
+    monkeypatch.setattr(market_provider, "get_asset_detail", lambda s: {"price": 0.0})
+
+
+def test_get_prices_uses_batch_providers(monkeypatch):
+    """Her sağlayıcı tüm sembol grubu için bir kez çağrılmalı, öncelik FMP > TradingView"""
+    calls = []
+    _patch_providers(monkeypatch, calls)
+
+    prices = market_provider.get_prices(["AAPL", "THYAO", "BTC", "TCD", "XYZ", "AAPL"])
+
+    assert prices == {"AAPL": 190.0, "THYAO": 300.0, "BTC": 65000.0, "TCD": 1.5}
+    assert ("binance", ["BTC"]) in calls
+    assert ("fmp", ["AAPL", "THYAO", "XYZ"]) in calls
+    assert ("tv", ["AAPL", "THYAO", "XYZ"]) in calls
+    # Yalnızca çözülemeyen semboller TwelveData'ya gider
+    assert ("twelve", ["XYZ"]) in calls
+
+
+def test_get_prices_survives_provider_errors(monkeypatch):
+    """Bir sağlayıcının hatası diğerlerinin sonuçlarını düşürmemeli"""
+    calls = []
+    _patch_providers(monkeypatch, calls)
+
+    def boom(symbols):
+        raise RuntimeError("FMP down")
+    monkeypatch.setattr(fmp_service, "get_quotes", boom)
+
+    prices = market_provider.get_prices(["AAPL", "BTC"])
+    assert prices["AAPL"] == 189.0
+    assert prices["BTC"] == 65000.0
+
+
+def test_get_quotes_uniform_shape_and_cache(monkeypatch):
+    """Toplu kotasyon tek tip dönmeli; cache'teki semboller sağlayıcıya gitmemeli"""
+    calls = []
+    _patch_providers(monkeypatch, calls)
+    for s in ("AAPL", "BTC", "THYAO", "XYZ"):
+        cache.delete(f"quote_v1_{s}")
+
+    quotes = market_provider.get_quotes(["aapl", "BTC", "XYZ"])
+    assert [q["symbol"] for q in quotes] == ["AAPL", "BTC", "XYZ"]
+    assert quotes[0]["price"] == 190.0 and quotes[0]["source"] == "FMP"
+    assert quotes[1]["change_percent"] == 2.5 and quotes[1]["asset_class"] == "crypto"
+    assert quotes[2]["price"] == 0.0 and quotes[2]["source"] is None
+    assert set(quotes[0]) == set(quotes[2])
+
+    calls.clear()
+    quotes = market_provider.get_quotes(["AAPL", "BTC", "THYAO"])
+    assert quotes[2]["source"] == "TradingView"
+    # AAPL ve BTC cache'ten gelir; yalnızca THYAO sağlayıcılara gider
+    assert ("fmp", ["THYAO"]) in calls
+    assert not any(name == "binance24h" and symbols for name, symbols in calls)
+    for s in ("AAPL", "BTC", "THYAO"):
+        cache.delete(f"quote_v1_{s}")
@@ -0,0 +1,130 @@
+import time
+import asyncio
+import threading
+import pytest
+import database
+from services import quota_service as quota_module
+from services.quota_service import QuotaService, QuotaExceeded
+
+
+@pytest.fixture
+def quotas(tmp_path, monkeypatch):
+    monkeypatch.setattr(database, "DB_PATH", str(tmp_path / "quota.db"))
+    database.init_db()
+    service = QuotaService()
+    limits = {"fmp": (10.0, 86400.0), "twelvedata": (8.0, 60.0), "binance": (6000.0, 60.0)}
+    monkeypatch.setattr(service, "limits", lambda provider: limits.get(provider))
+    # Varsayılan testlerde kira yok: her çağrı doğrudan paylaşımlı kovadan düşer
+    monkeypatch.setattr(service, "lease_fraction", lambda: 0.0)
+    return service
+
+
+def test_priority_floors_reserve_budget(quotas):
+    """Kullanıcı istekleri kovanın %30'unu, prefetch %10'unu alarm çağrılarına bırakmalı"""
+    spent = 0
+    while quotas.try_acquire("fmp"):
+        spent += 1
+    assert spent == 7
+
+    with quotas.priority("background"):
+        assert quotas.try_acquire("fmp") and quotas.try_acquire("fmp")
+        assert not quotas.try_acquire("fmp")
+    with quotas.priority("critical"):
+        assert quotas.try_acquire("fmp")
+        assert not quotas.try_acquire("fmp")
+    assert quotas.stats()["fmp"]["denied"] == 3
+
+
+def test_budget_is_shared_and_persisted(quotas):
+    """Kova SQLite'ta tutulmalı: yeni bir süreç/örnek aynı kalan bütçeyi görmeli"""
+    quotas.try_acquire("fmp", cost=5)
+    other = QuotaService()
+    other.limits = quotas.limits
+    assert other.remaining("fmp") == pytest.approx(5, abs=0.01)
+
+
+def test_bucket_refills_over_time(quotas):
+    """Kova kapasite/periyot hızıyla dolmalı"""
+    with quotas.priority("critical"):
+        assert quotas.try_acquire("twelvedata", cost=8)
+        assert not quotas.try_acquire("twelvedata")
+        time.sleep(0.2)  # 8 kredi/60 sn -> 0.2 sn'de ~0.027 kredi
+        assert quotas.remaining("twelvedata") > 0
+
+
+def test_request_cost_and_check(quotas):
+    """TwelveData sembol başına, Binance parametresiz ağır çağrılar yüksek ağırlıkla ücretlenmeli"""
+    quotas.check("https://api.twelvedata.com/quote?symbol=AAPL,MSFT,NVDA&apikey=x")
+    assert quotas.remaining("twelvedata") == pytest.approx(5, abs=0.01)
+    quotas.check("https://api.binance.com/api/v3/ticker/24hr")
+    quotas.check("https://api.binance.com/api/v3/ticker/24hr", params={"symbol": "BTCUSDT"})
+    assert quotas.remaining("binance") == pytest.approx(6000 - 82, abs=1)
+    with pytest.raises(QuotaExceeded):
+        for _ in range(5):
+            quotas.check("https://api.twelvedata.com/quote", params={"symbol": "AAPL"})
+    # Tanımsız host'lar sınırlanmaz
+    quotas.check("https://example.com/anything")
+
+
+def test_tokens_are_leased_in_batches(quotas, monkeypatch):
+    """Worker kovadan toplu kira almalı; kira bitene kadar istekler veritabanına gitmemeli"""
+    monkeypatch.setattr(quotas, "limits", lambda provider: (250.0, 86400.0))
+    monkeypatch.setattr(quotas, "lease_fraction", lambda: 0.02)
+    transactions = []
+    real_connection = quota_module.db_connection
+    monkeypatch.setattr(quota_module, "db_connection", lambda: transactions.append(1) or real_connection())
+
+    for _ in range(5):
+        assert quotas.try_acquire("fmp")
+    assert len(transactions) == 1
+    assert quotas.remaining("fmp") == pytest.approx(245, abs=0.01)
+    assert quotas.stats()["fmp"]["leased"] == 0
+
+    # Arka plan kirası kullanıcı isteklerine harcanmaz (öncelik başına ayrı yerel kova)
+    with quotas.priority("background"):
+        assert quotas.try_acquire("fmp")
+    assert quotas.stats()["fmp"]["leased"] == 4
+
+
+def test_async_check_runs_store_access_off_the_event_loop(quotas, monkeypatch):
+    """acheck kira yetmediğinde SQLite işlemini event loop thread'inde yapmamalı"""
+    threads = []
+    real_acquire = quotas._acquire
+    monkeypatch.setattr(quotas, "_acquire",
+                        lambda *args: threads.append(threading.get_ident()) or real_acquire(*args))
+
+    async def run():
+        await quotas.acheck("https://financialmodelingprep.com/api/v3/quote/AAPL")
+        return threading.get_ident()
+
+    loop_thread = asyncio.run(run())
+    assert threads and threads[0] != loop_thread
+    assert quotas.remaining("fmp") == pytest.approx(9, abs=0.01)
+
+
+def test_leases_stay_above_the_reserved_floor(quotas, monkeypatch):
+    """Kira ayrılmış paydan alınmamalı: kiralar beklerken de taban korunmalı, kalan kira kapanışta geri verilmeli"""
+    monkeypatch.setattr(quotas, "limits", lambda provider: (100.0, 86400.0))
+    monkeypatch.setattr(quotas, "lease_fraction", lambda: 0.2)
+    other_worker = QuotaService()
+    monkeypatch.setattr(other_worker, "limits", quotas.limits)
+    monkeypatch.setattr(other_worker, "lease_fraction", quotas.lease_fraction)
+
+    # Kullanıcı istekleri kovayı %30 tabanına kadar kiralar
+    while quotas.remaining("fmp") > 35:
+        assert quotas.try_acquire("fmp", cost=5)
+    with quotas.priority("background"):
+        assert quotas.try_acquire("fmp")
+        assert quotas.try_acquire("fmp")
+    # Arka plan kirası en fazla %30 tabanına kadar: ayrılmış pay başka worker'ın alarmlarına kalır
+    assert quotas.remaining("fmp") == pytest.approx(28, abs=0.01)
+    with other_worker.priority("critical"):
+        for _ in range(28):
+            assert other_worker.try_acquire("fmp")
+    assert other_worker.stats()["fmp"]["leased"] == 0
+
+    leased = quotas.stats()["fmp"]["leased"]
+    assert leased > 0
+    quotas.release_leases()
+    assert quotas.stats()["fmp"]["leased"] == 0
+    assert quotas.remaining("fmp") == pytest.approx(leased, abs=0.01)
@@ -0,0 +1,83 @@
+import time
+from services.symbol_registry import SymbolRegistry, VERSION_KEY
+from utils.cache import cache
+
+
+def _registry(monkeypatch, funds=("TCD", "AFT")):
+    registry = SymbolRegistry()
+    monkeypatch.setattr(registry, "_load_funds", lambda: list(funds))
+    return registry
+
+
+def test_lookup_routes_each_provider(monkeypatch):
+    """Bilinen semboller her sağlayıcı için doğru sembole eşlenmeli"""
+    registry = _registry(monkeypatch)
+
+    thyao = registry.lookup("thyao")
+    assert thyao["asset_class"] == "stock"
+    assert thyao["tv"] == ("THYAO", "turkey", "BIST")
+    assert thyao["yahoo"] == "THYAO.IS" and thyao["fmp"] == "THYAO.IS"
+
+    usd = registry.lookup("USD")
+    assert usd["asset_class"] == "forex"
+    assert usd["yahoo"] == "TRY=X" and usd["twelve"] == "USD/TRY"
+
+    assert registry.lookup("ADA")["binance"] == "ADAUSDT"
+    assert registry.is_crypto("BTCUSDT")
+    assert registry.is_fund("TCD") and registry.lookup("TCD")["name"] == "Tacirler Portföy Değişken Fon"
+    assert registry.lookup("SAP")["tv"] == ("SAP", "germany", "XETR")
+
+
+def test_unknown_symbols_use_rules_and_memo(monkeypatch):
+    """Tabloda olmayan semboller kurallarla çözülüp memo'lanmalı"""
+    registry = _registry(monkeypatch)
+
+    entry = registry.lookup("NVDA")
+    assert entry["asset_class"] == "stock" and entry["tv"] == ("NVDA", "america", "NASDAQ")
+    assert registry.lookup("NVDA") is entry
+    assert registry.lookup("ASTOR.IS")["tv"] == ("ASTOR", "turkey", "BIST")
+    assert registry.stats()["memo"] == 2
+
+
+def _wait_reload(registry, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while registry._reloading and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+
+def test_refresh_is_picked_up_by_other_workers(monkeypatch):
+    """Bir worker'ın refresh'i sürüm damgasıyla diğerlerine yansımalı; yenileme arka planda yapılmalı"""
+    leader = _registry(monkeypatch)
+    follower = _registry(monkeypatch)
+    assert not follower.is_fund("NEW")
+
+    monkeypatch.setattr(leader, "_load_funds", lambda: ["TCD", "NEW"])
+    leader.refresh()
+
+    def slow_funds():
+        time.sleep(0.3)
+        return ["TCD", "NEW"]
+    monkeypatch.setattr(follower, "_load_funds", slow_funds)
+    # Sürüm kontrolü aralığı dolmuş gibi davran
+    follower._version_checked = 0
+    started = time.monotonic()
+    # Yeni indeks hazır olana kadar eski indeks beklemeden döner
+    assert not follower.is_fund("NEW")
+    assert time.monotonic() - started < 0.2
+    _wait_reload(follower)
+    assert follower.is_fund("NEW")
+    assert follower.stats()["version"] == cache.get(VERSION_KEY)
+
+
+def test_startup_refresh_adopts_shared_version(monkeypatch):
+    """Açılıştaki refresh(publish=False) paylaşımlı damgayı benimsemeli; ikinci kez kurulum olmamalı"""
+    cache.set(VERSION_KEY, 123.0, ttl_seconds=60)
+    registry = _registry(monkeypatch)
+    registry.refresh(publish=False)
+    assert registry.stats()["version"] == 123.0
+
+    builds = []
+    monkeypatch.setattr(registry, "_build", lambda: builds.append(1) or {})
+    registry._version_checked = 0
+    registry.lookup("THYAO")
+    assert builds == [] and not registry._reloading
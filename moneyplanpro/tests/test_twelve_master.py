@@ -0,0 +1,32 @@
+import os
+import json
+from services.twelve_data_service import twelve_data_service
+
+
+def _write(path, data, mtime):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+    os.utime(path, (mtime, mtime))
+
+
+def test_master_list_is_parsed_once_and_reloaded_on_change(tmp_path, monkeypatch):
+    """Master liste her çağrıda parse edilmemeli; dosya değişince indeks yenilenmeli"""
+    path = str(tmp_path / "twelve_symbols.json")
+    monkeypatch.setattr(twelve_data_service, "master_list_path", path)
+    monkeypatch.setattr(twelve_data_service, "_master_index", {})
+    monkeypatch.setattr(twelve_data_service, "_master_mtime", None)
+    _write(path, {"AAPL": {"mic_code": "XNGS"}, "EUR": {"type": "Forex"}}, 1_000_000)
+
+    loads = []
+    real_load = json.load
+    monkeypatch.setattr(json, "load", lambda f: loads.append(1) or real_load(f))
+
+    targets, sym_map = twelve_data_service._prepare_targets(["aapl", "EUR"])
+    assert targets == ["AAPL:XNGS", "EUR/TRY"] and sym_map["AAPL:XNGS"] == "aapl"
+    twelve_data_service._prepare_targets(["AAPL"])
+    assert len(loads) == 1
+
+    # Başka bir süreçte biten sync dosyayı değiştirir
+    _write(path, {"AAPL": {"mic_code": "XNAS"}}, 1_000_100)
+    targets, _ = twelve_data_service._prepare_targets(["AAPL"])
+    assert targets == ["AAPL:XNAS"] and len(loads) == 2
@@ -1,24 +1,545 @@
+import os
+import sys
 import time
+import asyncio
+import pickle
+import hashlib
+import logging
+import tempfile
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import anyio
 
-class SimpleCache:
-    def __init__(self):
-        self._cache = {}
-        self._timestamps = {}
+logger = logging.getLogger(__name__)
+
+
+# Sembol bazlı anahtarlar (kullanıcı rastgele sembollere baktıkça) sınırsız büyümesin diye
+# namespace (anahtar öneki) başına maksimum kayıt sayısı
+DEFAULT_NAMESPACE_LIMITS = {
+    "fmp_history_": 200,
+    "ta_analysis_": 500,
+    "td_quote_": 2000,
+}
+
+
+def _estimate_size(value):
+    """Değerin yaklaşık bellek boyutu (byte). Pickle uzunluğu iyi bir yaklaşımdır."""
+    try:
+        return len(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+    except Exception:
+        return sys.getsizeof(value)
+
+
+class MemoryBackend:
+    """
+    Süreç içi (per-process) LRU backend. Her worker kendi kopyasını tutar.
+    - max_entries / max_bytes aşılınca en uzun süredir kullanılmayan kayıt atılır
+    - namespace_limits ile belirli anahtar öneklerine ayrı üst sınır konur
+    - purge_expired() süresi dolmuş kayıtları okunmayı beklemeden temizler (sweeper çağırır)
+    """
+
+    def __init__(self, max_entries: int = 5000, max_bytes: int = 64 * 1024 * 1024, namespace_limits: dict = None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.namespace_limits = DEFAULT_NAMESPACE_LIMITS if namespace_limits is None else namespace_limits
+        self._entries = OrderedDict()  # key -> (expires_at, value, size)
+        self._namespaces = {}  # prefix -> OrderedDict(key -> None), LRU sırasıyla
+        self._bytes = 0
+        self._evictions = 0
+        self._lock = threading.Lock()
+
+    def _namespace(self, key: str):
+        for prefix in self.namespace_limits:
+            if key.startswith(prefix):
+                return prefix
+        return None
+
+    def _remove(self, key: str):
+        expires_at, value, size = self._entries.pop(key)
+        self._bytes -= size
+        ns = self._namespace(key)
+        if ns:
+            self._namespaces[ns].pop(key, None)
+
+    def _evict(self, key: str):
+        self._remove(key)
+        self._evictions += 1
 
     def get(self, key: str):
-        """Veriyi getir, süresi dolmuşsa None dön"""
-        if key in self._cache:
-            if time.time() < self._timestamps.get(key, 0):
-                return self._cache[key]
-            else:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if time.time() >= entry[0]:
                 # Süre dolmuş, temizle
-                del self._cache[key]
-                del self._timestamps[key]
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            ns = self._namespace(key)
+            if ns:
+                self._namespaces[ns].move_to_end(key)
+            return entry[1]
+
+    def set(self, key: str, value: any, ttl_seconds: int):
+        size = _estimate_size(value)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (time.time() + ttl_seconds, value, size)
+            self._bytes += size
+
+            ns = self._namespace(key)
+            if ns:
+                ns_keys = self._namespaces.setdefault(ns, OrderedDict())
+                ns_keys[key] = None
+                while len(ns_keys) > self.namespace_limits[ns]:
+                    self._evict(next(iter(ns_keys)))
+
+            while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+                oldest = next(iter(self._entries))
+                if oldest == key and len(self._entries) == 1:
+                    break  # Tek başına limiti aşan değeri yine de tut
+                self._evict(oldest)
+
+    def delete(self, key: str):
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+    def purge_expired(self):
+        now = time.time()
+        with self._lock:
+            expired = [k for k, (expires_at, _, _) in self._entries.items() if now >= expires_at]
+            for key in expired:
+                self._remove(key)
+        return len(expired)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "backend": "memory",
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "evictions": self._evictions,
+                "namespaces": {ns: len(keys) for ns, keys in self._namespaces.items()},
+            }
+
+
+class FileBackend:
+    """
+    Worker'lar arası paylaşılan dosya tabanlı backend.
+    Varsayılan dizin /dev/shm (tmpfs) olduğu için veri diske değil paylaşımlı belleğe yazılır.
+    Her anahtar ayrı bir dosyadır; yazma işlemi atomik rename ile yapılır.
+    """
+
+    def __init__(self, directory: str = None, max_entries: int = 20000):
+        self.max_entries = max_entries
+        if not directory:
+            base = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+            directory = os.path.join(base, "moneyplan_cache")
+        self.directory = directory
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _path(self, key: str):
+        digest = hashlib.sha1(key.encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, f"{digest}.pkl")
+
+    def get(self, key: str):
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                expires_at, value = pickle.load(f)
+        except (FileNotFoundError, EOFError, pickle.UnpicklingError):
+            return None
+        except Exception as e:
+            logger.warning(f"File cache read error ({key}): {e}")
+            return None
+
+        if time.time() < expires_at:
+            return value
+        self.delete(key)
         return None
 
-    def set(self, key: str, value: any, ttl_seconds: int = 60):
-        """Veriyi kaydet"""
-        self._cache[key] = value
-        self._timestamps[key] = time.time() + ttl_seconds
+    def set(self, key: str, value: any, ttl_seconds: int):
+        path = self._path(key)
+        try:
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    pickle.dump((time.time() + ttl_seconds, value), f, protocol=pickle.HIGHEST_PROTOCOL)
+                os.replace(tmp_path, path)
+            except BaseException:
+                # Yarım kalan .tmp dosyası /dev/shm'de (RAM) birikmesin
+                try:
+                    os.unlink(tmp_path)
+                except FileNotFoundError:
+                    pass
+                raise
+        except Exception as e:
+            logger.warning(f"File cache write error ({key}): {e}")
+
+    def delete(self, key: str):
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    def _files(self):
+        try:
+            return [os.path.join(self.directory, n) for n in os.listdir(self.directory) if n.endswith(".pkl")]
+        except FileNotFoundError:
+            return []
+
+    def purge_expired(self):
+        """Süresi dolmuş dosyaları siler, max_entries aşılmışsa en eski yazılanları atar."""
+        now = time.time()
+        removed = 0
+        alive = []
+        for path in self._files():
+            try:
+                with open(path, "rb") as f:
+                    expires_at, _ = pickle.load(f)
+                if now >= expires_at:
+                    os.remove(path)
+                    removed += 1
+                else:
+                    alive.append((os.path.getmtime(path), path))
+            except FileNotFoundError:
+                continue
+            except Exception:
+                # Bozuk/yarım dosya
+                try:
+                    os.remove(path)
+                    removed += 1
+                except OSError:
+                    pass
+
+        if self.max_entries and len(alive) > self.max_entries:
+            alive.sort()
+            for _, path in alive[:len(alive) - self.max_entries]:
+                try:
+                    os.remove(path)
+                    removed += 1
+                except OSError:
+                    pass
+        return removed
+
+    def stats(self):
+        files = self._files()
+        total = 0
+        for path in files:
+            try:
+                total += os.path.getsize(path)
+            except OSError:
+                pass
+        return {"backend": "file", "entries": len(files), "bytes": total, "directory": self.directory}
+
+
+class RedisBackend:
+    """Redis backend. Birden fazla sunucu/worker aynı cache'i paylaşır, TTL Redis tarafından yönetilir."""
+
+    def __init__(self, url: str = None, client=None, prefix: str = "moneyplan:"):
+        if client is None:
+            import redis
+            client = redis.Redis.from_url(url or "redis://localhost:6379/0")
+        self._client = client
+        self._prefix = prefix
+
+    def get(self, key: str):
+        try:
+            raw = self._client.get(self._prefix + key)
+            return pickle.loads(raw) if raw is not None else None
+        except Exception as e:
+            logger.warning(f"Redis cache read error ({key}): {e}")
+            return None
+
+    def set(self, key: str, value: any, ttl_seconds: int):
+        try:
+            self._client.set(self._prefix + key, pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL),
+                             ex=max(1, int(ttl_seconds)))
+        except Exception as e:
+            logger.warning(f"Redis cache write error ({key}): {e}")
+
+    def delete(self, key: str):
+        try:
+            self._client.delete(self._prefix + key)
+        except Exception as e:
+            logger.warning(f"Redis cache delete error ({key}): {e}")
+
+    def purge_expired(self):
+        # Redis TTL'i kendisi uygular (maxmemory-policy ile LRU da sunucu tarafında ayarlanır)
+        return 0
+
+    def stats(self):
+        try:
+            info = self._client.info("memory")
+            return {"backend": "redis", "bytes": info.get("used_memory", 0)}
+        except Exception as e:
+            return {"backend": "redis", "error": str(e)}
+
+
+def create_backend(name: str = None):
+    """
+    CACHE_BACKEND ayarına göre backend oluşturur: memory (varsayılan), file, redis.
+    Redis'e bağlanılamazsa süreç içi cache'e düşülür.
+    """
+    from services.settings_service import settings_service
+
+    max_entries = int(settings_service.get_value("CACHE_MAX_ENTRIES", "5000"))
+    name = (name or settings_service.get_value("CACHE_BACKEND", "memory")).lower()
+    if name == "file":
+        return FileBackend(settings_service.get_value("CACHE_DIR"), max_entries=max_entries)
+    if name == "redis":
+        try:
+            backend = RedisBackend(settings_service.get_value("REDIS_URL"))
+            backend._client.ping()
+            return backend
+        except Exception as e:
+            logger.error(f"Redis cache unavailable, falling back to memory: {e}")
+    max_mb = int(settings_service.get_value("CACHE_MAX_MB", "64"))
+    return MemoryBackend(max_entries=max_entries, max_bytes=max_mb * 1024 * 1024)
+
+
+class _SwrEntry:
+    """Stale-while-revalidate kaydı: fresh_until'e kadar taze, backend TTL'ine (hard TTL) kadar bayat ama sunulabilir."""
+
+    __slots__ = ("fresh_until", "value")
+
+    def __init__(self, fresh_until, value):
+        self.fresh_until = fresh_until
+        self.value = value
+
+    def __getstate__(self):
+        return (self.fresh_until, self.value)
+
+    def __setstate__(self, state):
+        self.fresh_until, self.value = state
+
+
+class _Flight:
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Aynı anahtar için aynı anda yalnızca tek bir yükleme çalışır.
+    Diğer çağıranlar yeni istek atmak yerine devam eden yüklemenin sonucunu bekler (cache stampede koruması).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flights = {}
+
+    def do(self, key: str, fn):
+        with self._lock:
+            flight = self._flights.get(key)
+            is_leader = flight is None
+            if is_leader:
+                flight = _Flight()
+                self._flights[key] = flight
+
+        if not is_leader:
+            flight.event.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+
+        try:
+            flight.result = fn()
+            return flight.result
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                self._flights.pop(key, None)
+            flight.event.set()
+
+    def in_flight(self, key: str):
+        with self._lock:
+            return key in self._flights
+
+
+class AsyncSingleFlight:
+    """SingleFlight'ın asyncio karşılığı: aynı anahtar için eşzamanlı coroutine'ler tek bir yüklemeyi bekler."""
+
+    def __init__(self):
+        self._flights = {}
+
+    async def do(self, key: str, coro_fn):
+        task = self._flights.get(key)
+        if task is None or task.get_loop() is not asyncio.get_running_loop():
+            task = asyncio.ensure_future(coro_fn())
+            self._flights[key] = task
+            task.add_done_callback(lambda t: self._flights.pop(key, None) if self._flights.get(key) is t else None)
+        # shield: bekleyen bir istek iptal edilirse ortak yükleme iptal olmasın
+        return await asyncio.shield(task)
+
+    def in_flight(self, key: str):
+        task = self._flights.get(key)
+        return task is not None and not task.done()
+
+
+class SimpleCache:
+    def __init__(self, backend=None, sweep_interval: int = 60):
+        self._backend = backend
+        self._backend_lock = threading.Lock()
+        self._sweep_interval = sweep_interval
+        self._sweeper = None
+        self.flights = SingleFlight()
+        self.async_flights = AsyncSingleFlight()
+        self._refresh_executor = None
+        self._refresh_tasks = set()
+
+    @property
+    def backend(self):
+        # Backend ilk kullanımda seçilir (settings/DB import sırasından bağımsız olsun diye)
+        if self._backend is None:
+            with self._backend_lock:
+                if self._backend is None:
+                    self._backend = create_backend()
+                    self.start_sweeper()
+        return self._backend
+
+    def start_sweeper(self):
+        """Süresi dolan kayıtları arka planda periyodik olarak temizleyen daemon thread'i başlatır."""
+        if self._sweeper and self._sweeper.is_alive():
+            return
+        self._sweeper = threading.Thread(target=self._sweep_loop, daemon=True)
+        self._sweeper.start()
+
+    def _sweep_loop(self):
+        while True:
+            time.sleep(self._sweep_interval)
+            try:
+                self.purge_expired()
+            except Exception as e:
+                logger.error(f"Cache sweeper error: {e}")
+
+    def get(self, key: str):
+        """Veriyi getir, süresi dolmuşsa None dön"""
+        value = self.backend.get(key)
+        if isinstance(value, _SwrEntry):
+            return value.value if time.time() < value.fresh_until else None
+        return value
+
+    def set(self, key: str, value: any, ttl_seconds: int = 60, stale_ttl_seconds: int = 0):
+        """
+        Veriyi kaydet.
+        stale_ttl_seconds > 0 ise kayıt ttl_seconds (soft TTL) dolduktan sonra da bu kadar süre
+        bayat olarak saklanır; get_or_load bu aralıkta bayat veriyi hemen döner ve arka planda yeniler.
+        """
+        if stale_ttl_seconds > 0:
+            entry = _SwrEntry(time.time() + ttl_seconds, value)
+            self.backend.set(key, entry, ttl_seconds + stale_ttl_seconds)
+        else:
+            self.backend.set(key, value, ttl_seconds)
+
+    def delete(self, key: str):
+        """Veriyi sil"""
+        self.backend.delete(key)
+
+    def get_or_load(self, key: str, loader, ttl_seconds: int = 60, stale_ttl_seconds: int = 0,
+                    force_refresh: bool = False):
+        """
+        Cache'te varsa döner, yoksa loader'ı çalıştırıp sonucu kaydeder.
+        Aynı anahtar için eşzamanlı cache miss'lerde loader yalnızca bir kez çalışır.
+        Boş/None sonuçlar cache'lenmez (bir sonraki istek tekrar denesin).
+
+        stale_ttl_seconds verilirse (stale-while-revalidate): soft TTL dolmuş ama hard TTL dolmamış
+        kayıt beklemeden döner, yenileme arka planda tek bir kez planlanır.
+        force_refresh=True cache'i atlayıp loader'ı çalıştırır (prefetch job'ları için).
+        """
+        if force_refresh:
+            return self.flights.do(key, lambda: self._load(key, loader, ttl_seconds, stale_ttl_seconds, force=True))
+
+        raw = self.backend.get(key)
+        if isinstance(raw, _SwrEntry):
+            if time.time() >= raw.fresh_until:
+                self._schedule_refresh(key, loader, ttl_seconds, stale_ttl_seconds)
+            return raw.value
+        if raw:
+            return raw
+
+        return self.flights.do(key, lambda: self._load(key, loader, ttl_seconds, stale_ttl_seconds))
+
+    def _load(self, key, loader, ttl_seconds, stale_ttl_seconds, force=False):
+        # Sıra beklerken başka bir istek cache'i doldurmuş olabilir
+        cached = None if force else self.get(key)
+        if cached:
+            return cached
+        value = loader()
+        if value:
+            self.set(key, value, ttl_seconds, stale_ttl_seconds)
+        return value
+
+    def _schedule_refresh(self, key, loader, ttl_seconds, stale_ttl_seconds):
+        if self.flights.in_flight(key):
+            return
+        if self._refresh_executor is None:
+            with self._backend_lock:
+                if self._refresh_executor is None:
+                    self._refresh_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="cache-refresh")
+
+        def refresh():
+            try:
+                self.flights.do(key, lambda: self._load(key, loader, ttl_seconds, stale_ttl_seconds))
+            except Exception as e:
+                logger.error(f"Background cache refresh failed ({key}): {e}")
+
+        self._refresh_executor.submit(refresh)
+
+    async def aget_or_load(self, key: str, aloader, ttl_seconds: int = 60, stale_ttl_seconds: int = 0,
+                           force_refresh: bool = False):
+        """
+        get_or_load'un async karşılığı; aloader bir coroutine fonksiyonudur.
+        Aynı anahtarı sync get_or_load ile paylaşır (kayıt formatı aynıdır).
+        File/Redis backend erişimi (disk/ağ I/O) event loop'u bloklamasın diye thread'de yapılır.
+        """
+        if not force_refresh:
+            raw = await self._abackend(self.backend.get, key)
+            if isinstance(raw, _SwrEntry):
+                if time.time() >= raw.fresh_until and not self.async_flights.in_flight(key):
+                    task = asyncio.ensure_future(self._arefresh(key, aloader, ttl_seconds, stale_ttl_seconds))
+                    self._refresh_tasks.add(task)
+                    task.add_done_callback(self._refresh_tasks.discard)
+                return raw.value
+            if raw:
+                return raw
+
+        return await self.async_flights.do(
+            key, lambda: self._aload(key, aloader, ttl_seconds, stale_ttl_seconds, force=force_refresh))
+
+    async def _aload(self, key, aloader, ttl_seconds, stale_ttl_seconds, force=False):
+        cached = None if force else await self._abackend(self.get, key)
+        if cached:
+            return cached
+        value = await aloader()
+        if value:
+            await self._abackend(self.set, key, value, ttl_seconds, stale_ttl_seconds)
+        return value
+
+    async def _abackend(self, fn, *args):
+        # MemoryBackend yalnızca kısa bir lock tutar; thread'e atmanın maliyeti işin kendisinden büyük
+        if isinstance(self.backend, MemoryBackend):
+            return fn(*args)
+        return await anyio.to_thread.run_sync(fn, *args)
+
+    async def _arefresh(self, key, aloader, ttl_seconds, stale_ttl_seconds):
+        try:
+            await self.async_flights.do(key, lambda: self._aload(key, aloader, ttl_seconds, stale_ttl_seconds))
+        except Exception as e:
+            logger.error(f"Background cache refresh failed ({key}): {e}")
+
+    def purge_expired(self):
+        """Süresi dolmuş kayıtları okunmalarını beklemeden siler"""
+        return self.backend.purge_expired()
+
+    def stats(self):
+        return self.backend.stats()
 
 cache = SimpleCache()
@@ -0,0 +1,207 @@
+import time
+import logging
+import threading
+from collections import deque
+from utils import deadline
+from utils.network import is_outage
+
+logger = logging.getLogger(__name__)
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+# Sağlık sıralamasında başarı oranı bu adımlara yuvarlanır; benzer oranlı sağlayıcılar gecikmeye göre sıralanır
+RATE_BUCKET = 0.1
+
+
+class CircuitBreaker:
+    """
+    Tek bir sağlayıcı için devre kesici ve kayan pencere istatistikleri.
+
+    - closed: çağrılar serbest. Ardışık FAILURE_THRESHOLD hata devreyi açar.
+    - open: çağrılar RESET_SEC boyunca atlanır (ölü sağlayıcıya her istekte timeout ödenmez).
+    - half_open: süre dolunca tek bir deneme çağrısına izin verilir; başarılıysa kapanır, değilse yeniden açılır.
+    Son WINDOW çağrının sonucu ve süresi tutulur; ProviderBreakers sıralamayı buna göre yapar.
+    """
+
+    def __init__(self, name, failure_threshold=5, reset_sec=60, window=50):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_sec = reset_sec
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0
+        self._probing = False
+        self._skipped = 0
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._current_state()
+
+    def _current_state(self):
+        if self._state == OPEN and time.time() - self._opened_at >= self.reset_sec:
+            return HALF_OPEN
+        return self._state
+
+    def allow(self):
+        """Çağrı yapılabilir mi? half_open durumunda aynı anda yalnızca bir deneme çağrısı geçer."""
+        with self._lock:
+            state = self._current_state()
+            if state == CLOSED:
+                return True
+            if state == HALF_OPEN and not self._probing:
+                self._probing = True
+                return True
+            self._skipped += 1
+            return False
+
+    def record(self, success, latency):
+        with self._lock:
+            self._samples.append((bool(success), latency))
+            probing, self._probing = self._probing, False
+            if success:
+                if self._state != CLOSED:
+                    logger.info(f"Circuit '{self.name}' closed after a successful probe.")
+                self._state = CLOSED
+                self._failures = 0
+                return
+            self._failures += 1
+            if probing or self._failures >= self.failure_threshold:
+                if self._state != OPEN or probing:
+                    logger.warning(f"Circuit '{self.name}' opened after {self._failures} failures.")
+                self._state = OPEN
+                self._opened_at = time.time()
+
+    def abandon(self):
+        """Sonucu kaydedilmeyen çağrı (ör. istek süresi doldu): half_open denemesini serbest bırakır."""
+        with self._lock:
+            self._probing = False
+
+    def success_rate(self):
+        with self._lock:
+            if not self._samples:
+                return 1.0
+            return sum(ok for ok, _ in self._samples) / len(self._samples)
+
+    def avg_latency(self):
+        """Başarılı çağrıların ortalama süresi (saniye); örnek yoksa None."""
+        with self._lock:
+            latencies = [lat for ok, lat in self._samples if ok]
+        return sum(latencies) / len(latencies) if latencies else None
+
+    def latency_percentile(self, q, min_samples=5):
+        """Başarılı çağrı sürelerinin q yüzdeliği (saniye); yeterli örnek yoksa None."""
+        with self._lock:
+            latencies = sorted(lat for ok, lat in self._samples if ok)
+        if len(latencies) < min_samples:
+            return None
+        return latencies[min(len(latencies) - 1, int(q * len(latencies)))]
+
+    def stats(self):
+        latency = self.avg_latency()
+        with self._lock:
+            return {
+                "state": self._current_state(),
+                "consecutive_failures": self._failures,
+                "samples": len(self._samples),
+                "skipped": self._skipped,
+                "open_for": round(max(0, self.reset_sec - (time.time() - self._opened_at)), 1)
+                if self._state == OPEN else 0,
+                "success_rate": round(sum(ok for ok, _ in self._samples) / len(self._samples), 3)
+                if self._samples else None,
+                "avg_latency_ms": round(latency * 1000, 1) if latency is not None else None
+            }
+
+
+class ProviderBreakers:
+    """
+    Sağlayıcı adına göre devre kesiciler ve dinamik fallback zinciri.
+
+    run_chain() sağlayıcıları sağlık durumuna göre sıralar (açık devreler en sona, sonra yüksek başarı oranı,
+    sonra düşük gecikme; ölçümü olmayanlar ve eşitlikler verilen sırada kalır) ve geçerli sonuç veren
+    ilk sağlayıcının sonucunu döner.
+    Yalnızca kesinti sayılan istisnalar (bağlantı, timeout, 429, 5xx; bkz. utils.network.is_outage) hata kaydedilir.
+    Yanıt gelip veri olmaması ya da kütüphanenin sembole özgü hatası (bilinmeyen sembolde ValueError vb.)
+    devre durumu için nötrdür: kötü sembol istekleri devreyi açmaz.
+    Durum süreç başınadır (her worker kendi gözlemine göre karar verir).
+    """
+
+    def __init__(self):
+        self._breakers = {}
+        self._lock = threading.Lock()
+
+    def _setting(self, key, default):
+        from services.settings_service import settings_service
+        return settings_service.get_value(key, default)
+
+    def get(self, name):
+        with self._lock:
+            breaker = self._breakers.get(name)
+            if breaker is None:
+                breaker = CircuitBreaker(
+                    name,
+                    failure_threshold=int(self._setting("CIRCUIT_FAILURE_THRESHOLD", "5")),
+                    reset_sec=int(self._setting("CIRCUIT_RESET_SEC", "60"))
+                )
+                self._breakers[name] = breaker
+            return breaker
+
+    def order(self, names):
+        def health(item):
+            pos, name = item
+            breaker = self.get(name)
+            latency = breaker.avg_latency()
+            return (breaker.state == OPEN,
+                    -round(breaker.success_rate() / RATE_BUCKET),
+                    # Örneği olmayan sağlayıcı, ölçülmüş olanların arkasında verilen sırasını korur
+                    latency if latency is not None else float("inf"),
+                    pos)
+        return [name for _, name in sorted(enumerate(names), key=health)]
+
+    def call(self, name, fn, *args, is_valid=bool, **kwargs):
+        """
+        fn'i devre kesici üzerinden çağırır. Devre açıksa, hata olursa veya sonuç geçersizse None döner.
+        Hata kaydı yalnızca kesintilerde yapılır; boş/geçersiz sonuç, bütçe tükenmesi ve isteğin süresi
+        dolduğu için yarım kalan çağrılar devre durumunu değiştirmez.
+        """
+        breaker = self.get(name)
+        if not breaker.allow():
+            return None
+        started = time.monotonic()
+        try:
+            result = fn(*args, **kwargs)
+        except Exception as e:
+            logger.warning(f"Provider '{name}' failed: {e}")
+            if is_outage(e) and not deadline.expired():
+                breaker.record(False, time.monotonic() - started)
+            else:
+                breaker.abandon()
+            return None
+        if result is not None and is_valid(result):
+            breaker.record(True, time.monotonic() - started)
+            return result
+        breaker.abandon()
+        return None
+
+    def run_chain(self, providers, is_valid=bool):
+        """
+        providers: [(isim, çağrılabilir)] — çağrılabilir argümansızdır.
+        Dönüş: (sonuç, sağlayıcı adı) veya (None, None).
+        """
+        funcs = dict(providers)
+        for name in self.order([name for name, _ in providers]):
+            if deadline.expired():
+                break
+            result = self.call(name, funcs[name], is_valid=is_valid)
+            if result is not None:
+                return result, name
+        return None, None
+
+    def stats(self):
+        with self._lock:
+            names = list(self._breakers)
+        return {name: self.get(name).stats() for name in names}
+
+
+provider_breakers = ProviderBreakers()
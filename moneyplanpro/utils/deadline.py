@@ -0,0 +1,86 @@
+import time
+import logging
+import functools
+import threading
+import contextvars
+from contextlib import contextmanager
+import requests
+
+logger = logging.getLogger(__name__)
+
+# (bitiş zamanı [monotonic], isim); route'un koyduğu süre tüm sağlayıcı çağrılarına taşınır
+_current = contextvars.ContextVar("request_deadline", default=None)
+# Bundan kısa süre kalmışsa yeni upstream isteği başlatılmaz
+MIN_TIMEOUT_SEC = 0.1
+
+_lock = threading.Lock()
+_stats = {"requests": 0, "misses": {}}
+
+
+class DeadlineExceeded(requests.exceptions.Timeout):
+    """İstek süresi doldu; requests.Timeout'tan türediği için mevcut except blokları yakalar."""
+
+
+@contextmanager
+def deadline(seconds, name="request"):
+    """
+    Bu blok (ve içinden çağrılan her şey) için bitiş zamanı koyar. İç içe kullanımda kısa olan geçerlidir.
+    contextvars sayesinde run_in_threadpool ve bind() ile başlatılan thread'lere de taşınır.
+    Blok süre dolduktan sonra biterse bir "miss" sayılır.
+    """
+    expires_at = time.monotonic() + seconds
+    outer = _current.get()
+    if outer is not None and outer[0] < expires_at:
+        expires_at = outer[0]
+    token = _current.set((expires_at, name))
+    with _lock:
+        _stats["requests"] += 1
+    try:
+        yield
+    finally:
+        _current.reset(token)
+        if time.monotonic() >= expires_at:
+            with _lock:
+                _stats["misses"][name] = _stats["misses"].get(name, 0) + 1
+            logger.warning(f"Deadline missed for '{name}' ({seconds}s).")
+
+
+def remaining():
+    """Kalan süre (saniye); deadline yoksa None."""
+    current = _current.get()
+    if current is None:
+        return None
+    return current[0] - time.monotonic()
+
+
+def expired():
+    left = remaining()
+    return left is not None and left <= MIN_TIMEOUT_SEC
+
+
+def clamp_timeout(timeout):
+    """
+    Upstream timeout'unu kalan süreyle sınırlar; süre dolmuşsa DeadlineExceeded fırlatır.
+    (connect, read) tuple'ları için her iki değer de sınırlanır.
+    """
+    left = remaining()
+    if left is None:
+        return timeout
+    if left <= MIN_TIMEOUT_SEC:
+        raise DeadlineExceeded(f"Deadline exceeded ({_current.get()[1]})")
+    if timeout is None:
+        return left
+    if isinstance(timeout, tuple):
+        return tuple(min(t, left) if t is not None else left for t in timeout)
+    return min(timeout, left)
+
+
+def bind(fn):
+    """fn'i çağıranın context'iyle (deadline dahil) çalışacak şekilde sarar; executor.submit öncesi kullanılır."""
+    return functools.partial(contextvars.copy_context().run, fn)
+
+
+def stats():
+    with _lock:
+        return {"requests": _stats["requests"], "misses": dict(_stats["misses"]),
+                "missed_total": sum(_stats["misses"].values())}
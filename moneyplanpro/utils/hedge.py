@@ -0,0 +1,174 @@
+import time
+import threading
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor, wait, FIRST_COMPLETED
+from utils.circuit_breaker import provider_breakers
+from utils import deadline
+
+# Hedge isteklerinin çalıştığı ortak havuz (kaybeden istekler bitene kadar burada çalışmaya devam eder)
+HEDGE_WORKERS = 16
+# Birincil sağlayıcının p95 süresi bilinmiyorsa (yetersiz örnek) kullanılan bekleme
+DEFAULT_DELAY_SEC = 1.0
+MIN_DELAY_SEC = 0.05
+MAX_DELAY_SEC = 5.0
+BUDGET_WINDOW_SEC = 60
+# Kotası dar sağlayıcıların worker başına dakikalık hedge bütçesi (HEDGE_BUDGET_<PROVIDER> ile değiştirilebilir).
+# FMP günde 250 çağrı: 4 worker'da dakikada birkaç hedge bile kotayı saatler içinde bitirir, hedge atılmaz.
+DEFAULT_BUDGETS = {
+    "fmp": "0",
+    "twelvedata": "2",
+}
+
+
+class Hedger:
+    """
+    Kuyruk gecikmesi için "hedged request" zinciri.
+
+    Birincil sağlayıcı kendi p95 süresi içinde yanıt vermezse sıradaki sağlayıcıya paralel ikinci bir istek
+    atılır; ilk geçerli yanıt kazanır. Kaybeden henüz başlamadıysa iptal edilir, başlamışsa sonucu
+    yok sayılır (Python thread'leri durdurulamaz; istek kendi timeout'una kadar sürer).
+    Bekleme birincil havuzda gerçekten çalışmaya başladığında başlar: havuz doluyken kuyrukta bekleyen
+    bir istek "yavaş" sayılıp aynı kuyruğa hedge eklenmez.
+    Her sağlayıcıya worker başına dakikada en fazla HEDGE_BUDGET_<PROVIDER> (yoksa HEDGE_BUDGET_PER_MIN)
+    hedge isteği atılır; kotası dar sağlayıcıların (DEFAULT_BUDGETS) bütçesi düşüktür, böylece kota tükenmez.
+    HEDGE_ENABLED=0 iken provider_breakers.run_chain ile aynı sıralı davranış sürer; ancak istekte bir deadline
+    varsa çağrılar yine havuzda çalışır ve en fazla kalan süre kadar beklenir (timeout'u olmayan yfinance gibi
+    çağrılar da isteği bekletemez).
+    """
+
+    def __init__(self):
+        self._executor = None
+        self._lock = threading.Lock()
+        self._budget = {}
+        self._stats = {"chains": 0, "hedged": 0, "hedge_wins": 0, "budget_denied": 0, "cancelled": 0}
+
+    def _setting(self, key, default):
+        from services.settings_service import settings_service
+        return settings_service.get_value(key, default)
+
+    def run_chain(self, providers, is_valid=bool):
+        """
+        providers: [(isim, çağrılabilir)]; sıralama ve devre kesici kuralları provider_breakers ile aynıdır.
+        Dönüş: (sonuç, sağlayıcı adı) veya (None, None).
+        """
+        hedging = self._setting("HEDGE_ENABLED", "0") == "1" and len(providers) > 1
+        if not hedging and deadline.remaining() is None:
+            return provider_breakers.run_chain(providers, is_valid=is_valid)
+
+        funcs = dict(providers)
+        order = provider_breakers.order([name for name, _ in providers])
+        pending = {}
+        started = {}  # çağrı future'ı -> çalışmaya başladığı an (monotonic) ile tamamlanan future
+        primary = order[0]
+        hedged = False
+        hedge_blocked = not hedging
+        if hedging:
+            self._count("chains")
+
+        def launch(name):
+            began = Future()
+
+            def run():
+                began.set_result(time.monotonic())
+                return provider_breakers.call(name, funcs[name], is_valid=is_valid)
+
+            # bind: sağlayıcı çağrısı isteğin deadline'ını görsün
+            future = self._pool().submit(deadline.bind(run))
+            pending[future] = name
+            started[future] = began
+
+        launch(order.pop(0))
+        while pending:
+            timeout = None
+            waiting = set(pending)
+            if order and not hedge_blocked:
+                # Hedge süresi en son başlatılan çağrının kendi başlangıcından sayılır
+                last = list(pending)[-1]
+                if started[last].done():
+                    timeout = max(0, self._delay(pending[last]) - (time.monotonic() - started[last].result()))
+                else:
+                    waiting.add(started[last])  # havuzda sırada: çalışmaya başlayınca uyan
+            left = deadline.remaining()
+            if left is not None:
+                timeout = max(0, left) if timeout is None else max(0, min(timeout, left))
+            woke, _ = wait(waiting, timeout=timeout, return_when=FIRST_COMPLETED)
+            done = [future for future in woke if future in pending]
+
+            if not done and deadline.expired():
+                # Süre doldu: bekleyen çağrılar arka planda bitsin, çağıran bayat/kısmi sonuca düşer
+                self._cancel(pending)
+                return None, None
+            if not done and woke:
+                continue  # birincil şimdi başladı; beklemeyi oradan say
+            if not done:
+                # Birincil yavaş: bütçe varsa sıradaki sağlayıcıyı paralel başlat
+                if self._take_budget(order[0]):
+                    self._count("hedged")
+                    hedged = True
+                    launch(order.pop(0))
+                else:
+                    hedge_blocked = True
+                continue
+
+            for future in done:
+                name = pending.pop(future)
+                started.pop(future, None)
+                result = future.result()
+                if result is not None:
+                    if hedged and name != primary:
+                        self._count("hedge_wins")
+                    self._cancel(pending)
+                    return result, name
+            # Bitenler başarısız: yarışan istek yoksa zincire sırayla devam et
+            if not pending and order and not deadline.expired():
+                launch(order.pop(0))
+        return None, None
+
+    def _cancel(self, pending):
+        for future in pending:
+            if future.cancel():
+                self._count("cancelled")
+
+    def _delay(self, name):
+        p95 = provider_breakers.get(name).latency_percentile(0.95)
+        if p95 is None:
+            return DEFAULT_DELAY_SEC
+        return min(MAX_DELAY_SEC, max(MIN_DELAY_SEC, p95))
+
+    def _budget_limit(self, name):
+        default = DEFAULT_BUDGETS.get(name) or self._setting("HEDGE_BUDGET_PER_MIN", "30")
+        try:
+            return int(self._setting(f"HEDGE_BUDGET_{name.upper()}", default))
+        except (TypeError, ValueError):
+            return int(default)
+
+    def _take_budget(self, name):
+        limit = self._budget_limit(name)
+        now = time.time()
+        with self._lock:
+            window = self._budget.setdefault(name, deque())
+            while window and now - window[0] >= BUDGET_WINDOW_SEC:
+                window.popleft()
+            if len(window) >= limit:
+                self._stats["budget_denied"] += 1
+                return False
+            window.append(now)
+            return True
+
+    def _pool(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=HEDGE_WORKERS, thread_name_prefix="hedge")
+            return self._executor
+
+    def _count(self, key):
+        with self._lock:
+            self._stats[key] += 1
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats, enabled=self._setting("HEDGE_ENABLED", "0") == "1",
+                        budget_used={name: len(window) for name, window in self._budget.items()})
+
+
+hedger = Hedger()
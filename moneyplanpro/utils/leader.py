@@ -0,0 +1,84 @@
+import os
+import fcntl
+import logging
+import tempfile
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class LeaderLock:
+    """
+    uvicorn worker'ları arasında tek bir "lider" süreç seçmek için dosya kilidi (flock).
+    Kilidi alan süreç ölürse işletim sistemi kilidi bırakır; diğer worker'lar
+    bir sonraki try_acquire() çağrısında liderliği devralır.
+    Lider, heartbeat() ile kilit dosyasına pid ve zaman damgası yazar; böylece
+    hangi sürecin lider olduğu ve en son ne zaman çalıştığı her worker'dan görülebilir.
+    """
+
+    def __init__(self, name: str, directory: str = None):
+        self.name = name
+        self.path = os.path.join(directory or tempfile.gettempdir(), f"moneyplan_{name}.lock")
+        self._fd = None
+        self._lock = threading.Lock()
+
+    @property
+    def is_leader(self):
+        return self._fd is not None
+
+    def try_acquire(self):
+        """Kilidi bloklamadan almayı dener. Zaten lider ise True döner."""
+        with self._lock:
+            if self._fd is not None:
+                return True
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                os.close(fd)
+                return False
+            self._fd = fd
+            logger.info(f"Process {os.getpid()} became leader for '{self.name}'.")
+            return True
+
+    def heartbeat(self):
+        """Lider ise kilit dosyasına "pid zaman" yazar. Lider değilse False döner."""
+        with self._lock:
+            if self._fd is None:
+                return False
+            data = f"{os.getpid()} {time.time():.3f}".encode()
+            os.ftruncate(self._fd, 0)
+            os.pwrite(self._fd, data, 0)
+            return True
+
+    def status(self):
+        """Liderlik durumu: bu süreç lider mi, lider pid'i ve son heartbeat'ten bu yana geçen süre."""
+        info = {"is_leader": self.is_leader, "pid": os.getpid(), "leader_pid": None, "heartbeat_age": None}
+        try:
+            with open(self.path) as f:
+                pid, ts = f.read().split()
+            info["leader_pid"] = int(pid)
+            info["heartbeat_age"] = round(time.time() - float(ts), 1)
+        except (OSError, ValueError):
+            pass
+        return info
+
+    def release(self):
+        with self._lock:
+            if self._fd is None:
+                return
+            try:
+                # Eski heartbeat yeni lidere ait sanılmasın
+                os.ftruncate(self._fd, 0)
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+            finally:
+                os.close(self._fd)
+                self._fd = None
+
+
+# Arka plan görevleri (prefetch scheduler vb.) yalnızca bu kilidi tutan worker'da çalışır
+background_leader = LeaderLock("background_worker")
+
+# Fiyat alarmı monitörü ayrı bir kilit kullanır; prefetch ile aynı worker'a yığılmak zorunda değil
+alert_leader = LeaderLock("alert_monitor")
@@ -1,7 +1,12 @@
 import random
+import asyncio
+import threading
+from urllib.parse import urlsplit
+import httpx
 import requests
 from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
+from utils.deadline import clamp_timeout
 
 # Popüler ve güncel User-Agent listesi
 USER_AGENTS = [
@@ -18,6 +23,61 @@ USER_AGENTS = [
     "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36 Edg/120.0.0.0"
 ]
 
+def _check_quota(url, params):
+    from services.quota_service import quota_service
+    quota_service.check(url, params)
+
+
+async def _acheck_quota(url, params):
+    from services.quota_service import quota_service
+    await quota_service.acheck(url, params)
+
+
+class UpstreamError(requests.exceptions.RequestException):
+    """Sağlayıcı yanıt verdi ama başarısız oldu (200 dışı HTTP durumu veya API'nin hata gövdesi)."""
+
+    def __init__(self, message, status=None):
+        super().__init__(message)
+        self.status = status
+
+
+def raise_for_upstream(resp, provider):
+    """200 dışı yanıtı UpstreamError'a çevirir; fallback zincirleri 'veri yok' ile 'hata'yı ayırt edebilsin."""
+    if resp.status_code != 200:
+        raise UpstreamError(f"{provider} HTTP {resp.status_code}", resp.status_code)
+    return resp
+
+
+# Yanıt alınamadığını gösteren taşıma hataları (builtin ConnectionError/TimeoutError: investpy, socket)
+TRANSPORT_ERRORS = (
+    requests.exceptions.ConnectionError,
+    requests.exceptions.Timeout,
+    requests.exceptions.ChunkedEncodingError,
+    httpx.TransportError,
+    ConnectionError,
+    TimeoutError,
+)
+
+
+def is_outage(exc):
+    """
+    İstisna sağlayıcı kesintisi mi? Yalnızca taşıma hataları (bağlantı, timeout) ile 429/5xx durumlu
+    UpstreamError/HTTPError kesintidir. Bütçe tükenmesi (QuotaExceeded), 429 dışı 4xx yanıtlar ve
+    diğer istisnalar (bilinmeyen sembolde kütüphanelerin ValueError'ı, kod hataları) sağlayıcının
+    sağlığını göstermez; devre kesicide hata sayılmaz.
+    """
+    from services.quota_service import QuotaExceeded
+    if isinstance(exc, QuotaExceeded):
+        return False
+    status = getattr(exc, "status", None)
+    if status is None and isinstance(exc, (requests.exceptions.HTTPError, httpx.HTTPStatusError)) \
+            and exc.response is not None:
+        status = exc.response.status_code
+    if status is not None:
+        return status == 429 or status >= 500
+    return isinstance(exc, TRANSPORT_ERRORS)
+
+
 class SafeRequest:
     @staticmethod
     def get_headers():
@@ -38,32 +98,198 @@ class SafeRequest:
 
     @staticmethod
     def get_session():
-        """Retry mekanizmalı güçlü bir session döndürür"""
+        """Havuz dışı, retry mekanizmalı tek kullanımlık session (geriye dönük uyumluluk için)"""
         session = requests.Session()
-        
-        # Headerları ayarla
         session.headers.update(SafeRequest.get_headers())
-        
-        # Retry stratejisi (Bağlantı koparsa 3 kere dene)
-        retry_strategy = Retry(
-            total=3,
-            backoff_factor=1,
+        adapter = HTTPAdapter(max_retries=http_sessions.retry_policy())
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        return session
+
+    @staticmethod
+    def request(method, url, browser=False, **kwargs):
+        """
+        Host bazlı havuzlanmış (keep-alive) session üzerinden istek atar.
+        browser=True: her istekte yeni rastgele tarayıcı header'ları (scraping için).
+        Aksi halde yalnızca çağıranın verdiği header'lar gönderilir (JSON API'ler için).
+        """
+        # Route'un deadline'ı varsa timeout kalan süreyle sınırlanır (süre dolduysa DeadlineExceeded)
+        kwargs['timeout'] = clamp_timeout(kwargs.get('timeout', 10))
+        # Sağlayıcı bütçesi tükendiyse istek atılmaz (QuotaExceeded); servisler cache'e düşer
+        _check_quota(url, kwargs.get('params'))
+
+        headers = SafeRequest.get_headers() if browser else {}
+        headers.update(kwargs.pop('headers', None) or {})
+        session = http_sessions.session_for(url)
+        http_sessions.record(url)
+        return session.request(method, url, headers=headers, **kwargs)
+
+    @staticmethod
+    def get(url, browser=True, **kwargs):
+        """requests.get sarıcısı (wrapper) - User-Agent rotasyonu + bağlantı havuzu"""
+        return SafeRequest.request("GET", url, browser=browser, **kwargs)
+
+    @staticmethod
+    def post(url, **kwargs):
+        return SafeRequest.request("POST", url, **kwargs)
+
+
+class SessionRegistry:
+    """
+    Süreç genelinde host başına tek bir requests.Session tutar.
+    Her istekte yeni Session/HTTPAdapter açmak her çağrıda TCP+TLS el sıkışması demekti;
+    burada bağlantılar urllib3 havuzunda kalır ve aynı hosta giden istekler tarafından yeniden kullanılır.
+    Havuz boyutu ve retry politikası settings üzerinden ayarlanır (HTTP_POOL_MAXSIZE, HTTP_RETRY_TOTAL).
+    """
+
+    def __init__(self):
+        self._sessions = {}
+        self._requests = {}
+        self._lock = threading.Lock()
+
+    def _setting(self, key, default):
+        from services.settings_service import settings_service
+        return settings_service.get_value(key, default)
+
+    def retry_policy(self):
+        return Retry(
+            total=int(self._setting("HTTP_RETRY_TOTAL", "2")),
+            backoff_factor=float(self._setting("HTTP_RETRY_BACKOFF", "0.5")),
             status_forcelist=[429, 500, 502, 503, 504],
-            allowed_methods=["HEAD", "GET", "OPTIONS"]
+            allowed_methods=["HEAD", "GET", "OPTIONS"],
+            # Denemeler bitince istisna yerine son yanıtı döndür (servisler status_code kontrol ediyor)
+            raise_on_status=False
         )
-        adapter = HTTPAdapter(max_retries=retry_strategy)
+
+    def _build_session(self):
+        session = requests.Session()
+        pool_size = int(self._setting("HTTP_POOL_MAXSIZE", "20"))
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=self.retry_policy())
         session.mount("https://", adapter)
         session.mount("http://", adapter)
-        
         return session
 
-    @staticmethod
-    def get(url, **kwargs):
-        """requests.get sarıcısı (wrapper)"""
-        if 'timeout' not in kwargs:
-            kwargs['timeout'] = 10
-            
-        with SafeRequest.get_session() as session:
-            # Her istekte header'ı tazele (User-agent rotasyonu için)
-            session.headers.update(SafeRequest.get_headers())
-            return session.get(url, **kwargs)
+    def _host(self, url):
+        parts = urlsplit(url)
+        return f"{parts.scheme}://{parts.netloc}"
+
+    def session_for(self, url):
+        host = self._host(url)
+        session = self._sessions.get(host)
+        if session is None:
+            with self._lock:
+                session = self._sessions.get(host)
+                if session is None:
+                    session = self._build_session()
+                    self._sessions[host] = session
+        return session
+
+    def record(self, url):
+        host = self._host(url)
+        with self._lock:
+            self._requests[host] = self._requests.get(host, 0) + 1
+
+    def stats(self):
+        """Host bazında açılan bağlantı ve yeniden kullanım sayıları (diagnostics için)"""
+        hosts = {}
+        with self._lock:
+            items = list(self._sessions.items())
+            counts = dict(self._requests)
+        for host, session in items:
+            connections = 0
+            pooled_requests = 0
+            # Aynı adapter hem http:// hem https:// için mount edildiğinden tekilleştir
+            for adapter in {id(a): a for a in session.adapters.values()}.values():
+                for key in list(adapter.poolmanager.pools.keys()):
+                    pool = adapter.poolmanager.pools.get(key)
+                    if pool is None:
+                        continue
+                    connections += pool.num_connections
+                    pooled_requests += pool.num_requests
+            hosts[host] = {
+                "requests": counts.get(host, 0),
+                "connections_opened": connections,
+                "reused": max(pooled_requests - connections, 0),
+            }
+        total_requests = sum(h["requests"] for h in hosts.values())
+        total_connections = sum(h["connections_opened"] for h in hosts.values())
+        return {
+            "hosts": hosts,
+            "requests": total_requests,
+            "connections_opened": total_connections,
+            "reuse_ratio": round(1 - total_connections / total_requests, 3) if total_requests else 0.0,
+        }
+
+    def close(self):
+        with self._lock:
+            sessions = list(self._sessions.values())
+            self._sessions.clear()
+        for session in sessions:
+            session.close()
+
+
+http_sessions = SessionRegistry()
+
+
+class AsyncSafeRequest:
+    """
+    httpx tabanlı asenkron upstream istemcisi.
+    Süreç başına tek bir AsyncClient (bağlantı havuzu + keep-alive) kullanılır; böylece
+    yavaş upstream'leri bekleyen istekler threadpool slotu tutmadan event loop üzerinde bekler.
+    """
+    RETRY_STATUSES = {429, 500, 502, 503, 504}
+    _client = None
+    _client_loop = None
+
+    @classmethod
+    def get_client(cls):
+        loop = asyncio.get_running_loop()
+        # AsyncClient oluşturulduğu event loop'a bağlıdır
+        if cls._client is None or cls._client_loop is not loop or cls._client.is_closed:
+            cls._client = httpx.AsyncClient(
+                timeout=10,
+                follow_redirects=True,
+                limits=httpx.Limits(max_connections=200, max_keepalive_connections=50)
+            )
+            cls._client_loop = loop
+        return cls._client
+
+    @classmethod
+    async def request(cls, method, url, browser=False, retries=2, **kwargs):
+        """
+        browser=True: SafeRequest.get gibi tam tarayıcı header'ları (scraping için).
+        Aksi halde yalnızca rastgele User-Agent (JSON API'ler için).
+        Bağlantı hatası ve 429/5xx durumlarında üstel bekleme ile tekrar dener.
+        """
+        headers = SafeRequest.get_headers() if browser else {"User-Agent": random.choice(USER_AGENTS)}
+        headers.update(kwargs.pop("headers", None) or {})
+        timeout = kwargs.pop("timeout", 10)
+        await _acheck_quota(url, kwargs.get("params"))
+
+        client = cls.get_client()
+        for attempt in range(retries + 1):
+            try:
+                resp = await client.request(method, url, headers=headers, timeout=clamp_timeout(timeout), **kwargs)
+                if resp.status_code not in cls.RETRY_STATUSES or attempt == retries:
+                    return resp
+            except (httpx.TransportError, httpx.TimeoutException):
+                if attempt == retries:
+                    raise
+            await asyncio.sleep(0.5 * (2 ** attempt))
+
+    @classmethod
+    async def get(cls, url, **kwargs):
+        return await cls.request("GET", url, **kwargs)
+
+    @classmethod
+    async def post(cls, url, **kwargs):
+        # POST idempotent değildir, varsayılan olarak tekrar denenmez
+        kwargs.setdefault("retries", 0)
+        return await cls.request("POST", url, **kwargs)
+
+    @classmethod
+    async def aclose(cls):
+        if cls._client is not None and not cls._client.is_closed:
+            await cls._client.aclose()
+        cls._client = None
+        cls._client_loop = None